@@ -0,0 +1,230 @@
+# adapters.py
+# 한 베이스 모델의 LoRA/PEFT 어댑터 여러 개를 베이스 가중치를 한 번만 로드하여 차례로 평가하는 어댑터 스윕
+# 베이스 모델은 요청한 정밀도(예: load_in_8bit=True)로 한 번 올리고, 어댑터만 바꿔 끼워 KMMLU를 평가
+# 어댑터마다 리더보드 항목을 따로 기록하고, 어댑터 교체 시간과 최대 메모리를 함께 저장
+#
+# 사용 예:
+#   python adapters.py --base-model upstage/SOLAR-10.7B-v1.0 \
+#       --base-model-args pretrained=upstage/SOLAR-10.7B-v1.0,load_in_8bit=True \
+#       --adapters ./lora/run-a ./lora/run-b ./lora/run-c --label SOLAR-10.7B-v1.0
+#   python adapters.py --demo   (CPU, 작은 무작위 모델 + 무작위 LoRA 어댑터 + 합성 KMMLU)
+
+import os
+import re
+import time
+
+from evaluate_model import create_lm, evaluate_model
+from model_server import ModelCache
+
+
+def split_adapter_args(model_args):
+    """
+    model_args에서 peft= 항목을 분리
+
+    Returns:
+        tuple: (베이스 모델 model_args, 어댑터 경로 또는 None)
+    """
+    parts = [part for part in model_args.split(',') if part]
+    adapter = next((part.split('=', 1)[1] for part in parts if part.startswith('peft=')), None)
+    return ','.join(part for part in parts if not part.startswith('peft=')), adapter
+
+
+def adapter_label(label, adapter_path):
+    """어댑터 평가의 리더보드 표시 이름 (예: "SOLAR-10.7B-v1.0+run-a")"""
+    return f"{label}+{os.path.basename(os.path.normpath(adapter_path))}"
+
+
+class AdapterModelCache(ModelCache):
+    """
+    peft= 가 들어간 model_args를 베이스 모델 + 어댑터로 나눠 처리하는 모델 캐시
+
+    - 베이스 모델은 ModelCache에 peft= 를 뺀 model_args 키로 한 번만 보관
+    - 어댑터는 PeftModel로 감싼 베이스 모델에 load_adapter로 올리고, 이전 어댑터는 delete_adapter로 내림
+      (한 번에 어댑터 하나만 메모리에 유지)
+    - peft= 가 없는 요청이면 LoRA 층을 떼어낸(unload) 베이스 모델 그대로 반환
+    - last_lookup에 어댑터 경로와 교체 시간(adapter_load_seconds)을 추가
+    """
+
+    def __init__(self, max_memory_gb=None, max_models=1):
+        super().__init__(max_memory_gb, max_models)
+        self.adapter_names = {}  # 베이스 lm id -> {어댑터 경로: peft 어댑터 이름}
+        self.adapter_swaps = 0
+        self.adapter_load_seconds = 0.0
+
+    def get(self, model_name, model_args, device, loader):
+        base_args, adapter_path = split_adapter_args(model_args)
+        if adapter_path is None:
+            lm = super().get(model_name, model_args, device, loader)
+            self._unload_adapters(lm)
+            return lm
+
+        # 베이스 모델 이름은 pretrained= 값 (메모리 추정용)
+        base_name = next((part.split('=', 1)[1] for part in base_args.split(',') if part.startswith('pretrained=')),
+                         model_name)
+        lm = super().get(base_name, base_args, device, lambda: create_lm(base_args, batch_size=1, device=device))
+
+        start = time.time()
+        self._activate_adapter(lm, adapter_path)
+        swap_seconds = time.time() - start
+        self.adapter_swaps += 1
+        self.adapter_load_seconds += swap_seconds
+        self.last_lookup = {**self.last_lookup, "adapter": adapter_path, "adapter_load_seconds": swap_seconds}
+        print(f"🔌 Adapter loaded: {adapter_path} ({swap_seconds:.2f}s)")
+        return lm
+
+    def _activate_adapter(self, lm, adapter_path):
+        """베이스 모델에 어댑터를 올리고 활성화 (이전 어댑터는 내림)"""
+        from peft import PeftModel
+
+        names = self.adapter_names.setdefault(id(lm), {})
+        model = lm._model
+        if adapter_path in names:
+            model.set_adapter(names[adapter_path])
+            return
+
+        # peft 어댑터 이름에는 '.'을 쓸 수 없으므로 경로 대신 순번 이름 사용
+        name = f"adapter_{len(names)}_{re.sub(r'[^0-9A-Za-z_]+', '_', os.path.basename(os.path.normpath(adapter_path)))}"
+        if isinstance(model, PeftModel):
+            model.load_adapter(adapter_path, adapter_name=name)
+            model.set_adapter(name)
+            for previous_path, previous_name in list(names.items()):
+                model.delete_adapter(previous_name)
+                del names[previous_path]
+        else:
+            lm._model = PeftModel.from_pretrained(model, adapter_path, adapter_name=name)
+        lm._model.eval()
+        names[adapter_path] = name
+
+    def _unload_adapters(self, lm):
+        """LoRA 층을 떼어내고 베이스 모델로 되돌림 (병합하지 않음)"""
+        from peft import PeftModel
+
+        if isinstance(lm._model, PeftModel):
+            lm._model = lm._model.unload()
+            self.adapter_names.pop(id(lm), None)
+
+    def stats(self):
+        return {**super().stats(), "adapter_swaps": self.adapter_swaps,
+                "adapter_load_seconds": self.adapter_load_seconds}
+
+
+def sweep_adapters(base_model_name, base_model_args, adapters, label, batch_size=16, device="cuda:0",
+                   include_base=False, **evaluate_kwargs):
+    """
+    베이스 모델을 한 번만 로드하고 어댑터를 바꿔 가며 KMMLU 평가 (어댑터마다 리더보드 항목 하나)
+
+    Args:
+        base_model_name: 베이스 모델 경로 (예: "upstage/SOLAR-10.7B-v1.0")
+        base_model_args: 베이스 모델 로딩 설정 (정밀도 포함, peft= 없이)
+        adapters: 어댑터 경로 목록 (로컬 폴더 또는 Hub 저장소)
+        label: 베이스 모델 표시 이름 (어댑터 항목은 "label+어댑터 폴더명")
+        include_base: True이면 어댑터 없는 베이스 모델도 같은 로드로 먼저 평가
+        evaluate_kwargs: evaluate_model에 그대로 넘길 인자 (예: quick_ci_width, prompt_cache_dir)
+
+    Returns:
+        list: 어댑터별 result_data
+              (어댑터 경로와 교체 시간은 result_data['model_cache'], 최대 메모리는 result_data['profile']에 기록되어 저장됨)
+    """
+    cache = AdapterModelCache()
+    entries = [(None, label)] if include_base else []
+    entries += [(adapter, adapter_label(label, adapter)) for adapter in adapters]
+
+    results = []
+    for i, (adapter, entry_label) in enumerate(entries, 1):
+        print(f"\n🔁 [{i}/{len(entries)}] {entry_label}")
+        model_args = f"{base_model_args},peft={adapter}" if adapter else base_model_args
+        result_data = evaluate_model(
+            model_name=f"{base_model_name}+{adapter}" if adapter else base_model_name,
+            model_args=model_args,
+            label=entry_label,
+            batch_size=batch_size,
+            device=device,
+            model_cache=cache,
+            **evaluate_kwargs
+        )
+        results.append(result_data)
+
+    print_sweep_summary(results, cache.stats())
+    return results
+
+
+def print_sweep_summary(results, cache_stats):
+    """
+    어댑터별 점수, 소요 시간, 교체 시간, 최대 메모리 표 출력
+    최대 메모리는 평가마다 따로 측정한 값 (GPU는 장치 메모리, CPU는 평가 중 최대 RSS)
+    """
+    from tabulate import tabulate
+
+    rows = []
+    for result in sorted(results, key=lambda r: r["overall"], reverse=True):
+        lookup = result.get("model_cache", {})
+        profile = result["profile"]
+        if profile["peak_device_memory_mb"] is not None:
+            peak = f"{profile['peak_device_memory_mb'] / 1024:.2f}GB"
+        else:
+            peak = f"{profile['peak_host_memory_mb'] / 1024:.2f}GB (host)"
+        rows.append([result["model"][:40], f"{result['overall']:.2%}", result["elapsed_time"],
+                     f"{lookup.get('load_seconds', 0.0):.1f}s", f"{lookup.get('adapter_load_seconds', 0.0):.2f}s",
+                     peak])
+    print(tabulate(rows, headers=["Model", "Overall", "Time", "Base Load", "Adapter Load", "Peak Mem"],
+                   tablefmt="grid"))
+    print(f"📦 Base model loaded {cache_stats['misses']} time(s) for {len(results)} evaluations, "
+          f"~{cache_stats['load_seconds_saved']:.1f}s load time saved")
+
+
+def _demo():
+    """CPU에서 작은 무작위 모델 + 무작위 LoRA 어댑터 3개로 스윕 확인 (임시 폴더에 결과 저장)"""
+    import resource
+    import tempfile
+
+    import evaluate_model as em
+    from synthetic import make_offline_evaluate, make_random_adapters, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    adapters = make_random_adapters(model_dir, os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_lora'))
+    em.simple_evaluate = make_offline_evaluate(n_questions=4)
+    os.chdir(tempfile.mkdtemp())
+
+    # 스윕 전에 큰 메모리를 잡았다가 놓아 프로세스 최대 RSS를 올려 둠 (평가별 최대 메모리에 섞이면 안 됨)
+    buffer = bytearray(512 * 1024 ** 2)
+    buffer[::4096] = b'x' * len(buffer[::4096])
+    del buffer
+    process_peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    results = sweep_adapters(model_dir, f"pretrained={model_dir},dtype=float32", adapters, "tiny-llama",
+                             batch_size=16, device="cpu", include_base=True, cache_path="kmmlu_ll_cache.sqlite")
+
+    # 회귀 확인: 베이스 모델과 어댑터는 loglikelihood 캐시 키가 달라야 하므로 첫 스윕에서는 적중이 없어야 함
+    hits = {result["model"]: result["ll_cache"]["hits"] for result in results}
+    assert not any(hits.values()), f"Adapters shared loglikelihood cache entries: {hits}"
+    print(f"✅ Loglikelihood cache kept {len(results)} models apart (0 cross-model hits)")
+
+    # 회귀 확인: Peak Mem은 평가별 값이어야 하므로 스윕 전의 프로세스 최대 RSS보다 작아야 함
+    peaks = {result["model"]: result["profile"]["peak_host_memory_mb"] for result in results}
+    assert all(peak < process_peak_mb for peak in peaks.values()), \
+        f"Peak host memory is the process lifetime peak ({process_peak_mb:.0f}MB): {peaks}"
+    print(f"✅ Peak memory measured per evaluation ({min(peaks.values()):.0f}-{max(peaks.values()):.0f}MB, "
+          f"process peak {process_peak_mb:.0f}MB)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate many PEFT adapters of one base model on KMMLU")
+    parser.add_argument("--base-model", help="base model path (e.g. upstage/SOLAR-10.7B-v1.0)")
+    parser.add_argument("--base-model-args", help="base model args without peft= (e.g. pretrained=...,load_in_8bit=True)")
+    parser.add_argument("--adapters", nargs="+", default=[], help="adapter paths or Hub repos")
+    parser.add_argument("--label", help="base model display name")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--device", default="cuda:0")
+    parser.add_argument("--include-base", action="store_true", help="also evaluate the base model without adapters")
+    parser.add_argument("--demo", action="store_true", help="CPU demo with a tiny random model and random adapters")
+    args = parser.parse_args()
+
+    if args.demo:
+        _demo()
+    else:
+        if not (args.base_model and args.base_model_args and args.adapters):
+            parser.error("--base-model, --base-model-args and --adapters are required")
+        sweep_adapters(args.base_model, args.base_model_args, args.adapters, args.label or args.base_model,
+                       batch_size=args.batch_size, device=args.device, include_base=args.include_base)
@@ -0,0 +1,247 @@
+# autotune.py
+# 모델 + 정밀도 조합별로 메모리에 들어가는 가장 큰 batch_size를 찾아 로컬 프로파일에 저장
+# OOM이 나면 평가를 포기하지 않고 batch_size를 줄여 다시 시도
+
+import gc
+import json
+import os
+from datetime import datetime
+
+# === 전역 상수 정의 ===
+BATCH_PROFILE_FILE = 'kmmlu_batch_profile.json'
+DEFAULT_PROBE_SEQ_LEN = 2048   # 5-shot KMMLU 프롬프트의 대략적인 최대 길이
+DEFAULT_MAX_BATCH_SIZE = 512
+
+
+class SimulatedOutOfMemoryError(RuntimeError):
+    """CPU 테스트용 가상 OOM (메시지에 'out of memory' 포함)"""
+
+
+def is_oom_error(error):
+    """예외가 메모리 부족(OOM) 오류인지 판단"""
+    if isinstance(error, SimulatedOutOfMemoryError):
+        return True
+    try:
+        import torch
+        if isinstance(error, torch.cuda.OutOfMemoryError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (RuntimeError, MemoryError)) and 'out of memory' in str(error).lower()
+
+
+def free_memory():
+    """OOM 후 다음 시도 전에 메모리 정리"""
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def profile_key(model_name, precision):
+    """프로파일 항목 키 (예: 'upstage/SOLAR-10.7B-v1.0|8bit')"""
+    return f"{model_name}|{precision}"
+
+
+def load_batch_profile(profile_path=BATCH_PROFILE_FILE):
+    """저장된 batch_size 프로파일 불러오기"""
+    if not os.path.exists(profile_path):
+        return {}
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def known_batch_size(model_name, precision, profile_path=BATCH_PROFILE_FILE):
+    """프로파일에 저장된 batch_size (없으면 None)"""
+    entry = load_batch_profile(profile_path).get(profile_key(model_name, precision))
+    return entry['batch_size'] if entry else None
+
+
+def save_batch_size(model_name, precision, batch_size, source, profile_path=BATCH_PROFILE_FILE, **extra):
+    """
+    batch_size를 프로파일에 저장 (임시 파일에 쓴 뒤 교체)
+
+    Args:
+        source: 값의 출처 ('autotune' 또는 'oom_backoff')
+    """
+    profile = load_batch_profile(profile_path)
+    profile[profile_key(model_name, precision)] = {
+        "batch_size": batch_size,
+        "source": source,
+        "updated_at": datetime.now().isoformat(timespec='seconds'),
+        **extra
+    }
+    tmp_path = profile_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, profile_path)
+
+
+def make_forward_probe(lm, seq_len=DEFAULT_PROBE_SEQ_LEN):
+    """
+    HFLM으로 [batch_size, seq_len] 입력을 forward 하는 probe 함수 생성
+    lm_eval의 batch_size=auto 탐지와 같이 log_softmax까지 계산하여 채점 시 최대 메모리를 재현
+    """
+    import torch
+    import torch.nn.functional as F
+
+    seq_len = min(seq_len, lm.max_length)
+
+    def probe(batch_size):
+        input_ids = torch.ones((batch_size, seq_len), dtype=torch.long, device=lm.device)
+        try:
+            F.log_softmax(lm._model_call(input_ids), dim=-1)
+        finally:
+            del input_ids
+            free_memory()
+
+    return probe
+
+
+def simulate_memory_limit(probe, max_tokens, seq_len=DEFAULT_PROBE_SEQ_LEN):
+    """
+    batch_size × seq_len이 max_tokens를 넘으면 가상 OOM을 내는 probe로 감쌈
+    GPU 없이 CPU에서 autotune/backoff 동작을 확인할 때 사용
+    """
+    def limited_probe(batch_size):
+        if batch_size * seq_len > max_tokens:
+            raise SimulatedOutOfMemoryError(
+                f"CUDA out of memory (simulated): {batch_size} x {seq_len} > {max_tokens} tokens"
+            )
+        return probe(batch_size)
+
+    return limited_probe
+
+
+def autotune_batch_size(model_name, precision, probe, start_batch_size=1, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                        profile_path=BATCH_PROFILE_FILE):
+    """
+    OOM이 나지 않는 가장 큰 batch_size 탐색
+
+    프로파일에 값이 있으면 그 값부터 확인하고(실패 시 절반씩 줄임),
+    없으면 start_batch_size부터 두 배씩 늘리다가 OOM이 나면 이분 탐색
+
+    Args:
+        probe: probe(batch_size) - 해당 크기로 forward, OOM이면 예외 발생
+
+    Returns:
+        int: 찾은 batch_size (프로파일에 저장됨)
+    """
+    def fits(batch_size):
+        try:
+            probe(batch_size)
+            return True
+        except Exception as e:
+            if not is_oom_error(e):
+                raise
+            free_memory()
+            print(f"  ⚠️ OOM at batch_size={batch_size}")
+            return False
+
+    known = known_batch_size(model_name, precision, profile_path)
+    if known:
+        # 이전에 찾은 값부터 시작: 한 번 확인하고 실패하면 절반씩 줄임
+        batch_size = known
+        while not fits(batch_size):
+            if batch_size == 1:
+                raise RuntimeError(f"Out of memory even at batch_size=1: {model_name} ({precision})")
+            batch_size //= 2
+        if batch_size != known:
+            save_batch_size(model_name, precision, batch_size, 'autotune', profile_path)
+        print(f"🎯 Batch size from profile: {batch_size}")
+        return batch_size
+
+    # 두 배씩 늘리며 상한 탐색
+    good, bad = 0, None
+    batch_size = max(1, min(start_batch_size, max_batch_size))
+    while batch_size <= max_batch_size:
+        if fits(batch_size):
+            good = batch_size
+            batch_size *= 2
+        else:
+            bad = batch_size
+            break
+
+    if good == 0:
+        # 시작 값부터 OOM: 1까지 줄여가며 확인
+        batch_size = bad // 2
+        while batch_size >= 1 and not fits(batch_size):
+            batch_size //= 2
+        if batch_size < 1:
+            raise RuntimeError(f"Out of memory even at batch_size=1: {model_name} ({precision})")
+        good, bad = batch_size, batch_size * 2
+
+    # good(성공)과 bad(OOM) 사이 이분 탐색
+    while bad is not None and bad - good > 1:
+        middle = (good + bad) // 2
+        if fits(middle):
+            good = middle
+        else:
+            bad = middle
+
+    save_batch_size(model_name, precision, good, 'autotune', profile_path)
+    print(f"🎯 Autotuned batch size: {good} (saved to {profile_path})")
+    return good
+
+
+def run_with_oom_backoff(evaluate_fn, model_name, precision, batch_size, max_batch_tokens=None, min_batch_size=1,
+                         profile_path=BATCH_PROFILE_FILE):
+    """
+    평가 중 OOM이 나면 배치 크기를 절반으로 줄여 다시 실행
+    (토큰 예산 배치를 쓰는 경우 batch_size 대신 max_batch_tokens를 줄임)
+
+    Args:
+        evaluate_fn: evaluate_fn(batch_size, max_batch_tokens) - 평가 실행 함수
+        batch_size: 시작 batch_size (정수 또는 "autotune")
+        max_batch_tokens: 시작 토큰 예산 (None이면 고정 batch_size 배치)
+
+    Returns:
+        evaluate_fn의 반환값
+    """
+    while True:
+        try:
+            return evaluate_fn(batch_size, max_batch_tokens)
+        except Exception as e:
+            if not is_oom_error(e):
+                raise
+
+            if max_batch_tokens:
+                if max_batch_tokens <= DEFAULT_PROBE_SEQ_LEN:
+                    raise
+                max_batch_tokens //= 2
+                print(f"🔁 OOM during evaluation of {model_name}, retrying with max_batch_tokens={max_batch_tokens}")
+            else:
+                # "autotune"으로 시작한 경우 autotune이 저장한 값을 기준으로 줄임
+                current = (batch_size if isinstance(batch_size, int)
+                           else known_batch_size(model_name, precision, profile_path))
+                if not current or current <= min_batch_size:
+                    raise
+                batch_size = max(min_batch_size, current // 2)
+                save_batch_size(model_name, precision, batch_size, 'oom_backoff', profile_path)
+                print(f"🔁 OOM during evaluation of {model_name}, retrying with batch_size={batch_size}")
+
+        # 메모리 정리는 except 블록을 벗어난 뒤에 함
+        # (except 안에서는 예외의 traceback이 실패한 평가의 프레임(모델, KV 캐시, activation)을 잡고 있어 해제되지 않음)
+        free_memory()
+
+
+if __name__ == "__main__":
+    # CPU에서 작은 무작위 모델과 가상 메모리 한도로 autotune 확인
+    import tempfile
+    from evaluate_model import create_lm
+    from synthetic import make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    profile_path = os.path.join(tempfile.mkdtemp(), BATCH_PROFILE_FILE)
+    lm = create_lm(f"pretrained={model_dir},dtype=float32", batch_size=1, device="cpu")
+
+    probe = simulate_memory_limit(make_forward_probe(lm, seq_len=128), max_tokens=128 * 37, seq_len=128)
+    first = autotune_batch_size(model_dir, 'float32', probe, profile_path=profile_path)
+    second = autotune_batch_size(model_dir, 'float32', probe, profile_path=profile_path)
+    print(f"first run: {first}, second run (from profile): {second}")
@@ -2,11 +2,56 @@
 # 여러 모델을 한 번에 평가하는 배치 스크립트
 # WandB 프로젝트에 모든 모델 결과를 로깅
 
-from evaluate_model import evaluate_model
+from evaluate_model import evaluate_model, parse_model_config
+from autotune import run_with_oom_backoff
+from scheduler import cpu_workers, gpu_workers, make_jobs, run_parallel
+# prompt_cache / sample_log(numpy, pyarrow)는 평가할 때만 import (cli.py batch --list / --validate는 바로 시작)
 
 # WandB 프로젝트 설정 (선택)
 WANDB_PROJECT = "kmmlu-evaluation"  # None으로 설정하면 WandB 비활성화
 
+# 배치 크기: "autotune"이면 모델+정밀도별로 가능한 최대 크기를 찾아 kmmlu_batch_profile.json에 저장
+# 평가 중 OOM이 나면 모델을 건너뛰지 않고 batch_size를 절반으로 줄여 다시 시도
+BATCH_SIZE = "autotune"
+
+# 정밀도별 배치당 토큰 예산 (기본값 None: 위의 BATCH_SIZE 사용)
+# 설정하면 예산이 있는 정밀도는 BATCH_SIZE(autotune 포함) 대신 예산으로 배치를 묶고, OOM 시 예산을 절반으로 줄임
+# 8bit 모델은 float16과 다른 배치 형태에서 OOM이 나므로 정밀도마다 따로 조정, 예:
+# MAX_BATCH_TOKENS = {"8bit": 16384, "4bit": 24576, "float16": 32768, "bfloat16": 32768}
+MAX_BATCH_TOKENS = None
+
+# 토큰화 프롬프트 캐시 폴더 (None으로 설정하면 비활성화)
+# 같은 토크나이저를 쓰는 모델이나 같은 모델의 다른 정밀도는 첫 평가에서 저장한 토큰화 결과를 재사용
+PROMPT_CACHE = 'kmmlu_prompt_cache'  # prompt_cache.PROMPT_CACHE_DIR
+
+# 문항별 예측 로그 폴더 (None으로 설정하면 비활성화)
+# 모델마다 <폴더>/<표시 이름>.parquet에 문항별 정답/선택지/loglikelihood를 기록 (python sample_log.py로 조회)
+SAMPLE_LOG = 'kmmlu_samples'  # sample_log.SAMPLE_LOG_DIR
+
+# 추론 모델 생성형 평가 (None으로 설정하면 비활성화)
+# GENERATIVE_MODELS에 있는 모델은 loglikelihood 평가 후 문항당 GENERATIVE_TOKEN_BUDGET 토큰 안에서
+# 풀이를 생성해 답을 채점하고 "<표시이름>-gen"으로 따로 기록 (generative.py 참고)
+GENERATIVE_TOKEN_BUDGET = None  # 예: 1024
+GENERATIVE_MODELS = {"EXAONE-Deep-7.8B", "DeepSeek-R1-Qwen3-8B"}
+
+# 병렬 평가 설정
+# None: 한 모델씩 순서대로 평가 (기존 방식)
+# "gpu": GPU마다 worker 하나를 띄워 모델들을 동시에 평가 (예상 메모리가 들어가는 GPU에 배정)
+# 정수 N: CPU worker N개로 평가 (코어를 worker 수로 나눠 배정)
+PARALLEL_WORKERS = None
+MAX_RETRIES = 1  # 병렬 평가에서 실패한 모델을 다시 시도할 횟수
+
+# 가중치 미리 받기 (None으로 설정하면 비활성화)
+# 한 모델씩 평가할 때 큐 전체의 가중치를 백그라운드 스레드 N개로 미리 다운로드/확인하여
+# 현재 모델을 평가하는 동안 다음 모델을 받음 (다운로드 시간은 elapsed_time에 들어가지 않음, prefetch.py 참고)
+PREFETCH_WORKERS = 2
+
+# 상주 평가 서버 주소 (None이면 이 프로세스에서 직접 평가)
+# 서버(python model_server.py serve)에 모델을 올려 둔 채로 평가하므로 같은 모델을 다시 평가할 때 로드를 건너뜀
+# 예: EVAL_SERVER = SERVER_ADDRESS  (model_server.SERVER_ADDRESS = ('localhost', 6150))
+# 인증 키는 서버가 만든 키 파일(model_server.SERVER_AUTHKEY_FILE) 또는 KMMLU_SERVER_AUTHKEY 환경 변수에서 읽음
+EVAL_SERVER = None
+
 # 평가할 모델들의 리스트
 # 각 항목은 (모델경로, 로딩설정, 표시이름) 튜플
 models = [
@@ -33,31 +78,115 @@ models = [
     # 여기에 추가 모델들을 계속 추가할 수 있음...
 ]
 
-# 모델 리스트를 순회하며 하나씩 평가
-for model_name, model_args, label in models:
-    try:
+
+def entry_kwargs(model_name, model_args, label):
+    """models 항목 하나의 evaluate_model 인자 (직접 평가와 평가 서버 작업에서 공통으로 사용)"""
+    precision = parse_model_config(model_args)
+    return {
+        "model_name": model_name,
+        "model_args": model_args,
+        "label": label,
+        "batch_size": BATCH_SIZE,
+        "max_batch_tokens": MAX_BATCH_TOKENS.get(precision) if MAX_BATCH_TOKENS else None,
+        "wandb_project": WANDB_PROJECT,  # WandB 프로젝트 (None이면 비활성화)
         # WandB 실행 이름은 라벨을 소문자+하이픈으로 변환
-        wandb_run_name = label.lower().replace('/', '-').replace('.', '-')
-        
-        # 모델 평가 실행
-        evaluate_model(
-            model_name=model_name,
-            model_args=model_args,
-            label=label,
-            wandb_project=WANDB_PROJECT,  # WandB 프로젝트 (None이면 비활성화)
-            wandb_run_name=wandb_run_name
-        )
-        
-        print(f"✅ Successfully evaluated: {label}\n")
-        
-    except Exception as e:
-        # 에러가 발생해도 다음 모델 평가를 계속 진행
-        print(f"❌ Error with {label}: {e}")
-        continue  # 다음 모델로 넘어감
-
-print("\n" + "="*60)
-print("🎉 Batch evaluation complete!")
-print(f"Results saved to kmmlu_results.csv")
-if WANDB_PROJECT:
-    print(f"WandB results: https://wandb.ai/<your-username>/{WANDB_PROJECT}")
-print("="*60)
\ No newline at end of file
+        "wandb_run_name": label.lower().replace('/', '-').replace('.', '-'),
+        "prompt_cache_dir": PROMPT_CACHE,
+        "sample_log_dir": SAMPLE_LOG
+    }
+
+
+def evaluate_entry(model_name, model_args, label, device="cuda:0", prefetch_stats=None):
+    """
+    모델 하나를 평가 (OOM 시 batch_size 또는 토큰 예산을 줄여 재시도)
+    병렬 worker에서도 호출되므로 모듈 최상위 함수로 정의
+    prefetch_stats: WeightPrefetcher.wait 결과 (미리 받은 경우 evaluate_model이 다시 확인하지 않음)
+    """
+    kwargs = entry_kwargs(model_name, model_args, label)
+    result_data = run_with_oom_backoff(
+        lambda batch_size, max_batch_tokens: evaluate_model(
+            **{**kwargs, "batch_size": batch_size, "max_batch_tokens": max_batch_tokens},
+            device=device, prefetch_stats=prefetch_stats
+        ),
+        model_name=model_name,
+        precision=parse_model_config(model_args),
+        batch_size=kwargs["batch_size"],
+        max_batch_tokens=kwargs["max_batch_tokens"]
+    )
+    if GENERATIVE_TOKEN_BUDGET and label in GENERATIVE_MODELS:
+        from generative import evaluate_generative
+        evaluate_generative(model_name, model_args, f"{label}-gen", token_budget=GENERATIVE_TOKEN_BUDGET,
+                            device=device)
+    return result_data
+
+
+def submit_to_server(models, address):
+    """
+    models 목록을 상주 평가 서버로 보내 차례로 평가 (서버가 OOM 재시도와 모델 캐시를 처리)
+    
+    Returns:
+        dict: {표시이름: 서버 응답}
+    """
+    from model_server import EvalClient, print_cache_stats
+    
+    client = EvalClient(address)
+    replies = {}
+    for model_name, model_args, label in models:
+        print(f"📨 Submitting {label} to eval server {address[0]}:{address[1]}")
+        replies[label] = client.evaluate(**entry_kwargs(model_name, model_args, label))
+        if replies[label]["status"] == "ok":
+            lookup = replies[label]["result"].get("model_cache", {})
+            print(f"✅ Successfully evaluated: {label} (model cache {'hit' if lookup.get('hit') else 'miss'})\n")
+        else:
+            print(f"❌ Error with {label}: {replies[label]['error']}")
+    if replies:
+        print_cache_stats(replies[label]["cache"])
+    return replies
+
+
+def run_batch(models):
+    """models 목록을 설정(EVAL_SERVER, PARALLEL_WORKERS, PREFETCH_WORKERS)에 맞게 평가"""
+    if EVAL_SERVER is not None:
+        # 상주 평가 서버에 작업 제출 (모델 로드는 서버의 모델 캐시에서 재사용)
+        submit_to_server(models, EVAL_SERVER)
+    elif PARALLEL_WORKERS is None:
+        # 큐 전체의 가중치를 백그라운드에서 미리 받으면서 모델을 하나씩 평가
+        prefetcher = None
+        if PREFETCH_WORKERS:
+            from prefetch import WeightPrefetcher
+            prefetcher = WeightPrefetcher(PREFETCH_WORKERS)
+            prefetcher.submit_all(models)
+        try:
+            for model_name, model_args, label in models:
+                try:
+                    prefetch_stats = prefetcher.wait(model_args) if prefetcher else None
+                    evaluate_entry(model_name, model_args, label, prefetch_stats=prefetch_stats)
+                    print(f"✅ Successfully evaluated: {label}\n")
+
+                except Exception as e:
+                    # 에러가 발생해도 다음 모델 평가를 계속 진행
+                    print(f"❌ Error with {label}: {e}")
+                    continue  # 다음 모델로 넘어감
+        finally:
+            if prefetcher:
+                prefetcher.close(cancel_pending=True)
+    else:
+        # worker 프로세스들에 모델을 나눠 동시에 평가 (결과 파일 쓰기는 파일 잠금으로 보호됨)
+        workers = gpu_workers() if PARALLEL_WORKERS == "gpu" else cpu_workers(PARALLEL_WORKERS)
+        outcomes = run_parallel(make_jobs(models), workers, evaluate_entry, max_retries=MAX_RETRIES)
+        for label, outcome in outcomes.items():
+            if outcome["status"] == "ok":
+                print(f"✅ Successfully evaluated: {label} ({outcome['worker']})")
+            else:
+                print(f"❌ Error with {label}: {outcome['error']}")
+
+    print("\n" + "="*60)
+    print("🎉 Batch evaluation complete!")
+    print(f"Results saved to kmmlu_results.csv")
+    if WANDB_PROJECT:
+        print(f"WandB results: https://wandb.ai/<your-username>/{WANDB_PROJECT}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    run_batch(models)
@@ -0,0 +1,297 @@
+# benchmark.py
+# 평가 파이프라인 성능 벤치마크 (CPU + 오프라인, 재현 가능)
+# 작은 무작위 Llama 모델과 KMMLU 형태의 합성 데이터로 모델 로드, 배치 크기별 채점 처리량,
+# evaluate_model 전체 실행, 결과 저장/비교 경로(저장된 결과 10 / 1k / 10k개)를 측정하고 JSON으로 저장
+#
+# 사용 예:
+#   python benchmark.py --output bench.json                     # 측정
+#   python benchmark.py --output new.json --compare bench.json  # 기준 결과 대비 회귀 확인
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import evaluate_model as em
+from reporting import flush_reports
+from synthetic import make_offline_evaluate, make_synthetic_docs, make_synthetic_requests, make_tiny_model
+
+# === 전역 상수 정의 ===
+BENCHMARK_FILE = 'kmmlu_benchmark.json'
+DEFAULT_BATCH_SIZES = [1, 4, 16]
+DEFAULT_STORE_SIZES = [10, 1_000, 10_000]
+DEFAULT_REPEATS = 3
+REGRESSION_THRESHOLD = 0.2  # 기준 대비 20% 이상 나빠지면 회귀로 표시
+
+
+def measure(fn, repeats=DEFAULT_REPEATS):
+    """
+    fn을 여러 번 실행하여 소요 시간(초) 측정
+
+    Returns:
+        dict: {"seconds": 중앙값, "runs": [각 실행 시간]}
+    """
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(runs), "runs": runs}
+
+
+def metric(value, unit, higher_is_better=False, **extra):
+    """벤치마크 항목 하나 (비교 모드에서 value와 방향을 사용)"""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, **extra}
+
+
+def environment_info():
+    """측정 환경 (비교 시 환경이 다르면 함께 표시)"""
+    import torch
+    import transformers
+    import lm_eval
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "lm_eval": lm_eval.__version__
+    }
+
+
+def bench_model_load(model_dir, repeats=DEFAULT_REPEATS):
+    """모델 + 토크나이저 로드 시간 (CPU, float32)"""
+    timing = measure(lambda: em.create_lm(f"pretrained={model_dir},dtype=float32", batch_size=1, device="cpu"),
+                     repeats)
+    return {"model_load": metric(timing["seconds"], "s", runs=timing["runs"])}
+
+
+def bench_scoring(model_dir, batch_sizes=DEFAULT_BATCH_SIZES, n_subjects=3, n_questions=8, repeats=DEFAULT_REPEATS):
+    """배치 크기별 loglikelihood 채점 처리량 (요청/초)"""
+    lm = em.create_lm(f"pretrained={model_dir},dtype=float32", batch_size=1, device="cpu")
+    docs = make_synthetic_docs(subjects=[f"subject_{i}" for i in range(n_subjects)], n_questions=n_questions)
+    requests = make_synthetic_requests(docs)
+
+    results = {}
+    for batch_size in batch_sizes:
+        lm.batch_size_per_gpu = batch_size
+        timing = measure(lambda: lm.loglikelihood(requests), repeats)
+        results[f"scoring_bs{batch_size}"] = metric(
+            len(requests) / timing["seconds"], "requests/s", higher_is_better=True,
+            requests=len(requests), runs=timing["runs"]
+        )
+    return results
+
+
+def bench_end_to_end(model_dir, n_questions=4, batch_size=8):
+    """
+    evaluate_model 전체 실행 (오프라인 합성 KMMLU, 임시 폴더에 결과 저장)
+    lm_eval simple_evaluate만 합성 평가 함수로 바꾸고 나머지 경로는 그대로 실행
+    """
+    offline_evaluate = make_offline_evaluate(n_questions=n_questions)
+    original_evaluate = em.simple_evaluate
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        em.simple_evaluate = offline_evaluate
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                result_data = em.evaluate_model(model_dir, f"pretrained={model_dir},dtype=float32", "benchmark-tiny",
+                                                batch_size=batch_size, device="cpu")
+                seconds = time.perf_counter() - start
+                # 결과 저장은 보고 스레드에서 실행되므로 임시 폴더를 벗어나기 전에 끝까지 처리
+                flush_reports()
+        finally:
+            em.simple_evaluate = original_evaluate
+            os.chdir(cwd)
+
+    profile = result_data["profile"]
+    results = {"end_to_end": metric(seconds, "s")}
+    for name, phase_seconds in profile["phases"].items():
+        results[f"end_to_end_{name}"] = metric(phase_seconds, "s")
+    results["end_to_end_tokens_per_sec"] = metric(profile["tokens_per_sec"], "tokens/s", higher_is_better=True)
+    return results
+
+
+def make_fake_results(n, seed=0):
+    """저장소 벤치마크용 result_data n개 (45개 과목 순위 포함)"""
+    rnd = random.Random(seed)
+    subjects = list(em.SUBJECT_TO_CATEGORY.items())
+    results = []
+    for i in range(n):
+        ranked = sorted(
+            ({"name": name.replace('_', ' ').title(), "score": rnd.random(), "category": category}
+             for name, category in subjects),
+            key=lambda s: s['score']
+        )
+        results.append({
+            "model": f"bench-model-{i}",
+            "model_path": f"bench/model-{i}",
+            "overall": rnd.random(),
+            "stem": rnd.random(),
+            "humss": rnd.random(),
+            "applied": rnd.random(),
+            "other": rnd.random(),
+            "best": {"name": ranked[-1]['name'], "score": ranked[-1]['score']},
+            "worst": {"name": ranked[0]['name'], "score": ranked[0]['score']},
+            "all_subjects_ranked": ranked,
+            "elapsed_time": "1m 0s",
+            "batch_size": rnd.choice([4, 8, 16]),
+            "precision": rnd.choice(["8bit", "4bit", "float16"])
+        })
+    return results
+
+
+def bench_persistence(store_sizes=DEFAULT_STORE_SIZES, repeats=DEFAULT_REPEATS):
+    """
+    결과 저장/비교 경로 시간 (저장된 결과 수별)
+    - get_subject_category: 45개 과목 분류 1회
+    - save_to_csv: CSV 보기 전체 작성
+    - store_result: 실행 1건 추가 + CSV/JSON 보기 갱신 (이전 append_to_leaderboard 경로)
+    - compare_models: 비교 표 출력 (출력은 버림)
+    """
+    from compare_models import compare_models
+
+    tasks = [f"kmmlu_{subject}" for subject in em.SUBJECT_TO_CATEGORY]
+    timing = measure(lambda: [em.get_subject_category(task) for task in tasks], repeats)
+    results = {"get_subject_category": metric(timing["seconds"], "s", calls=len(tasks))}
+
+    cwd = os.getcwd()
+    for size in store_sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)
+            try:
+                stored = make_fake_results(size)
+                store = em.ResultStore(em.RESULT_DB)
+                store.append_many(stored)
+                store.close()
+                extra = make_fake_results(repeats, seed=size)
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    csv_timing = measure(lambda: em.save_to_csv(stored), repeats)
+                    store_timing = measure(lambda: em.store_result(extra.pop()), repeats)
+                    compare_timing = measure(compare_models, repeats)
+            finally:
+                os.chdir(cwd)
+
+        results[f"save_to_csv_{size}"] = metric(csv_timing["seconds"], "s", runs=csv_timing["runs"])
+        results[f"store_result_{size}"] = metric(store_timing["seconds"], "s", runs=store_timing["runs"])
+        results[f"compare_models_{size}"] = metric(compare_timing["seconds"], "s", runs=compare_timing["runs"])
+    return results
+
+
+def run_benchmarks(model_dir=None, batch_sizes=DEFAULT_BATCH_SIZES, store_sizes=DEFAULT_STORE_SIZES,
+                   repeats=DEFAULT_REPEATS, seed=0):
+    """
+    전체 벤치마크 실행
+
+    Returns:
+        dict: {"environment": ..., "created_at": ..., "benchmarks": {이름: {"value", "unit", "higher_is_better"}}}
+    """
+    import torch
+
+    random.seed(seed)
+    torch.manual_seed(seed)
+    model_dir = model_dir or make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+
+    benchmarks = {}
+    for name, run in [
+        ("model load", lambda: bench_model_load(model_dir, repeats)),
+        ("scoring", lambda: bench_scoring(model_dir, batch_sizes, repeats=repeats)),
+        ("end to end", lambda: bench_end_to_end(model_dir)),
+        ("persistence", lambda: bench_persistence(store_sizes, repeats))
+    ]:
+        print(f"⏱️ Benchmark: {name}")
+        benchmarks.update(run())
+
+    return {
+        "environment": environment_info(),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "benchmarks": benchmarks
+    }
+
+
+def compare_benchmarks(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    기준 결과 대비 변화율 계산 (나빠진 쪽이 양수)
+
+    Returns:
+        list: [{"name", "baseline", "current", "change", "regression"}, ...]
+    """
+    rows = []
+    for name, entry in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if not base or not base["value"]:
+            continue
+        change = (entry["value"] - base["value"]) / base["value"]
+        if entry["higher_is_better"]:
+            change = -change
+        rows.append({
+            "name": name,
+            "unit": entry["unit"],
+            "baseline": base["value"],
+            "current": entry["value"],
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def print_comparison(rows, threshold=REGRESSION_THRESHOLD):
+    """비교 결과 표 출력"""
+    from tabulate import tabulate
+
+    print(tabulate(
+        [[("❌ " if row["regression"] else "") + row["name"], f"{row['baseline']:.4g}", f"{row['current']:.4g}",
+          row["unit"], f"{row['change']:+.1%}"] for row in rows],
+        headers=["Benchmark", "Baseline", "Current", "Unit", "Worse by"],
+        tablefmt="grid"
+    ))
+    regressions = [row["name"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\n✅ No regressions over {threshold:.0%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="CPU benchmark for the KMMLU evaluation pipeline")
+    parser.add_argument("--output", default=BENCHMARK_FILE, help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--store-sizes", type=int, nargs="+", default=DEFAULT_STORE_SIZES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (fix for comparable numbers)")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    report = run_benchmarks(batch_sizes=args.batch_sizes, store_sizes=args.store_sizes, repeats=args.repeats)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Benchmark results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != report["environment"]:
+            print("⚠️ Baseline was measured in a different environment; compare with care")
+        if print_comparison(compare_benchmarks(report, baseline, args.threshold), args.threshold):
+            sys.exit(1)
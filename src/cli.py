@@ -0,0 +1,178 @@
+# cli.py
+# KMMLU 평가 도구의 통합 명령줄 진입점
+# 무거운 모듈(torch, transformers, lm_eval, pyarrow)은 각 명령이 실제로 필요할 때만 import하므로
+# 결과 조회나 큐 확인 같은 명령은 모델/라이브러리 로드를 기다리지 않고 바로 시작
+# - evaluate: 모델 하나 평가 (evaluate_model.evaluate_model)
+# - batch: batch_evaluate.models 큐 평가 (--list로 큐 확인, --validate로 설정과 가중치 준비 상태 확인)
+# - compare: 저장된 결과 비교 표 (compare_models.compare_models)
+# - prefetch: 큐의 가중치를 백그라운드 스레드 풀로 미리 다운로드/확인 (prefetch.py)
+#
+# 사용 예:
+#   python cli.py evaluate upstage/SOLAR-10.7B-v1.0 --model-args "pretrained=upstage/SOLAR-10.7B-v1.0,load_in_8bit=True"
+#   python cli.py batch --list
+#   python cli.py batch --validate
+#   python cli.py batch
+#   python cli.py compare --precision 8bit
+#   python cli.py prefetch --workers 4
+
+import argparse
+import sys
+
+
+def _batch_size(value):
+    """--batch-size 값 (정수 또는 "autotune")"""
+    return value if value == "autotune" else int(value)
+
+
+def cmd_evaluate(args):
+    from evaluate_model import evaluate_model
+    evaluate_model(
+        model_name=args.model,
+        model_args=args.model_args or f"pretrained={args.model}",
+        label=args.label or args.model,
+        batch_size=args.batch_size,
+        device=args.device,
+        wandb_project=args.wandb_project,
+        scoring_mode=args.scoring_mode,
+        max_batch_tokens=args.max_batch_tokens,
+        prompt_cache_dir=args.prompt_cache_dir,
+        sample_log_dir=args.sample_log_dir,
+        quick_ci_width=args.quick_ci_width,
+        profile_subjects=args.profile_subjects
+    )
+
+
+def list_queue(models):
+    """평가 큐 (표시이름, 정밀도, 로딩설정) 출력"""
+    from evaluate_model import parse_model_config
+    print(f"📋 {len(models)} models in queue:")
+    for i, (_, model_args, label) in enumerate(models, 1):
+        print(f"  {i:>2}. {label:<32} {parse_model_config(model_args):<12} {model_args}")
+
+
+def validate_queue(models):
+    """
+    평가 큐 설정 확인 (네트워크 요청 없음)
+    표시이름 중복, model_args 형식(pretrained= 또는 base_url=), 정밀도 인식 여부, 가중치 준비 상태
+
+    Returns:
+        int: 오류 수 (가중치가 아직 없는 것은 오류가 아니라 prefetch 대상으로 표시)
+    """
+    from evaluate_model import parse_model_config
+    from prefetch import weight_status
+
+    errors = 0
+    seen = set()
+    for model_name, model_args, label in models:
+        problems = []
+        if label in seen:
+            problems.append("duplicate label")
+        seen.add(label)
+        parts = [part for part in model_args.split(',') if part]
+        if any('=' not in part for part in parts):
+            problems.append("model_args entries must be key=value")
+        keys = {part.split('=', 1)[0] for part in parts}
+        if not keys & {'pretrained', 'base_url'}:
+            problems.append("model_args needs pretrained= or base_url=")
+        precision = parse_model_config(model_args)
+        if precision == 'unknown':
+            problems.append("precision not recognized (set dtype= or load_in_8bit/4bit=True)")
+        status = "-"
+        if not problems:
+            try:
+                status = weight_status(model_args)
+            except Exception as e:
+                problems.append(f"weights: {type(e).__name__}: {e}")
+        if status == "incomplete":
+            problems.append("weights incomplete (run: python cli.py prefetch)")
+
+        if problems:
+            errors += 1
+            print(f"❌ {label}: {'; '.join(problems)}")
+        else:
+            hint = " (run: python cli.py prefetch)" if status == "missing" else ""
+            print(f"✅ {label}: {precision}, weights {status}{hint}")
+    print(f"\n{len(models) - errors}/{len(models)} models valid")
+    return errors
+
+
+def cmd_batch(args):
+    # batch_evaluate는 설정 모듈이므로 --list / --validate는 평가 라이브러리를 import하지 않음
+    import batch_evaluate
+
+    models = batch_evaluate.models
+    if args.only:
+        models = [entry for entry in models if entry[2] in args.only]
+    if args.list:
+        list_queue(models)
+    elif args.validate:
+        sys.exit(1 if validate_queue(models) else 0)
+    else:
+        batch_evaluate.run_batch(models)
+
+
+def cmd_compare(args):
+    from compare_models import compare_models
+    compare_models(precision=args.precision, family=args.family, since=args.since, until=args.until,
+                   sample_dir=None if args.no_significance else args.sample_dir)
+
+
+def cmd_prefetch(args):
+    import batch_evaluate
+    from prefetch import prefetch_models
+
+    models = batch_evaluate.models
+    if args.only:
+        models = [entry for entry in models if entry[2] in args.only]
+    results = prefetch_models(models, args.workers)
+    sys.exit(1 if any(stats is None for stats in results.values()) else 0)
+
+
+def build_parser():
+    # 기본값은 각 모듈을 import하지 않도록 여기서 문자열로 지정 (모듈 상수와 같은 값)
+    parser = argparse.ArgumentParser(description="KMMLU evaluation toolkit")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="evaluate one model")
+    evaluate_parser.add_argument("model", help="model path or Hub repo")
+    evaluate_parser.add_argument("--model-args", help='lm_eval model_args (default: "pretrained=<model>")')
+    evaluate_parser.add_argument("--label", help="display name (default: model)")
+    evaluate_parser.add_argument("--batch-size", type=_batch_size, default=16, help='integer or "autotune"')
+    evaluate_parser.add_argument("--device", default="cuda:0")
+    evaluate_parser.add_argument("--wandb-project")
+    evaluate_parser.add_argument("--scoring-mode", default="default",
+                                 choices=["default", "per_option", "single_pass", "prefix_cache"])
+    evaluate_parser.add_argument("--max-batch-tokens", type=lambda v: v if v == "auto" else int(v))
+    evaluate_parser.add_argument("--prompt-cache-dir", default="kmmlu_prompt_cache")
+    evaluate_parser.add_argument("--sample-log-dir", default="kmmlu_samples")
+    evaluate_parser.add_argument("--quick-ci-width", type=float, help="approximate eval CI width (e.g. 0.02)")
+    evaluate_parser.add_argument("--profile-subjects", action="store_true",
+                                 help="score subjects one at a time to record per-subject throughput and memory")
+    evaluate_parser.set_defaults(func=cmd_evaluate)
+
+    batch_parser = subparsers.add_parser("batch", help="evaluate the batch_evaluate.models queue")
+    batch_parser.add_argument("--only", nargs="+", help="labels to include (default: whole queue)")
+    mode = batch_parser.add_mutually_exclusive_group()
+    mode.add_argument("--list", action="store_true", help="print the queue and exit")
+    mode.add_argument("--validate", action="store_true", help="check the queue config and local weights and exit")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    compare_parser = subparsers.add_parser("compare", help="compare stored results")
+    compare_parser.add_argument("--precision")
+    compare_parser.add_argument("--family")
+    compare_parser.add_argument("--since")
+    compare_parser.add_argument("--until")
+    compare_parser.add_argument("--sample-dir", default="kmmlu_samples")
+    compare_parser.add_argument("--no-significance", action="store_true", help="skip the paired bootstrap ranks")
+    compare_parser.set_defaults(func=cmd_compare)
+
+    prefetch_parser = subparsers.add_parser("prefetch", help="download or verify weights for the queue")
+    prefetch_parser.add_argument("--only", nargs="+", help="labels to include (default: whole queue)")
+    prefetch_parser.add_argument("--workers", type=int, default=2)
+    prefetch_parser.set_defaults(func=cmd_prefetch)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
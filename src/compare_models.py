@@ -1,70 +1,194 @@
 # compare_models.py
 from tabulate import tabulate
-import json  
 import os
+import pandas as pd
+
+from leaderboard import DEFAULT_PAGE_SIZE, LeaderboardQuery
+from result_store import RESULT_DB, ResultStore
 
 JSON_LEADERBOARD = 'kmmlu_leaderboard.json'  
+SAMPLE_LOG_DIR = 'kmmlu_samples'  # sample_log.SAMPLE_LOG_DIR (pyarrow는 유의성 순위를 계산할 때만 import)
+
+# 비교 표에 필요한 열만 결과 저장소에서 읽음
+TABLE_COLUMNS = ['model', 'overall', 'best_name', 'best_score', 'worst_name', 'worst_score',
+                 'stem', 'humss', 'applied', 'other', 'elapsed_time', 'batch_size', 'precision',
+                 'scoring_mode', 'questions_per_sec', 'load_seconds', 'tokens_per_sec',
+                 'peak_host_memory_mb', 'peak_device_memory_mb']
+
+# 빠른 근사 평가(quick-eval) 표에 필요한 열
+APPROXIMATE_COLUMNS = ['model', 'overall', 'overall_ci_low', 'overall_ci_high', 'questions_evaluated',
+                       'stem', 'humss', 'applied', 'other', 'elapsed_time', 'precision']
+
+def _value(value, default='N/A'):
+    """결측값(None/NA)을 기본값으로 표시"""
+    return default if pd.isna(value) else value
+
+def format_throughput(row):
+    """채점 처리량(문항/초)과 채점 모드 표시 (기록이 없는 이전 결과는 N/A)"""
+    if pd.isna(row.get('questions_per_sec')):
+        return 'N/A'
+    return f"{row['questions_per_sec']:.1f}\n({row['scoring_mode']})"
 
-def compare_models():
-    """저장된 모든 모델 비교"""
+def format_profile(row):
+    """모델 로드 시간, 채점 tokens/sec, 최대 메모리(GPU가 있으면 device, 없으면 host) 표시"""
+    if pd.isna(row.get('tokens_per_sec')):
+        return 'N/A', 'N/A', 'N/A'
+    peak_mb = row['peak_host_memory_mb'] if pd.isna(row['peak_device_memory_mb']) else row['peak_device_memory_mb']
+    return f"{row['load_seconds']:.0f}s", f"{row['tokens_per_sec']:,.0f}", f"{peak_mb / 1024:.1f}GB"
+
+def format_significance_rank(row, rank_groups):
+    """
+    문항별 로그로 구한 유의성 순위 (예: "#2 (±0.4%)", 로그가 없는 모델은 N/A)
+    같은 순위의 모델들은 점수 차이가 유의하지 않음 (significance.PairedBootstrap.rank_groups)
+    """
+    group = rank_groups.get(row['model'])
+    if group is None:
+        return 'N/A'
+    return f"#{group['rank']}\n(±{(group['ci_high'] - group['ci_low']) / 2:.1%})"
+
+def format_rank_band(row, exact_overall):
+    """
+    근사 결과의 신뢰구간이 전체 평가 순위에서 차지하는 구간 (예: "#2-#5")
     
-    if not os.path.exists(JSON_LEADERBOARD):
-        print("❌ No results found! Run evaluate_model.py first.")
-        return
+    Args:
+        exact_overall: 전체 평가 결과의 overall 점수 (내림차순 정렬된 리스트)
+    """
+    if pd.isna(row.get('overall_ci_low')):
+        return 'N/A'
+    best = sum(score > row['overall_ci_high'] for score in exact_overall) + 1
+    worst = sum(score > row['overall_ci_low'] for score in exact_overall) + 1
+    return f"#{best}" if best == worst else f"#{best}-#{worst}"
+
+def print_approximate_results(query, filters, page_size=DEFAULT_PAGE_SIZE):
+    """
+    빠른 근사 평가 결과를 순위 없이 별도 표로 출력
+    (표본 평가 점수는 전체 평가와 같은 순위표에 넣지 않고, 신뢰구간이 겹치는 전체 평가 순위 구간만 표시)
+    """
+    exact_overall = query.runs(columns=['overall'], approximate=False, **filters)['overall'].dropna().tolist()
     
-    # JSON 읽기 
-    with open(JSON_LEADERBOARD, 'r', encoding='utf-8') as f:
-        results = json.load(f)  
+    print(f"\n⚡ Quick-eval (approximate, not ranked): {query.count(approximate=True, **filters)} models\n")
+    for _, page in query.pages(page_size=page_size, columns=APPROXIMATE_COLUMNS, approximate=True, **filters):
+        table_data = []
+        for r in page.to_dict('records'):
+            ci = ('N/A' if pd.isna(r['overall_ci_low'])
+                  else f"{r['overall_ci_low']:.1%}-{r['overall_ci_high']:.1%}")
+            table_data.append([
+                r['model'][:30],
+                f"~{r['overall']:.1%}",
+                ci,
+                format_rank_band(r, exact_overall),
+                f"{r['stem']:.1%}",
+                f"{r['humss']:.1%}",
+                f"{r['applied']:.1%}",
+                f"{r['other']:.1%}",
+                _value(r['questions_evaluated']),
+                _value(r['elapsed_time']),
+                _value(r['precision'])
+            ])
+        
+        print(tabulate(
+            table_data,
+            headers=["Model", "Overall", "CI", "Rank Band", "STEM", "HUMSS", "Applied", "Other",
+                     "Questions", "Time", "Precision"],
+            tablefmt="grid"
+        ))
+
+def compare_models(precision=None, family=None, since=None, until=None, page_size=DEFAULT_PAGE_SIZE,
+                   sample_dir=SAMPLE_LOG_DIR):
+    """
+    저장된 모든 모델 비교 (모델별 최신 결과, overall 점수 순)
+    빠른 근사 평가(quick-eval) 결과는 순위에 넣지 않고 신뢰구간과 함께 별도 표로 출력
+    
+    Args:
+        precision / family / since / until: 리더보드 필터 (leaderboard.LeaderboardQuery 참고)
+        page_size: 표 하나에 출력할 모델 수 (페이지 단위로 읽어 출력하므로 모델 수와 관계없이 메모리 일정)
+        sample_dir: 문항별 로그 폴더 (로그가 있는 모델은 paired bootstrap 유의성 순위와 최고-최저 차이의 신뢰구간 표시,
+                    None이면 사용하지 않음)
+    """
+    
+    if not os.path.exists(RESULT_DB):
+        if not os.path.exists(JSON_LEADERBOARD):
+            print("❌ No results found! Run evaluate_model.py first.")
+            return
+        # 결과 저장소 도입 전의 JSON 리더보드만 있는 경우 저장소로 가져옴
+        store = ResultStore(RESULT_DB)
+        store.import_leaderboard(JSON_LEADERBOARD)
+        store.close()
+    
+    query = LeaderboardQuery(RESULT_DB)
+    filters = {"precision": precision, "family": family, "since": since, "until": until}
+    total = query.count(approximate=False, **filters)
+    approximate_total = query.count(approximate=True, **filters)
     
-    if not results:
+    if not total and not approximate_total:
         print("❌ No valid results found!")
+        query.close()
         return
     
-    # overall 점수로 정렬
-    results.sort(key=lambda x: x['overall'], reverse=True)
-    
     print("\n" + "="*140)
     print(f"{'KMMLU MODEL COMPARISON':^140}")
     print("="*140)
-    print(f"Total Models: {len(results)}\n")
+    print(f"Total Models: {total}\n")
     
-    table_data = []
-    for i, r in enumerate(results, 1):
-        rank = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"#{i}"
-        
-        table_data.append([
-            rank,
-            r['model'][:30],
-            f"{r['overall']:.1%}",
-            f"{r['best']['name'][:15]}\n({r['best']['score']:.1%})",
-            f"{r['worst']['name'][:15]}\n({r['worst']['score']:.1%})",
-            f"{r['stem']:.1%}",
-            f"{r['humss']:.1%}",
-            f"{r['applied']:.1%}",
-            f"{r['other']:.1%}",
-            r.get('elapsed_time', 'N/A'),
-            r.get('batch_size', 'N/A'),
-            r.get('precision', 'N/A')
-        ])
+    # 문항별 로그가 있는 모델들의 유의성 순위 (점수 차이가 유의하지 않은 모델은 같은 순위)
+    rank_groups, bootstrap = {}, None
+    if sample_dir and total > 1:
+        from significance import leaderboard_rank_groups
+        models = query.runs(columns=['model'], approximate=False, **filters)['model'].tolist()
+        rank_groups, bootstrap = leaderboard_rank_groups(models, sample_dir)
     
-    print(tabulate(
-        table_data,
-        headers=["Rank", "Model", "Overall", "Best Subject", "Worst Subject", 
-                 "STEM", "HUMSS", "Applied", "Other", "Time", "Batch", "Precision"],
-        tablefmt="grid"
-    ))
+    for start, page in query.pages(page_size=page_size, columns=TABLE_COLUMNS, approximate=False, **filters):
+        table_data = []
+        for i, r in enumerate(page.to_dict('records'), start):
+            rank = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"#{i}"
+            
+            table_data.append([
+                rank,
+                format_significance_rank(r, rank_groups),
+                r['model'][:30],
+                f"{r['overall']:.1%}",
+                f"{r['best_name'][:15]}\n({r['best_score']:.1%})",
+                f"{r['worst_name'][:15]}\n({r['worst_score']:.1%})",
+                f"{r['stem']:.1%}",
+                f"{r['humss']:.1%}",
+                f"{r['applied']:.1%}",
+                f"{r['other']:.1%}",
+                _value(r['elapsed_time']),
+                _value(r['batch_size']),
+                _value(r['precision']),
+                format_throughput(r),
+                *format_profile(r)
+            ])
+        
+        print(tabulate(
+            table_data,
+            headers=["Rank", "Sig. Rank", "Model", "Overall", "Best Subject", "Worst Subject", 
+                     "STEM", "HUMSS", "Applied", "Other", "Time", "Batch", "Precision", "Q/s (Mode)",
+                     "Load", "Tok/s", "Peak Mem"],
+            tablefmt="grid"
+        ))
     
-    if len(results) > 1:
-        best = results[0]
-        worst = results[-1]
+    if total > 1:
+        best = query.runs(columns=['model', 'overall'], limit=1, approximate=False, **filters).iloc[0]
+        worst = query.runs(columns=['model', 'overall'], ascending=True, limit=1, approximate=False,
+                           **filters).iloc[0]
         gap = (best['overall'] - worst['overall']) * 100
         
         print(f"\n📊 Stats:")
         print(f"  Best:  {best['model']} ({best['overall']:.2%})")
         print(f"  Worst: {worst['model']} ({worst['overall']:.2%})")
-        print(f"  Gap:   {gap:.1f}pp\n")
+        if bootstrap is not None and best['model'] in bootstrap.index and worst['model'] in bootstrap.index:
+            result = bootstrap.compare(best['model'], worst['model'])
+            print(f"  Gap:   {gap:.1f}pp (95% CI [{result['ci_low'] * 100:+.1f}, {result['ci_high'] * 100:+.1f}]pp, "
+                  f"p={result['p_value']:.3g}, paired bootstrap over {bootstrap.correct.shape[1]:,} questions)\n")
+        else:
+            print(f"  Gap:   {gap:.1f}pp\n")
+    
+    if approximate_total:
+        print_approximate_results(query, filters, page_size)
     
+    query.close()
     print(f"\n💡 Tip: Check '{JSON_LEADERBOARD}' for detailed model data\n")
 
 if __name__ == "__main__":
-    compare_models()
\ No newline at end of file
+    compare_models()
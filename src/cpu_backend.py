@@ -0,0 +1,514 @@
+# cpu_backend.py
+# GPU 없는 빌드/CI 서버용 CPU 평가 백엔드
+# 과목을 shard로 나눠 프로세스 풀에서 동시에 평가하고 shards.merge_shards로 합침
+# - 모델 가중치는 safetensors 파일을 각 프로세스가 memory-map으로 읽어 공유 (프로세스마다 복사본을 만들지 않음)
+#   파일의 dtype이 평가 dtype과 다르면 한 번만 변환하여 CPU_WEIGHT_DIR에 저장하고 그 파일을 공유
+# - worker마다 intra-op / inter-op 스레드 수를 명시적으로 지정 (코어 수 / worker 수)
+# - dynamic_int8=True이면 nn.Linear를 동적 int8 양자화 (CPU 양자화 엔진이 있는 경우,
+#   양자화된 가중치는 worker마다 따로 만들어지지만 크기가 float32의 1/4)
+# - 전체 문항/초와 worker별 공유/개별 메모리를 result_data['cpu']에 기록
+#
+# 사용 예:
+#   python cpu_backend.py run --model K-intelligence/Midm-2.0-Mini-Instruct \
+#       --model-args pretrained=K-intelligence/Midm-2.0-Mini-Instruct,dtype=float32 \
+#       --label Midm-2.0-Mini-Instruct-cpu --workers 4 --reference Midm-2.0-Mini-Instruct
+#   python cpu_backend.py scaling ... --cores 1 2 4 8   (코어 수별 처리량)
+#   python cpu_backend.py demo   (작은 무작위 모델 + 합성 KMMLU)
+
+import copy
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# === 전역 상수 정의 ===
+CPU_WEIGHT_DIR = 'kmmlu_cpu_weights'   # 평가 dtype으로 변환한 safetensors 보관 폴더
+DEFAULT_CPU_DTYPE = 'float32'          # CPU에서는 float16 연산이 느리므로 기본값은 float32
+DEFAULT_THREADS_PER_WORKER = 4
+SCORE_TOLERANCE = 0.01                 # GPU 결과와 비교할 때 허용하는 전체/대분류 점수 차이
+
+# safetensors dtype 이름 -> torch dtype 이름
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool"
+}
+FLOAT_DTYPES = {"F64", "F32", "F16", "BF16"}
+
+
+def configure_cpu_threads(num_threads=None, interop_threads=None):
+    """
+    CPU 연산 스레드 수 지정 (worker 프로세스에서는 torch import 전에 호출해야 OpenMP/MKL에도 적용됨)
+
+    Args:
+        num_threads: intra-op 스레드 수 (None이면 torch 기본값 유지)
+        interop_threads: inter-op 스레드 수 (None이면 intra-op과 같게, 한 번 병렬 연산을 시작한 뒤에는 바꿀 수 없음)
+
+    Returns:
+        int: 적용된 intra-op 스레드 수
+    """
+    if num_threads:
+        os.environ["OMP_NUM_THREADS"] = str(num_threads)
+        os.environ["MKL_NUM_THREADS"] = str(num_threads)
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(interop_threads or num_threads)
+        except RuntimeError:
+            pass
+    return torch.get_num_threads()
+
+
+def quantize_dynamic_int8(model):
+    """
+    nn.Linear 층을 동적 int8 양자화 (가중치는 int8, 활성값은 실행 중 양자화)
+    CPU 양자화 엔진이 없거나 이미 bitsandbytes 등으로 양자화된 모델이면 경고 후 그대로 반환
+
+    Returns:
+        양자화된 모델 (같은 객체를 제자리에서 변경)
+    """
+    import torch
+
+    if getattr(model, 'is_quantized', False) or getattr(model, 'hf_quantizer', None) is not None:
+        print("⚠️ Model is already quantized, skipping dynamic int8 quantization")
+        return model
+    device = next(model.parameters()).device
+    if device.type != 'cpu':
+        raise ValueError(f"Dynamic int8 quantization runs on CPU only (model is on {device})")
+    engine = next((name for name in ('x86', 'fbgemm', 'qnnpack') if name in torch.backends.quantized.supported_engines),
+                  None)
+    if engine is None:
+        print("⚠️ No quantized CPU engine in this torch build, skipping dynamic int8 quantization")
+        return model
+
+    torch.backends.quantized.engine = engine
+    if next(model.parameters()).dtype != torch.float32:
+        model = model.float()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def read_safetensors_header(path):
+    """
+    safetensors 파일 헤더 읽기 (텐서 데이터는 읽지 않음)
+
+    Returns:
+        tuple: (헤더 딕셔너리 {텐서 이름: {"dtype", "shape", "data_offsets"}}, 데이터 시작 위치)
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    header.pop('__metadata__', None)
+    return header, 8 + header_size
+
+
+def resolve_weight_files(model_path):
+    """모델의 safetensors 파일 목록 (Hub 저장소면 safetensors와 설정 파일만 내려받음)"""
+    if not os.path.isdir(model_path):
+        from huggingface_hub import snapshot_download
+        model_path = snapshot_download(model_path, allow_patterns=["*.safetensors", "*.json"])
+    files = sorted(os.path.join(model_path, name) for name in os.listdir(model_path) if name.endswith('.safetensors'))
+    if not files:
+        raise ValueError(f"No safetensors weights in {model_path} (the CPU backend memory-maps safetensors files)")
+    return files
+
+
+def prepare_shared_weights(model_path, dtype=DEFAULT_CPU_DTYPE, cache_dir=CPU_WEIGHT_DIR):
+    """
+    worker들이 memory-map으로 공유할 safetensors 파일 준비
+    실수 텐서가 모두 dtype이면 원본 파일을 그대로 쓰고, 아니면 파일별로 한 번만 변환하여 cache_dir에 저장
+
+    Returns:
+        list: safetensors 파일 경로 목록
+    """
+    files = resolve_weight_files(model_path)
+    target = next(name for name, torch_name in SAFETENSORS_DTYPES.items() if torch_name == dtype)
+    if all(info['dtype'] == target or info['dtype'] not in FLOAT_DTYPES
+           for path in files for info in read_safetensors_header(path)[0].values()):
+        return files
+
+    import torch
+    from safetensors.torch import load_file, save_file
+
+    output_dir = os.path.join(cache_dir, re.sub(r'[^\w.-]+', '_', model_path.strip('/')), dtype)
+    os.makedirs(output_dir, exist_ok=True)
+    converted = []
+    for path in files:
+        output_path = os.path.join(output_dir, os.path.basename(path))
+        if not os.path.exists(output_path):
+            print(f"🔄 Converting {os.path.basename(path)} to {dtype} for shared CPU weights")
+            tensors = {
+                name: tensor.to(getattr(torch, dtype)) if tensor.is_floating_point() else tensor
+                for name, tensor in load_file(path).items()
+            }
+            tmp_path = output_path + '.tmp'
+            save_file(tensors, tmp_path, metadata={"format": "pt"})
+            os.replace(tmp_path, output_path)
+            del tensors
+        converted.append(output_path)
+    return converted
+
+
+def load_mmap_state_dict(files):
+    """
+    safetensors 파일들을 memory-map으로 열어 텐서 딕셔너리 생성 (데이터를 복사하지 않음)
+    copy-on-write 매핑이므로 같은 파일을 연 프로세스들은 OS 페이지 캐시의 같은 물리 메모리를 읽음
+    """
+    import torch
+
+    state = {}
+    for path in files:
+        header, data_start = read_safetensors_header(path)
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        for name, info in header.items():
+            dtype = getattr(torch, SAFETENSORS_DTYPES[info['dtype']])
+            begin, end = info['data_offsets']
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            if count:
+                tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin)
+            else:
+                tensor = torch.empty(0, dtype=dtype)
+            state[name] = tensor.view(info['shape'])
+    return state
+
+
+def load_shared_model(model_path, weight_files):
+    """
+    가중치를 memory-map 텐서로 연결한 모델 생성
+    빈(meta) 파라미터로 모델 구조만 만든 뒤 load_state_dict(assign=True)로 mmap 텐서를 그대로 파라미터로 사용
+
+    Raises:
+        ValueError: 체크포인트에 없는 파라미터가 남은 경우 (키 이름이 다른 체크포인트)
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_path)
+    with init_empty_weights(include_buffers=False):
+        model = AutoModelForCausalLM.from_config(config)
+    incompatible = model.load_state_dict(load_mmap_state_dict(weight_files), strict=False, assign=True)
+    model.tie_weights()
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise ValueError(f"Weights missing from the safetensors files: {missing[:5]}"
+                         f"{' ...' if len(missing) > 5 else ''}")
+    if incompatible.unexpected_keys:
+        print(f"⚠️ Ignored {len(incompatible.unexpected_keys)} unexpected tensor(s) "
+              f"(e.g. {incompatible.unexpected_keys[0]})")
+    return model.eval()
+
+
+def _evaluate_shard_worker(model_path, weight_files, tasks, batch_size, scoring_mode, dynamic_int8, num_fewshot,
+                           evaluate_fn_factory=None):
+    """
+    worker 프로세스: 공유 가중치로 모델을 만들고 과목 일부를 평가
+
+    Returns:
+        dict: {"results", "elapsed_seconds", "load_seconds", "evaluate_seconds", "questions", "threads",
+               "rss_mb", "uss_mb"}
+    """
+    import psutil
+    import torch
+
+    from scoring import ScoringHFLM
+
+    start = time.time()
+    model = load_shared_model(model_path, weight_files)
+    lm = ScoringHFLM(pretrained=model, tokenizer=model_path, batch_size=batch_size, device="cpu",
+                     scoring_mode=scoring_mode, dynamic_int8=dynamic_int8)
+    load_seconds = time.time() - start
+
+    if evaluate_fn_factory is None:
+        from lm_eval import simple_evaluate as evaluate_fn
+    else:
+        evaluate_fn = evaluate_fn_factory()
+    evaluate_start = time.time()
+    with torch.inference_mode():
+        results = evaluate_fn(model=lm, tasks=tasks, num_fewshot=num_fewshot, log_samples=False)
+    evaluate_seconds = time.time() - evaluate_start
+
+    # uss: 이 프로세스만 쓰는 메모리, rss - uss: 다른 프로세스와 공유하는 메모리 (mmap 가중치 포함)
+    memory = psutil.Process().memory_full_info()
+    return {
+        "results": {"results": results['results'], "n-samples": results['n-samples']},
+        "elapsed_seconds": time.time() - start,
+        "load_seconds": load_seconds,
+        "evaluate_seconds": evaluate_seconds,
+        "questions": lm.scoring_stats['questions'],
+        "threads": torch.get_num_threads(),
+        "rss_mb": memory.rss / 1024 ** 2,
+        "uss_mb": memory.uss / 1024 ** 2
+    }
+
+
+def _parse_cpu_model_args(model_args):
+    """
+    model_args에서 모델 경로, dtype, dynamic_int8 추출
+    CPU에서 쓸 수 없는 bitsandbytes 옵션은 거부하고 float16은 float32로 평가
+    """
+    options = dict(part.split('=', 1) for part in model_args.split(',') if '=' in part)
+    if options.get('load_in_8bit') == 'True' or options.get('load_in_4bit') == 'True':
+        raise ValueError("bitsandbytes 8bit/4bit loading needs CUDA; use dynamic_int8=True on CPU instead")
+    dtype = options.get('dtype', DEFAULT_CPU_DTYPE)
+    if dtype in ('float16', 'half', 'auto'):
+        print(f"⚠️ dtype={dtype} is slow or unsupported on CPU, evaluating in {DEFAULT_CPU_DTYPE}")
+        dtype = DEFAULT_CPU_DTYPE
+    return options['pretrained'], dtype, options.get('dynamic_int8') == 'True'
+
+
+def evaluate_model_cpu(model_name, model_args, label, num_workers=None, threads_per_worker=None, batch_size=16,
+                       dynamic_int8=False, scoring_mode="default", num_fewshot=5, save=True, evaluate_fn_factory=None):
+    """
+    CPU 프로세스 풀로 KMMLU 평가 (과목을 worker 수만큼 shard로 나눠 동시에 평가)
+
+    Args:
+        model_name: 모델 경로 (예: "K-intelligence/Midm-2.0-Mini-Instruct")
+        model_args: 모델 로딩 설정 ("pretrained=...,dtype=float32", dynamic_int8=True 포함 가능)
+        label: 리더보드 표시 이름
+        num_workers: worker 프로세스 수 (None이면 코어 수 / DEFAULT_THREADS_PER_WORKER)
+        threads_per_worker: worker별 intra-op 스레드 수 (None이면 코어 수 / worker 수)
+        dynamic_int8: nn.Linear 동적 int8 양자화
+        save: True이면 결과 저장소와 CSV/JSON 보기에 저장
+        evaluate_fn_factory: worker에서 lm_eval simple_evaluate 대신 쓸 평가 함수를 만드는 함수 (pickle 가능해야 함)
+
+    Returns:
+        dict: result_data (result_data['cpu']에 worker 수, 스레드, 처리량, worker별 메모리)
+    """
+    from evaluate_model import format_time, list_kmmlu_subject_tasks, store_result
+    from reporting import get_pipeline, save_unsaved_result
+    from scheduler import cpu_workers
+    from shards import make_shard, merge_shards, shard_subjects
+
+    model_path, dtype, int8_arg = _parse_cpu_model_args(model_args)
+    dynamic_int8 = dynamic_int8 or int8_arg
+    cpu_count = os.cpu_count() or 1
+    num_workers = num_workers or max(1, cpu_count // DEFAULT_THREADS_PER_WORKER)
+    threads = cpu_workers(num_workers, threads_per_worker, memory_gb=0)[0]["num_threads"]
+
+    weight_files = prepare_shared_weights(model_path, dtype)
+    weights_mb = sum(os.path.getsize(path) for path in weight_files) / 1024 ** 2
+    subject_tasks = list_kmmlu_subject_tasks()
+    shard_tasks = [shard_subjects(subject_tasks, num_workers, i) for i in range(num_workers)]
+    precision = "int8-dynamic" if dynamic_int8 else dtype
+
+    print(f"\n{'='*60}")
+    print(f"Evaluating on CPU: {label}")
+    print(f"Workers: {num_workers} x {threads} thread(s) ({cpu_count} cores)")
+    print(f"Precision: {precision}, shared weights {weights_mb:,.0f}MB (memory-mapped)")
+    print(f"{'='*60}")
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=get_context("spawn"),
+                             initializer=configure_cpu_threads, initargs=(threads,)) as pool:
+        futures = [
+            pool.submit(_evaluate_shard_worker, model_path, weight_files, tasks, batch_size, scoring_mode,
+                        dynamic_int8, num_fewshot, evaluate_fn_factory)
+            for tasks in shard_tasks
+        ]
+        outputs = [future.result() for future in futures]
+    wall_seconds = time.time() - start
+
+    shards = [
+        make_shard(model_name, model_args, label, num_workers, i, subject_tasks, tasks, output["results"],
+                   output["elapsed_seconds"], batch_size, num_fewshot)
+        for i, (tasks, output) in enumerate(zip(shard_tasks, outputs))
+    ]
+    result_data = merge_shards(shards)
+    questions = sum(output["questions"] for output in outputs)
+    # 프로세스 시작/모델 로드를 뺀 평가 구간 처리량 (가장 늦게 끝난 worker 기준)
+    evaluate_seconds = max(output["evaluate_seconds"] for output in outputs)
+    result_data.update({
+        "elapsed_time": format_time(wall_seconds),
+        "precision": precision,
+        "throughput": {
+            "scoring_mode": scoring_mode,
+            "questions": questions,
+            "scoring_seconds": wall_seconds,
+            "questions_per_sec": questions / wall_seconds if wall_seconds else 0.0
+        },
+        "cpu": {
+            "workers": num_workers,
+            "threads_per_worker": threads,
+            "cores": cpu_count,
+            "dtype": dtype,
+            "dynamic_int8": dynamic_int8,
+            "shared_weights_mb": weights_mb,
+            "wall_seconds": wall_seconds,
+            "load_seconds": [output["load_seconds"] for output in outputs],
+            "evaluate_seconds": evaluate_seconds,
+            "evaluate_questions_per_sec": questions / evaluate_seconds if evaluate_seconds else 0.0,
+            "worker_rss_mb": [output["rss_mb"] for output in outputs],
+            "worker_uss_mb": [output["uss_mb"] for output in outputs]
+        }
+    })
+
+    print_cpu_summary(result_data)
+    if save:
+        # evaluate_model과 같이 보고 스레드에서 저장 (반환한 result_data를 호출 쪽이 바꿔도 저장 내용은 그대로)
+        get_pipeline().submit(f"store_result({label})", store_result, copy.deepcopy(result_data),
+                              fallback=save_unsaved_result)
+    return result_data
+
+
+def print_cpu_summary(result_data):
+    """CPU 평가 점수, 처리량, worker별 메모리 출력"""
+    cpu = result_data["cpu"]
+    print(f"\n✅ CPU Evaluation Complete: {result_data['model']}")
+    print(f"Overall: {result_data['overall']:.2%}  (STEM {result_data['stem']:.2%}, HUMSS {result_data['humss']:.2%}, "
+          f"Applied {result_data['applied']:.2%}, Other {result_data['other']:.2%})")
+    print(f"Throughput: {result_data['throughput']['questions_per_sec']:.2f} questions/sec "
+          f"({result_data['throughput']['questions']:,} questions, {result_data['elapsed_time']}, "
+          f"{cpu['workers']} worker(s) x {cpu['threads_per_worker']} thread(s)), "
+          f"{cpu['evaluate_questions_per_sec']:.2f} questions/sec excluding startup and model load")
+    private_mb = sum(cpu['worker_uss_mb'])
+    print(f"Memory: {cpu['shared_weights_mb']:,.0f}MB shared weights, {private_mb:,.0f}MB private across workers "
+          f"(naive per-worker copies would add ~{cpu['shared_weights_mb'] * (cpu['workers'] - 1):,.0f}MB)")
+
+
+def compare_with_reference(result_data, reference_label, tolerance=SCORE_TOLERANCE):
+    """
+    CPU 결과를 결과 저장소에 있는 기준 실행(예: 같은 모델의 GPU 평가)과 비교
+
+    Returns:
+        bool: 전체/대분류 점수 차이가 모두 tolerance 이하이면 True
+    """
+    from tabulate import tabulate
+
+    from result_store import ResultStore
+
+    store = ResultStore()
+    try:
+        history = [run for run in store.history(model=reference_label) if not run['result'].get('approximate')]
+    finally:
+        store.close()
+    if not history:
+        raise ValueError(f"No stored result for reference '{reference_label}'")
+    reference = history[-1]['result']
+
+    rows, within = [], True
+    for key, name in (("overall", "Overall"), ("stem", "STEM"), ("humss", "HUMSS"), ("applied", "Applied"),
+                      ("other", "Other")):
+        delta = result_data[key] - reference[key]
+        within = within and abs(delta) <= tolerance
+        rows.append([name, f"{reference[key]:.2%}", f"{result_data[key]:.2%}", f"{delta:+.2%}",
+                     "✅" if abs(delta) <= tolerance else "❌"])
+    reference_subjects = {subject['name']: subject['score'] for subject in reference['all_subjects_ranked']}
+    subject_deltas = [abs(subject['score'] - reference_subjects[subject['name']])
+                      for subject in result_data['all_subjects_ranked'] if subject['name'] in reference_subjects]
+
+    print(f"\n🔍 {result_data['model']} vs {reference_label} ({reference.get('precision')}), tolerance {tolerance:.2%}")
+    print(tabulate(rows, headers=["Score", "Reference", "CPU", "Delta", ""], tablefmt="grid"))
+    if subject_deltas:
+        print(f"Subjects: max |delta| {max(subject_deltas):.2%}, mean |delta| "
+              f"{sum(subject_deltas) / len(subject_deltas):.2%} over {len(subject_deltas)} subjects")
+    return within
+
+
+def measure_scaling(model_name, model_args, label, core_counts, threads_per_worker=1, **kwargs):
+    """
+    사용 코어 수별 처리량 측정 (코어 수 / threads_per_worker 만큼 worker를 띄워 평가, 결과는 저장하지 않음)
+
+    Returns:
+        list: [{"cores", "workers", "questions_per_sec", "evaluate_questions_per_sec", "speedup", "efficiency",
+                "overall"}, ...] (speedup/efficiency는 평가 구간 처리량 기준)
+    """
+    from tabulate import tabulate
+
+    rows = []
+    for cores in core_counts:
+        workers = max(1, cores // threads_per_worker)
+        result_data = evaluate_model_cpu(model_name, model_args, f"{label}-{cores}cores", num_workers=workers,
+                                         threads_per_worker=threads_per_worker, save=False, **kwargs)
+        rows.append({"cores": workers * threads_per_worker, "workers": workers,
+                     "questions_per_sec": result_data['throughput']['questions_per_sec'],
+                     "evaluate_questions_per_sec": result_data['cpu']['evaluate_questions_per_sec'],
+                     "overall": result_data['overall']})
+
+    base = rows[0]
+    for row in rows:
+        row["speedup"] = (row["evaluate_questions_per_sec"] / base["evaluate_questions_per_sec"]
+                          if base["evaluate_questions_per_sec"] else 0.0)
+        row["efficiency"] = row["speedup"] / (row["cores"] / base["cores"])
+
+    print(f"\n📈 CPU throughput scaling: {label} ({os.cpu_count()} cores available)")
+    print(tabulate([[row["cores"], row["workers"], f"{row['questions_per_sec']:.2f}",
+                     f"{row['evaluate_questions_per_sec']:.2f}", f"{row['speedup']:.2f}x", f"{row['efficiency']:.0%}",
+                     f"{row['overall']:.2%}"] for row in rows],
+                   headers=["Cores", "Workers", "Q/s (wall)", "Q/s (eval)", "Speedup", "Efficiency", "Overall"],
+                   tablefmt="grid"))
+    return rows
+
+
+def _demo():
+    """작은 무작위 모델 + 합성 KMMLU로 단일 프로세스 경로와 점수 비교, int8 결과, 코어 수별 처리량 확인"""
+    import tempfile
+    from functools import partial
+
+    import evaluate_model as em
+    from reporting import flush_reports
+    from synthetic import make_offline_evaluate, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    evaluate_fn_factory = partial(make_offline_evaluate, n_questions=8)
+    em.simple_evaluate = evaluate_fn_factory()
+    os.chdir(tempfile.mkdtemp())
+
+    # 기준: 기존 단일 프로세스 경로 (HF 로더로 가중치를 복사하여 로드)
+    em.evaluate_model(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama", batch_size=16, device="cpu")
+    flush_reports()
+
+    result_data = evaluate_model_cpu(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama-cpu",
+                                     num_workers=2, threads_per_worker=1, evaluate_fn_factory=evaluate_fn_factory)
+    compare_with_reference(result_data, "tiny-llama")
+    result_data = evaluate_model_cpu(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama-cpu-int8",
+                                     num_workers=2, threads_per_worker=1, dynamic_int8=True,
+                                     evaluate_fn_factory=evaluate_fn_factory)
+    compare_with_reference(result_data, "tiny-llama", tolerance=0.05)
+    measure_scaling(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama", [1, 2],
+                    evaluate_fn_factory=evaluate_fn_factory)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="CPU KMMLU evaluation with a process pool over subject shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("run", "evaluate one model on CPU"), ("scaling", "measure throughput per core count")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--model", required=True, help="model path (e.g. K-intelligence/Midm-2.0-Mini-Instruct)")
+        sub.add_argument("--model-args", required=True, help="lm_eval model_args string (safetensors weights)")
+        sub.add_argument("--label", required=True)
+        sub.add_argument("--batch-size", type=int, default=16)
+        sub.add_argument("--int8", action="store_true", help="dynamic int8 quantization of Linear layers")
+        sub.add_argument("--scoring-mode", default="default")
+    run_parser = subparsers.choices["run"]
+    run_parser.add_argument("--workers", type=int, help="worker processes (default: cores / 4)")
+    run_parser.add_argument("--threads", type=int, help="intra-op threads per worker (default: cores / workers)")
+    run_parser.add_argument("--reference", help="stored result label to compare with (e.g. the GPU run)")
+    run_parser.add_argument("--tolerance", type=float, default=SCORE_TOLERANCE)
+    run_parser.add_argument("--no-save", action="store_true", help="do not store the result")
+    scaling_parser = subparsers.choices["scaling"]
+    scaling_parser.add_argument("--cores", type=int, nargs="+", required=True, help="core counts to measure")
+    scaling_parser.add_argument("--threads", type=int, default=1, help="intra-op threads per worker")
+    subparsers.add_parser("demo", help="CPU demo with a tiny random model and synthetic KMMLU")
+
+    args = parser.parse_args()
+    if args.command == "demo":
+        _demo()
+    elif args.command == "run":
+        result_data = evaluate_model_cpu(args.model, args.model_args, args.label, num_workers=args.workers,
+                                         threads_per_worker=args.threads, batch_size=args.batch_size,
+                                         dynamic_int8=args.int8, scoring_mode=args.scoring_mode,
+                                         save=not args.no_save)
+        if args.reference and not compare_with_reference(result_data, args.reference, args.tolerance):
+            sys.exit(1)
+    else:
+        measure_scaling(args.model, args.model_args, args.label, args.cores, threads_per_worker=args.threads,
+                        batch_size=args.batch_size, dynamic_int8=args.int8, scoring_mode=args.scoring_mode)
@@ -0,0 +1,461 @@
+# endpoint.py
+# OpenAI 호환 추론 서버(/v1/completions)로 KMMLU를 채점하는 lm_eval LM 백엔드
+# prompt = context + continuation을 echo=True, max_tokens=1, logprobs=1로 보내고
+# (max_tokens=0은 OpenAI API와 vLLM이 거부하므로 한 토큰을 생성시키고 버림)
+# 응답의 text_offset이 [len(context), len(prompt)) 안인 토큰들의 logprob 합을 continuation loglikelihood로 사용
+# - asyncio + aiohttp: keep-alive 연결 풀(연결 수 = 동시 요청 수)을 평가 내내 재사용
+# - 동시에 보내는 HTTP 요청 수를 num_concurrent로 제한하고, 요청 하나에 prompt를 batch_size개씩 묶음
+# - 연결 오류 / 타임아웃 / 408·429·5xx 응답은 지수 백오프(+jitter)로 재시도
+# - HTTP 요청별 지연 시간의 p50/p95/p99를 result_data['endpoint']에 기록
+#
+# evaluate_model에서는 model_args에 base_url= 을 주면 이 백엔드를 사용:
+#   evaluate_model("my-model", "base_url=http://localhost:8000/v1,model=my-model,num_concurrent=8", "my-model",
+#                  batch_size=16)
+# 네트워크 없이 확인할 때는 작은 모델을 CPU에서 서빙하는 로컬 대역 서버 사용:
+#   python endpoint.py serve --model-dir /tmp/kmmlu_tiny_llama --port 8765
+#   python endpoint.py demo
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import aiohttp
+import numpy as np
+from lm_eval.api.model import LM
+
+# === 전역 상수 정의 ===
+DEFAULT_CONCURRENCY = 8          # 동시에 보내는 HTTP 요청 수 (= 연결 풀 크기)
+DEFAULT_PROMPTS_PER_REQUEST = 16  # HTTP 요청 하나에 묶는 prompt 수 (batch_size로 지정)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5    # 첫 재시도 대기 시간 (재시도마다 2배)
+DEFAULT_TIMEOUT_SECONDS = 300
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+STAND_IN_PORT = 8765
+
+
+class _RetryableStatus(Exception):
+    """재시도할 HTTP 상태 코드 응답"""
+
+
+def _close_client(client):
+    """EndpointLM의 HTTP 세션을 닫고 이벤트 루프 정지"""
+    loop, session = client["loop"], client["session"]
+    if loop is None:
+        return
+    if session is not None:
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    client["loop"] = client["session"] = None
+
+
+def latency_summary(latencies):
+    """
+    HTTP 요청 지연 시간 요약 (밀리초)
+
+    Returns:
+        dict: {"p50", "p95", "p99", "mean", "max"} (요청이 없으면 모두 None)
+    """
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(values.mean()),
+            "max": float(values.max())}
+
+
+def continuation_logprob(logprobs, context_length, prompt_length):
+    """
+    echo 응답의 logprobs에서 continuation 부분의 loglikelihood와 greedy 여부 계산
+
+    Args:
+        logprobs: choices[i]['logprobs'] ({"tokens", "token_logprobs", "top_logprobs", "text_offset"})
+        context_length: context 문자열 길이 (이 위치부터 시작하는 토큰이 continuation)
+        prompt_length: context + continuation 문자열 길이 (이 위치부터는 생성된 토큰이므로 제외)
+
+    Returns:
+        tuple: (loglikelihood 합, 모든 continuation 토큰이 top-1 토큰인지)
+    """
+    positions = [i for i, offset in enumerate(logprobs['text_offset']) if context_length <= offset < prompt_length]
+    if not positions:
+        raise ValueError("Endpoint response has no continuation tokens (check that echo=true is supported)")
+    tokens = logprobs['tokens']
+    top_logprobs = logprobs.get('top_logprobs') or []
+    is_greedy = len(top_logprobs) == len(tokens) and all(
+        top_logprobs[i] and max(top_logprobs[i], key=top_logprobs[i].get) == tokens[i] for i in positions
+    )
+    return sum(logprobs['token_logprobs'][i] for i in positions), is_greedy
+
+
+class EndpointLM(LM):
+    """
+    OpenAI 호환 /v1/completions 엔드포인트로 loglikelihood를 계산하는 LM
+
+    model_args 예: "base_url=http://localhost:8000/v1,model=my-model,num_concurrent=8"
+    batch_size는 HTTP 요청 하나에 묶는 prompt 수 (서버 안의 배치 구성은 서버가 결정)
+    HTTP 세션과 연결 풀은 전용 이벤트 루프 스레드에 두고 여러 loglikelihood 호출(과목)에서 재사용
+    """
+
+    def __init__(self, base_url, model=None, batch_size=DEFAULT_PROMPTS_PER_REQUEST,
+                 num_concurrent=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS, timeout=DEFAULT_TIMEOUT_SECONDS, api_key=None, **kwargs):
+        # kwargs: create_lm이 HF 모델용으로 넘기는 device / scoring_mode / max_batch_tokens 등 (사용하지 않음)
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.batch_size = int(batch_size) if str(batch_size).isdigit() else DEFAULT_PROMPTS_PER_REQUEST
+        self.num_concurrent = int(num_concurrent)
+        self.max_retries = int(max_retries)
+        self.backoff_seconds = float(backoff_seconds)
+        self.timeout = float(timeout)
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
+        self.scoring_stats = self._new_scoring_stats()
+        self._latencies = []
+        # 이벤트 루프 스레드와 HTTP 세션 (LM이 사라지거나 프로세스가 끝날 때 정리)
+        self._client = {"loop": None, "session": None}
+        self._finalizer = weakref.finalize(self, _close_client, self._client)
+
+    def _new_scoring_stats(self):
+        """채점 통계 초기값 (ScoringHFLM.scoring_stats와 같은 키 + endpoint 통계)"""
+        return {
+            "mode": "endpoint",
+            "requests": 0,
+            "questions": 0,
+            "input_tokens": 0,              # 서버가 보고한 prompt 토큰 수 (usage.prompt_tokens)
+            "forward_units": 0,
+            "prefill_tokens_baseline": 0,
+            "prefill_tokens_computed": 0,
+            "prefill_tokens_saved": 0,
+            "cached_prefixes": 0,
+            "forward_passes_saved": 0,
+            "scoring_seconds": 0.0,
+            "batching": {
+                "max_batch_tokens": None,
+                "batches": 0,               # padding은 서버 안에서 일어나므로 기록하지 않음
+                "rows": 0,
+                "real_tokens": 0,
+                "padded_tokens": 0,
+                "min_batch_size": None,
+                "max_batch_size": 0
+            },
+            "endpoint": {
+                "base_url": self.base_url,
+                "model": self.model,
+                "num_concurrent": self.num_concurrent,
+                "prompts_per_request": self.batch_size,
+                "http_requests": 0,
+                "prompts": 0,
+                "retries": 0,
+                "prompts_per_sec": 0.0,
+                "latency_ms": latency_summary([])
+            }
+        }
+
+    def configure(self, batch_size=None, scoring_mode=None, max_batch_tokens=None):
+        """model_server 모델 캐시에서 재사용할 때 평가 설정 변경 (채점 통계 초기화)"""
+        if isinstance(batch_size, int):
+            self.batch_size = batch_size
+        self._latencies = []
+        self.scoring_stats = self._new_scoring_stats()
+
+    # --- 이벤트 루프 / 세션 ---
+
+    def _run(self, coroutine):
+        """전용 이벤트 루프 스레드에서 코루틴을 실행하고 결과를 기다림"""
+        if self._client["loop"] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="kmmlu-endpoint", daemon=True).start()
+            self._client["loop"] = loop
+        return asyncio.run_coroutine_threadsafe(coroutine, self._client["loop"]).result()
+
+    async def _get_session(self):
+        if self._client["session"] is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client["session"] = aiohttp.ClientSession(
+                base_url=self.base_url + '/',
+                connector=aiohttp.TCPConnector(limit=self.num_concurrent, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=headers
+            )
+        return self._client["session"]
+
+    def close(self):
+        """HTTP 세션(연결 풀)과 이벤트 루프 스레드 종료"""
+        self._finalizer()
+
+    # --- HTTP ---
+
+    async def _post(self, payload):
+        """completions 요청 하나 (재시도 포함), 성공한 시도의 지연 시간을 기록"""
+        session = await self._get_session()
+        endpoint = self.scoring_stats['endpoint']
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with session.post('completions', json=payload) as response:
+                    if response.status in RETRY_STATUSES:
+                        raise _RetryableStatus(f"HTTP {response.status}")
+                    if response.status >= 400:
+                        raise RuntimeError(f"Endpoint returned HTTP {response.status}: {(await response.text())[:500]}")
+                    data = await response.json()
+                self._latencies.append(time.perf_counter() - start)
+                endpoint['http_requests'] += 1
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError, _RetryableStatus) as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Endpoint request failed after {attempt + 1} attempt(s): "
+                                       f"{type(e).__name__}: {e}") from e
+                endpoint['retries'] += 1
+                # 동시에 실패한 요청들이 같은 시각에 다시 몰리지 않도록 대기 시간에 jitter
+                await asyncio.sleep(self.backoff_seconds * 2 ** attempt * (0.5 + random.random()))
+
+    async def _score(self, pairs, disable_tqdm):
+        from tqdm import tqdm
+
+        results = [None] * len(pairs)
+        semaphore = asyncio.Semaphore(self.num_concurrent)
+        starts = range(0, len(pairs), self.batch_size)
+        pbar = tqdm(total=len(pairs), disable=disable_tqdm, desc="Scoring via endpoint")
+
+        async def score_batch(start):
+            batch = pairs[start:start + self.batch_size]
+            async with semaphore:
+                data = await self._post({
+                    "model": self.model,
+                    "prompt": [context + continuation for context, continuation in batch],
+                    "max_tokens": 1,
+                    "echo": True,
+                    "logprobs": 1,
+                    "temperature": 0
+                })
+            choices = sorted(data['choices'], key=lambda choice: choice['index'])
+            for offset, ((context, continuation), choice) in enumerate(zip(batch, choices)):
+                results[start + offset] = continuation_logprob(choice['logprobs'], len(context),
+                                                               len(context) + len(continuation))
+            batching = self.scoring_stats['batching']
+            batching['min_batch_size'] = min(batching['min_batch_size'] or len(batch), len(batch))
+            batching['max_batch_size'] = max(batching['max_batch_size'], len(batch))
+            self.scoring_stats['input_tokens'] += (data.get('usage') or {}).get('prompt_tokens', 0)
+            pbar.update(len(batch))
+
+        try:
+            await asyncio.gather(*(score_batch(start) for start in starts))
+        finally:
+            pbar.close()
+        return results
+
+    # --- lm_eval LM 인터페이스 ---
+
+    def loglikelihood(self, requests, disable_tqdm=False):
+        pairs = [request.args for request in requests]
+        start = time.time()
+        tokens_before = self.scoring_stats['input_tokens']
+        results = self._run(self._score(pairs, disable_tqdm))
+        seconds = time.time() - start
+
+        stats = self.scoring_stats
+        tokens = stats['input_tokens'] - tokens_before
+        stats['requests'] += len(pairs)
+        stats['questions'] += len({context for context, _ in pairs})
+        stats['forward_units'] += len(pairs)
+        stats['prefill_tokens_baseline'] += tokens
+        stats['prefill_tokens_computed'] += tokens
+        stats['scoring_seconds'] += seconds
+        endpoint = stats['endpoint']
+        endpoint['prompts'] += len(pairs)
+        endpoint['prompts_per_sec'] = endpoint['prompts'] / stats['scoring_seconds'] if stats['scoring_seconds'] else 0.0
+        endpoint['latency_ms'] = latency_summary(self._latencies)
+        return results
+
+    def loglikelihood_rolling(self, requests, disable_tqdm=False):
+        raise NotImplementedError("EndpointLM scores multiple-choice loglikelihoods only")
+
+    def generate_until(self, requests, disable_tqdm=False):
+        raise NotImplementedError("EndpointLM scores multiple-choice loglikelihoods only")
+
+
+def make_stand_in_app(model_dir, max_batch_size=16, fail_every=0):
+    """
+    작은 모델을 CPU에서 서빙하는 OpenAI 호환 대역 서버 (aiohttp 앱, 네트워크 없이 EndpointLM 확인용)
+    /v1/completions는 echo 채점(echo=true, max_tokens>=1)만 지원하며 max_tokens와 관계없이 greedy 토큰 하나만 생성
+
+    Args:
+        model_dir: HF 모델 폴더 (예: synthetic.make_tiny_model의 반환값)
+        max_batch_size: forward 한 번에 넣는 최대 prompt 수
+        fail_every: N이면 N번째 요청마다 503 응답 (재시도 확인용, 0이면 항상 정상 응답)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import torch
+    from aiohttp import web
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForCausalLM.from_pretrained(model_dir, dtype=torch.float32).eval()
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+    executor = ThreadPoolExecutor(max_workers=1)  # 모델 forward는 한 번에 하나씩
+    counter = {"requests": 0}
+
+    def score(prompts):
+        """prompt별 echo logprobs (첫 토큰은 None) + greedy로 생성한 토큰 하나"""
+        encoded = tokenizer(prompts, add_special_tokens=False, return_offsets_mapping=True)
+        choices = []
+        for start in range(0, len(prompts), max_batch_size):
+            ids = encoded['input_ids'][start:start + max_batch_size]
+            width = max(len(row) for row in ids)
+            input_ids = torch.tensor([row + [pad_id] * (width - len(row)) for row in ids])
+            attention_mask = torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in ids])
+            with torch.inference_mode():
+                logprobs = torch.log_softmax(model(input_ids, attention_mask=attention_mask).logits.float(), dim=-1)
+            for row_index, row in enumerate(ids):
+                row_logprobs = logprobs[row_index]
+                token_logprobs, top_logprobs = [None], [None]
+                for position in range(1, len(row)):
+                    previous = row_logprobs[position - 1]
+                    top_id = int(previous.argmax())
+                    token_logprobs.append(float(previous[row[position]]))
+                    top_logprobs.append({tokenizer.convert_ids_to_tokens(top_id): float(previous[top_id])})
+                # 생성 토큰: 마지막 prompt 위치의 top-1 (text_offset은 prompt 끝)
+                prompt = prompts[start + row_index]
+                last = row_logprobs[len(row) - 1]
+                generated_id = int(last.argmax())
+                generated = tokenizer.convert_ids_to_tokens(generated_id)
+                choices.append({
+                    "index": start + row_index,
+                    "text": prompt + tokenizer.decode([generated_id]),
+                    "finish_reason": "length",
+                    "logprobs": {
+                        "tokens": tokenizer.convert_ids_to_tokens(row) + [generated],
+                        "token_logprobs": token_logprobs + [float(last[generated_id])],
+                        "top_logprobs": top_logprobs + [{generated: float(last[generated_id])}],
+                        "text_offset": [begin for begin, _ in encoded['offset_mapping'][start + row_index]]
+                                       + [len(prompt)]
+                    }
+                })
+        return choices, sum(len(row) for row in encoded['input_ids'])
+
+    async def completions(request):
+        counter["requests"] += 1
+        if fail_every and counter["requests"] % fail_every == 0:
+            return web.json_response({"error": {"message": "injected failure"}}, status=503)
+        body = await request.json()
+        if body.get('max_tokens', 16) < 1 or not body.get('echo'):
+            return web.json_response({"error": {"message": "stand-in server supports echo scoring only "
+                                                           "(echo=true, max_tokens>=1)"}}, status=400)
+        prompts = body['prompt'] if isinstance(body['prompt'], list) else [body['prompt']]
+        choices, prompt_tokens = await asyncio.get_running_loop().run_in_executor(executor, score, prompts)
+        return web.json_response({
+            "id": f"cmpl-{counter['requests']}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": body.get('model') or os.path.basename(model_dir),
+            "choices": choices,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(choices),
+                      "total_tokens": prompt_tokens + len(choices)}
+        })
+
+    async def models(request):
+        return web.json_response({"object": "list", "data": [{"id": os.path.basename(model_dir), "object": "model"}]})
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post('/v1/completions', completions)
+    app.router.add_get('/v1/models', models)
+    return app
+
+
+def start_stand_in(model_dir, host='127.0.0.1', port=0, **app_kwargs):
+    """
+    대역 서버를 백그라운드 스레드에서 시작 (port=0이면 빈 포트 사용)
+
+    Returns:
+        tuple: (base_url, stop 함수)
+    """
+    from aiohttp import web
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(make_stand_in_app(model_dir, **app_kwargs))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, port)
+    loop.run_until_complete(site.start())
+    bound_port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, name="kmmlu-stand-in", daemon=True)
+    thread.start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://{host}:{bound_port}/v1", stop
+
+
+def print_endpoint_stats(endpoint):
+    """엔드포인트 요청 수, 재시도, 지연 시간 백분위 출력"""
+    latency = endpoint['latency_ms']
+    print(f"🌐 Endpoint {endpoint['base_url']}: {endpoint['http_requests']:,} requests "
+          f"({endpoint['prompts']:,} prompts, {endpoint['prompts_per_request']}/request, "
+          f"{endpoint['num_concurrent']} in flight), {endpoint['retries']} retries, "
+          f"{endpoint['prompts_per_sec']:.1f} prompts/sec")
+    if latency['p50'] is not None:
+        print(f"   Latency p50 {latency['p50']:.0f}ms, p95 {latency['p95']:.0f}ms, p99 {latency['p99']:.0f}ms "
+              f"(max {latency['max']:.0f}ms)")
+
+
+def _demo():
+    """CPU 대역 서버로 엔드포인트 채점이 같은 모델의 HF 직접 채점과 같은 점수를 내는지 확인 (임시 폴더에 결과 저장)"""
+    import contextlib
+    import io
+    import tempfile
+
+    import evaluate_model as em
+    from synthetic import make_offline_evaluate, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    em.simple_evaluate = make_offline_evaluate(n_questions=4)
+    os.chdir(tempfile.mkdtemp())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = em.evaluate_model(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-hf",
+                                      batch_size=16, device="cpu")
+
+    # 5번째 요청마다 503을 돌려 재시도도 함께 확인
+    base_url, stop = start_stand_in(model_dir, fail_every=5)
+    endpoint_args = f"base_url={base_url},model=tiny-llama,num_concurrent=4,backoff_seconds=0.05"
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result_data = em.evaluate_model(model_dir, endpoint_args, "tiny-endpoint", batch_size=8, device="cpu",
+                                            cache_path="kmmlu_ll_cache.sqlite")
+            # 같은 엔드포인트를 다시 평가하면 요청이 모두 loglikelihood 캐시에서 나옴
+            cached = em.evaluate_model(model_dir, endpoint_args, "tiny-endpoint", batch_size=8, device="cpu",
+                                       cache_path="kmmlu_ll_cache.sqlite")
+    finally:
+        stop()
+
+    print(f"✅ In-process HF: {reference['overall']:.2%}, endpoint: {result_data['overall']:.2%} "
+          f"({'match' if abs(reference['overall'] - result_data['overall']) < 1e-9 else 'MISMATCH'})")
+    print_endpoint_stats(result_data['endpoint'])
+    print(f"✅ Cached re-run: {cached['overall']:.2%}, {cached['ll_cache']['hits']} hits / "
+          f"{cached['ll_cache']['misses']} misses")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible endpoint backend for KMMLU")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="serve a small local model as a stand-in endpoint (CPU)")
+    serve_parser.add_argument("--model-dir", required=True, help="HF model folder")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=STAND_IN_PORT)
+    serve_parser.add_argument("--max-batch-size", type=int, default=16)
+    subparsers.add_parser("demo", help="score a tiny model through the stand-in server and compare with HF")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        from aiohttp import web
+        web.run_app(make_stand_in_app(args.model_dir, max_batch_size=args.max_batch_size), host=args.host,
+                    port=args.port)
+    else:
+        _demo()
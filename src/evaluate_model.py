@@ -3,27 +3,29 @@
 # WandB 로깅 및 45개 전체 과목 순위 저장 기능 포함
 
 # === 필요한 라이브러리 임포트 ===
-from lm_eval import simple_evaluate
+# lm_eval / torch는 평가를 시작할 때 import (결과 조회, 큐 확인 등 평가하지 않는 명령은 바로 시작)
+import copy
 import csv
+import io
 import json
 import os
 from datetime import datetime
-import torch
 import gc
 import re
 import time
+from contextlib import nullcontext
+from filelock import FileLock
 
-# WandB 임포트 (선택적)
-try:
-    import wandb
-    WANDB_AVAILABLE = True
-except ImportError:
-    WANDB_AVAILABLE = False
-    print("⚠️ wandb not installed. To enable wandb logging, run: pip install wandb")
+from result_store import ResultStore, RESULT_DB
+
+# WandB 로깅과 결과 저장은 보고 스레드에서 실행 (wandb가 없으면 로컬 파일에 기록, reporting 참고)
+from reporting import get_pipeline, save_unsaved_result, table
 
 # === 전역 상수 정의 ===
 CSV_FILE = 'kmmlu_results.csv'
 JSON_LEADERBOARD = 'kmmlu_leaderboard.json'
+CHECKPOINT_DIR = 'kmmlu_checkpoints'  # 과목별 체크포인트 저장 폴더
+RESULTS_LOCK = 'kmmlu_results.lock'   # 여러 프로세스가 동시에 결과를 저장할 때 사용하는 잠금 파일
 
 # === KMMLU 45개 과목의 정확한 대분류 매핑 ===
 KMMLU_SUBJECT_MAPPING = {
@@ -59,6 +61,23 @@ for category, subjects in KMMLU_SUBJECT_MAPPING.items():
     for subject in subjects:
         SUBJECT_TO_CATEGORY[subject] = category
 
+# === lm_eval KMMLU 대분류 태그 → 결과 대분류 이름 ===
+# lm_eval 그룹 점수(kmmlu_stem 등)는 이 태그에 속한 과목들의 표본 수 가중 평균
+KMMLU_CATEGORY_TAGS = {
+    "STEM": "kmmlu_stem_tasks",
+    "HUMSS": "kmmlu_humss_tasks",
+    "Applied Science": "kmmlu_applied_science_tasks",
+    "Other": "kmmlu_other_tasks"
+}
+
+# 대분류 이름 → result_data 키
+CATEGORY_RESULT_KEYS = {
+    "STEM": "stem",
+    "HUMSS": "humss",
+    "Applied Science": "applied",
+    "Other": "other"
+}
+
 def parse_model_config(model_args):
     """
     model_args 문자열에서 비트 정밀도 추출
@@ -69,8 +88,14 @@ def parse_model_config(model_args):
     Returns:
         str: 비트 정밀도 (예: '8bit', 'float16', '4bit')
     """
+    # base_url= 체크 (OpenAI 호환 엔드포인트, 정밀도는 서버가 결정)
+    if 'base_url=' in model_args:
+        return 'endpoint'
+    # dynamic_int8=True 체크 (CPU 동적 int8 양자화)
+    elif 'dynamic_int8=True' in model_args:
+        return 'int8-dynamic'
     # load_in_8bit=True 체크
-    if 'load_in_8bit=True' in model_args:
+    elif 'load_in_8bit=True' in model_args:
         return '8bit'
     # load_in_4bit=True 체크
     elif 'load_in_4bit=True' in model_args:
@@ -124,17 +149,227 @@ def get_subject_category(subject_name, results=None):
     print(f"⚠️ Warning: Unknown subject '{subject_name}', defaulting to 'Other'")
     return 'Other'
 
-def load_results():
-    """저장된 평가 결과 불러오기 (CSV에서)"""
-    results = []
-    if os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if not row.get('Model') or row.get('Model').startswith('---'):
-                    continue
-                results.append(row)
-    return results
+def list_kmmlu_subject_tasks(task_manager=None):
+    """
+    lm_eval 태스크 인덱스에서 KMMLU 과목 태스크 목록과 대분류를 읽어옴
+    (태스크 인덱스만 읽으므로 데이터셋을 다운로드하지 않음)
+    
+    Returns:
+        dict: {태스크명: 대분류} (예: {"kmmlu_math": "STEM", ...})
+    """
+    from lm_eval.tasks import TaskManager
+    
+    task_manager = task_manager or TaskManager()
+    subject_tasks = {}
+    for category, tag in KMMLU_CATEGORY_TAGS.items():
+        for task_name in sorted(task_manager.task_index[tag]['task']):
+            subject_tasks[task_name] = category
+    return subject_tasks
+
+def aggregate_subject_scores(subject_results):
+    """
+    과목별 정확도와 표본 수로 전체/대분류 점수를 계산 (표본 수 가중 평균)
+    lm_eval의 weight_by_size 집계와 같은 방식
+    
+    Args:
+        subject_results: {태스크명: {"acc": 정확도, "n": 표본 수, "category": 대분류}}
+    
+    Returns:
+        dict: {"overall": ..., "stem": ..., "humss": ..., "applied": ..., "other": ...}
+    """
+    correct = {key: 0.0 for key in CATEGORY_RESULT_KEYS.values()}
+    counts = {key: 0 for key in CATEGORY_RESULT_KEYS.values()}
+    
+    for info in subject_results.values():
+        key = CATEGORY_RESULT_KEYS[info['category']]
+        correct[key] += info['acc'] * info['n']
+        counts[key] += info['n']
+    
+    total = sum(counts.values())
+    scores = {"overall": sum(correct.values()) / total if total else 0.0}
+    for key in CATEGORY_RESULT_KEYS.values():
+        scores[key] = correct[key] / counts[key] if counts[key] else 0.0
+    return scores
+
+def rank_subjects(subject_accs):
+    """
+    과목별 정확도를 점수 오름차순으로 정렬
+    
+    Args:
+        subject_accs: {태스크명: 정확도} (예: {"kmmlu_math": 0.31, ...})
+    
+    Returns:
+        list: [{"name": "Math", "score": 0.31, "category": "STEM"}, ...] (낮은 점수부터)
+    """
+    all_subjects = {}
+    for task, score in subject_accs.items():
+        subject_name = task.replace('kmmlu_', '').replace('_', ' ').title()
+        all_subjects[subject_name] = {
+            'score': score,
+            'category': get_subject_category(task)
+        }
+    
+    # 점수 순으로 정렬 (동점이면 과목명 순, 평가 순서와 관계없이 같은 순위가 나오도록)
+    sorted_subjects = sorted(all_subjects.items(), key=lambda x: (x[1]['score'], x[0]))
+    return [
+        {
+            "name": name,
+            "score": info['score'],
+            "category": info['category']
+        }
+        for name, info in sorted_subjects
+    ]
+
+def simple_evaluate(*args, **kwargs):
+    """lm_eval.simple_evaluate (lm_eval은 처음 평가할 때 import, 오프라인 확인에서는 이 이름을 합성 평가 함수로 바꿔 씀)"""
+    from lm_eval import simple_evaluate as lm_eval_simple_evaluate
+    return lm_eval_simple_evaluate(*args, **kwargs)
+
+def create_lm(model_args, batch_size=16, device="cuda:0", scoring_mode="default", max_batch_tokens=None):
+    """
+    lm_eval HF 모델을 한 번만 로드하여 여러 simple_evaluate 호출에서 재사용
+    (simple_evaluate(model="hf", model_args=...)와 같은 방식으로 생성)
+    
+    scoring_mode: 채점 방식 (scoring.SCORING_MODES 참고)
+    max_batch_tokens: 배치당 최대 토큰 수 (None이면 고정 batch_size 사용)
+    
+    model_args에 base_url= 이 있으면 모델을 로드하지 않고 OpenAI 호환 엔드포인트로 채점
+    (endpoint.EndpointLM, batch_size는 HTTP 요청 하나에 묶는 prompt 수)
+    """
+    if 'base_url=' in model_args:
+        from endpoint import EndpointLM
+        return EndpointLM.create_from_arg_string(model_args, {"batch_size": batch_size})
+    
+    from scoring import ScoringHFLM
+    
+    return ScoringHFLM.create_from_arg_string(
+        model_args,
+        {"batch_size": batch_size, "device": device, "scoring_mode": scoring_mode,
+         "max_batch_tokens": max_batch_tokens}
+    )
+
+def model_output_dir(base_dir, label):
+    """모델 라벨별 하위 폴더 경로 (과목별 체크포인트, shards.py의 shard 결과)"""
+    safe_label = re.sub(r'[^\w.-]+', '_', label)
+    return os.path.join(base_dir, safe_label)
+
+def load_subject_checkpoints(checkpoint_dir, label, model_args, num_fewshot=5):
+    """
+    완료된 과목 체크포인트 불러오기
+    model_args나 num_fewshot이 다른 체크포인트는 무시하고 다시 평가
+    
+    Returns:
+        dict: {태스크명: {"acc": ..., "n": ..., "category": ...}}
+    """
+    model_dir = model_output_dir(checkpoint_dir, label)
+    completed = {}
+    if not os.path.isdir(model_dir):
+        return completed
+    
+    for filename in sorted(os.listdir(model_dir)):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(model_dir, filename), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print(f"⚠️ Broken checkpoint ignored: {filename}")
+            continue
+        
+        if checkpoint.get('model_args') != model_args or checkpoint.get('num_fewshot') != num_fewshot:
+            print(f"⚠️ Checkpoint config mismatch, re-evaluating: {checkpoint.get('task')}")
+            continue
+        
+        completed[checkpoint['task']] = {
+            "acc": checkpoint['acc'],
+            "n": checkpoint['n'],
+            "category": checkpoint['category']
+        }
+    return completed
+
+def save_subject_checkpoint(checkpoint_dir, label, model_args, task_name, subject_result, num_fewshot=5):
+    """
+    한 과목의 평가 결과를 체크포인트 파일로 저장
+    임시 파일에 쓴 뒤 교체하므로 저장 도중 중단되어도 깨진 파일이 남지 않음
+    """
+    model_dir = model_output_dir(checkpoint_dir, label)
+    os.makedirs(model_dir, exist_ok=True)
+    
+    checkpoint = {
+        "task": task_name,
+        "acc": subject_result['acc'],
+        "n": subject_result['n'],
+        "category": subject_result['category'],
+        "model_args": model_args,
+        "num_fewshot": num_fewshot,
+        "finished_at": datetime.now().isoformat(timespec='seconds')
+    }
+    
+    path = os.path.join(model_dir, f"{task_name}.json")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def evaluate_subjects_resumable(model_args, label, batch_size=16, checkpoint_dir=CHECKPOINT_DIR, num_fewshot=5,
+                                lm_factory=None, profiler=None, sample_log=None):
+    """
+    KMMLU 과목을 하나씩 평가하고 과목마다 체크포인트 저장
+    재시작 시 완료된 과목은 건너뛰므로 중단되면 진행 중이던 과목만 다시 평가
+    
+    lm_factory: 모델을 생성하는 함수 (지정하지 않으면 create_lm 사용)
+    profiler: 구간별 시간을 기록할 instrumentation.EvalProfiler (선택)
+    sample_log: 문항별 예측 로그 (sample_log.SampleLogWriter, 선택) - 완료된 과목의 문항을 이전 기록에서 가져옴
+    
+    Returns:
+        dict: {태스크명: {"acc": ..., "n": ..., "category": ...}}
+    """
+    subject_tasks = list_kmmlu_subject_tasks()
+    subject_results = load_subject_checkpoints(checkpoint_dir, label, model_args, num_fewshot)
+    subject_results = {task: info for task, info in subject_results.items() if task in subject_tasks}
+    if sample_log and subject_results:
+        restored = sample_log.resume(subject_results)
+        print(f"📂 Sample log: {restored:,} questions restored for completed subjects")
+    
+    remaining = [task for task in subject_tasks if task not in subject_results]
+    print(f"📂 Checkpoints: {len(subject_results)}/{len(subject_tasks)} subjects completed, {len(remaining)} remaining")
+    
+    if remaining:
+        # 모델은 남은 과목이 있을 때만 한 번 로드
+        lm = lm_factory() if lm_factory else create_lm(model_args, batch_size=batch_size)
+        
+        for i, task_name in enumerate(remaining, 1):
+            print(f"\n▶️ [{i}/{len(remaining)}] {task_name}")
+            with profiler.evaluation() if profiler else nullcontext():
+                results = simple_evaluate(
+                    model=lm,
+                    tasks=[task_name],
+                    num_fewshot=num_fewshot,
+                    log_samples=False
+                )
+            
+            subject_results[task_name] = {
+                "acc": results['results'][task_name]['acc,none'],
+                "n": results['n-samples'][task_name]['effective'],
+                "category": subject_tasks[task_name]
+            }
+            save_subject_checkpoint(checkpoint_dir, label, model_args, task_name, subject_results[task_name], num_fewshot)
+            print(f"💾 Checkpoint saved: {task_name} ({subject_results[task_name]['acc']:.2%})")
+        
+        del lm
+        gc.collect()
+    
+    return subject_results
+
+def load_results(store_path=RESULT_DB):
+    """저장된 평가 결과 불러오기 (결과 저장소에서 모델별 최신 결과)"""
+    if not os.path.exists(store_path):
+        return []
+    store = ResultStore(store_path)
+    try:
+        return store.latest_results()
+    finally:
+        store.close()
 
 def save_results(results):
     """평가 결과를 CSV 파일로 저장"""
@@ -147,296 +382,712 @@ def save_to_csv(results):
     """
     if not results:
         return
-    
-    with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        
-        # === 섹션 1: 기본 모델 정보 ===
-        writer.writerow(['=== BASIC MODEL INFORMATION ==='])
-        writer.writerow([])
-        
-        # 헤더: Timestamp 제거, Elapsed_Time, Batch_Size, Precision 추가
-        basic_header = ['Model', 'Overall', 'STEM', 'HUMSS', 'Applied', 'Other', 
-                       'Best_Subject', 'Best_Score', 
-                       'Worst_Subject', 'Worst_Score',
-                       'Elapsed_Time', 'Batch_Size', 'Precision']
-        writer.writerow(basic_header)
-        
-        # 각 모델의 기본 정보
-        for result in results:
-            basic_row = [
-                result.get('model', result.get('Model', '')),
-                f"{result['overall']:.4f}",
-                f"{result['stem']:.4f}",
-                f"{result['humss']:.4f}",
-                f"{result['applied']:.4f}",
-                f"{result['other']:.4f}",
-                result['best']['name'],
-                f"{result['best']['score']:.4f}",
-                result['worst']['name'],
-                f"{result['worst']['score']:.4f}",
-                result.get('elapsed_time', 'N/A'),  # 걸린 시간
-                result.get('batch_size', 'N/A'),    # 배치 크기
-                result.get('precision', 'N/A')      # 비트 정밀도
-            ]
-            writer.writerow(basic_row)
-        
-        # === 섹션 2: 전체 과목 순위 (45개) ===
-        writer.writerow([])
-        writer.writerow(['=== ALL SUBJECTS RANKING ==='])
-        writer.writerow([])
-        
-        for result in results:
-            model_name = result.get('model', result.get('Model', ''))
-            
-            writer.writerow([f'Model: {model_name}'])
-            writer.writerow(['Rank', 'Subject', 'Score', 'Category'])
-            
-            all_subjects = result.get('all_subjects_ranked', [])
-            
-            for rank, subject_info in enumerate(all_subjects, 1):
-                writer.writerow([
-                    rank,
-                    subject_info['name'],
-                    f"{subject_info['score']:.4f}",
-                    subject_info['category']
-                ])
-            
-            writer.writerow([])
+    write_csv_view([csv_text([csv_basic_row(result)]) for result in results],
+                   [csv_text(csv_subject_block(result)) for result in results])
+
+# 기본 정보 섹션 헤더: Timestamp 제거, Elapsed_Time, Batch_Size, Precision 추가
+CSV_BASIC_HEADER = ['Model', 'Overall', 'STEM', 'HUMSS', 'Applied', 'Other', 
+                    'Best_Subject', 'Best_Score', 
+                    'Worst_Subject', 'Worst_Score',
+                    'Elapsed_Time', 'Batch_Size', 'Precision', 'Approximate']
+
+def csv_basic_row(result):
+    """CSV 기본 정보 섹션의 모델 한 행"""
+    return [
+        result.get('model', result.get('Model', '')),
+        f"{result['overall']:.4f}",
+        f"{result['stem']:.4f}",
+        f"{result['humss']:.4f}",
+        f"{result['applied']:.4f}",
+        f"{result['other']:.4f}",
+        result['best']['name'],
+        f"{result['best']['score']:.4f}",
+        result['worst']['name'],
+        f"{result['worst']['score']:.4f}",
+        result.get('elapsed_time', 'N/A'),  # 걸린 시간
+        result.get('batch_size', 'N/A'),    # 배치 크기
+        result.get('precision', 'N/A'),     # 비트 정밀도
+        'yes' if result.get('approximate') else ''  # 빠른 근사 평가 결과
+    ]
+
+def csv_subject_block(result):
+    """CSV 전체 과목 순위 섹션의 모델 하나 분량 (모델 이름, 헤더, 과목별 행, 빈 줄)"""
+    model_name = result.get('model', result.get('Model', ''))
+    rows = [[f'Model: {model_name}'], ['Rank', 'Subject', 'Score', 'Category']]
+    for rank, subject_info in enumerate(result.get('all_subjects_ranked', []), 1):
+        rows.append([
+            rank,
+            subject_info['name'],
+            f"{subject_info['score']:.4f}",
+            subject_info['category']
+        ])
+    rows.append([])
+    return rows
 
-def append_to_leaderboard(result_data):
+def csv_text(rows):
+    """행 목록을 CSV 텍스트로 변환 (csv.writer 기본 형식)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+CSV_BASIC_SECTION = csv_text([['=== BASIC MODEL INFORMATION ==='], [], CSV_BASIC_HEADER])
+CSV_RANKING_SECTION = csv_text([[], ['=== ALL SUBJECTS RANKING ==='], []])
+
+def write_csv_view(basic_texts, subject_texts):
     """
-    평가 결과를 JSON 리더보드에 누적 저장
+    CSV 보기 작성 (임시 파일에 쓴 뒤 교체하여 읽는 쪽이 쓰다 만 파일을 보지 않도록)
     
     Args:
-        result_data: 평가 결과 딕셔너리
+        basic_texts: 모델별 기본 정보 행의 CSV 텍스트 (섹션 1)
+        subject_texts: 모델별 과목 순위 블록의 CSV 텍스트 (섹션 2, 45개 과목)
     """
-    # 기존 리더보드 불러오기
-    leaderboard = []
-    if os.path.exists(JSON_LEADERBOARD):
-        try:
-            with open(JSON_LEADERBOARD, 'r', encoding='utf-8') as f:
-                leaderboard = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            leaderboard = []
-    
-    # 같은 모델이 이미 있는지 확인
-    existing_idx = None
-    for i, entry in enumerate(leaderboard):
-        if entry.get('model') == result_data['model'] or entry.get('model_path') == result_data['model_path']:
-            existing_idx = i
-            break
-    
-    # 기존 모델 있으면 업데이트, 없으면 추가
-    if existing_idx is not None:
-        leaderboard[existing_idx] = result_data
-        print(f"📝 Updated existing entry in leaderboard: {result_data['model']}")
-    else:
-        leaderboard.append(result_data)
-        print(f"➕ Added new entry to leaderboard: {result_data['model']}")
+    tmp_path = CSV_FILE + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        f.write(CSV_BASIC_SECTION)
+        f.write(''.join(basic_texts))
+        f.write(CSV_RANKING_SECTION)
+        f.write(''.join(subject_texts))
+    os.replace(tmp_path, CSV_FILE)
+
+def read_csv_view():
+    """
+    CSV 보기를 모델별 기본 정보 행과 과목 순위 블록의 텍스트로 나눠 읽기 (write_csv_view의 역, 행을 파싱하지 않음)
     
-    # JSON 파일에 저장
-    with open(JSON_LEADERBOARD, 'w', encoding='utf-8') as f:
-        json.dump(leaderboard, f, indent=2, ensure_ascii=False)
+    Returns:
+        tuple: (기본 정보 행 텍스트 목록, 과목 순위 블록 텍스트 목록) - 둘 다 리더보드 순서
+    """
+    with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
+        text = f.read()
+    if not text.startswith(CSV_BASIC_SECTION) or CSV_RANKING_SECTION not in text:
+        raise ValueError(f"Unexpected layout in {CSV_FILE}")
+    basic, ranking = text[len(CSV_BASIC_SECTION):].split(CSV_RANKING_SECTION, 1)
     
-    print(f"💾 Leaderboard saved to {JSON_LEADERBOARD}")
+    subject_texts = []
+    for line in csv_lines(ranking):
+        # 블록은 "Model: <표시 이름>" 한 칸짜리 행으로 시작 (과목 행은 순위 숫자로 시작)
+        if line.startswith(('Model: ', '"Model: ')):
+            subject_texts.append('')
+        if not subject_texts:
+            raise ValueError(f"Unexpected layout in {CSV_FILE}")
+        subject_texts[-1] += line
+    return csv_lines(basic), subject_texts
+
+def csv_lines(text):
+    """csv.writer가 쓴 텍스트를 행 단위로 나눔 (행 끝 \\r\\n 포함)"""
+    return [line + '\r\n' for line in text.split('\r\n')[:-1]]
 
-def evaluate_model(model_name, model_args, label, batch_size=16, wandb_project=None, wandb_run_name=None):
+def save_leaderboard(results):
     """
-    모델 평가 및 저장
+    모델별 최신 결과를 JSON 리더보드 파일로 저장 (임시 파일에 쓴 뒤 교체)
+    
+    Args:
+        results: 결과 딕셔너리 목록 (ResultStore.latest_results())
     """
+    tmp_path = JSON_LEADERBOARD + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, JSON_LEADERBOARD)
+
+def read_leaderboard_entries():
+    """
+    JSON 리더보드를 항목별로 읽기 (항목마다 원래 텍스트를 함께 돌려주어 다시 인코딩하지 않고 그대로 쓸 수 있게 함)
     
-    # GPU 메모리 정리
-    torch.cuda.empty_cache()
-    gc.collect()
+    Returns:
+        list: [(결과 딕셔너리, save_leaderboard가 쓴 항목 텍스트), ...]
+    """
+    with open(JSON_LEADERBOARD, 'r', encoding='utf-8') as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    entries = []
+    pos = text.index('[') + 1
+    while True:
+        while text[pos] in ' \t\r\n,':
+            pos += 1
+        if text[pos] == ']':
+            return entries
+        entry, end = decoder.raw_decode(text, pos)
+        entries.append((entry, text[pos:end]))
+        pos = end
+
+def supersedes(new_result, old_result):
+    """
+    new_result가 리더보드에서 old_result를 대체하는지 (result_store.LATEST_RUN_CONDITION과 같은 기준)
+    같은 표시 이름이나 같은 모델 경로이고 근사 평가 여부가 같으면 대체
+    """
+    same_model = (old_result.get('model') == new_result.get('model')
+                  or (new_result.get('model_path') is not None
+                      and old_result.get('model_path') == new_result.get('model_path')))
+    return same_model and bool(old_result.get('approximate')) == bool(new_result.get('approximate'))
+
+def update_views(result_data, latest_count):
+    """
+    새 결과 하나만 CSV/JSON 보기에 반영 (대체되는 모델의 행/항목만 빼고 새 결과를 끝에 추가,
+    다른 모델의 행은 다시 만들지 않음)
     
-    # 비트 정밀도 추출
-    precision = parse_model_config(model_args)
+    Args:
+        result_data: 방금 저장소에 추가한 결과
+        latest_count: 추가 후 저장소의 모델별 최신 결과 수 (보기가 저장소와 맞는지 확인)
     
-    print(f"\n{'='*60}")
-    print(f"Evaluating: {label}")
-    print(f"Batch Size: {batch_size}")
-    print(f"Precision: {precision}")
-    print(f"{'='*60}")
+    Returns:
+        bool: 갱신 여부 (보기 파일이 없거나 깨졌거나 저장소와 맞지 않으면 False, 이때는 전체 재생성 필요)
+    """
+    try:
+        leaderboard = read_leaderboard_entries()
+        basic_texts, subject_texts = read_csv_view()
+    except (OSError, ValueError, IndexError):  # json.JSONDecodeError는 ValueError
+        return False
+    if not len(leaderboard) == len(basic_texts) == len(subject_texts):
+        return False
     
-    # WandB 초기화
-    wandb_run = None
-    if WANDB_AVAILABLE and wandb_project:
+    keep = [i for i, (entry, _) in enumerate(leaderboard) if not supersedes(result_data, entry)]
+    if len(keep) + 1 != latest_count:
+        return False
+    
+    write_csv_view([basic_texts[i] for i in keep] + [csv_text([csv_basic_row(result_data)])],
+                   [subject_texts[i] for i in keep] + [csv_text(csv_subject_block(result_data))])
+    
+    # JSON: 남는 항목은 읽은 텍스트 그대로, 새 결과만 인코딩 (save_leaderboard의 json.dump(indent=2)와 같은 형식)
+    new_entry = json.dumps(result_data, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+    tmp_path = JSON_LEADERBOARD + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('[\n  ' + ',\n  '.join([leaderboard[i][1] for i in keep] + [new_entry]) + '\n]')
+    os.replace(tmp_path, JSON_LEADERBOARD)
+    return True
+
+def store_result(result_data, store_path=RESULT_DB):
+    """
+    평가 결과를 결과 저장소에 추가하고 CSV/JSON 리더보드 보기를 갱신
+    
+    저장소에는 실행 기록이 한 행씩 추가만 되고(이전 기록은 유지),
+    CSV/JSON은 이번 모델의 행/항목만 바꿈 (다른 모델의 결과는 저장소에서 다시 읽거나 다시 만들지 않음)
+    보기 파일이 없거나 저장소와 맞지 않으면 저장소의 모델별 최신 결과로 다시 만듦
+    처음 실행 시 기존 JSON 리더보드가 있으면 저장소로 가져옴
+    
+    Returns:
+        int: 저장소의 run_id
+    """
+    # 병렬 실행 시 보기 파일을 동시에 쓰지 않도록 잠금 (저장소 추가 자체는 SQLite 트랜잭션으로 보호)
+    with FileLock(RESULTS_LOCK):
+        store = ResultStore(store_path)
         try:
-            wandb_run = wandb.init(
-                project=wandb_project,
-                name=wandb_run_name or label,
-                config={
-                    "model_name": model_name,
-                    "model_args": model_args,
-                    "label": label,
-                    "batch_size": batch_size,
-                    "precision": precision
-                },
-                reinit=True
-            )
-            print(f"✅ WandB logging enabled: {wandb_project}/{wandb_run_name or label}")
-        except Exception as e:
-            print(f"⚠️ WandB initialization failed: {e}")
-            wandb_run = None
-    
-    # CUDA 메모리 최적화
-    os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
-    
-    # 시작 시간 기록
-    start_time = time.time()
-    
-    # 평가 실행
-    results = simple_evaluate(
-        model="hf",
-        model_args=model_args,
-        tasks=["kmmlu"],
-        batch_size=batch_size,
-        device="cuda:0",
-        num_fewshot=5
-    )
+            store.import_leaderboard(JSON_LEADERBOARD)
+            run_id = store.append(result_data)
+            latest = None
+            if not update_views(result_data, len(store.latest_run_ids())):
+                latest = store.latest_results()
+        finally:
+            store.close()
+        
+        if latest is not None:
+            # 보기 전체 재생성: 1. CSV 보기, 2. JSON 리더보드 보기
+            save_results(latest)
+            save_leaderboard(latest)
+        print(f"\n💾 Saved to {CSV_FILE} (run #{run_id} in {store_path})\n")
+        print(f"💾 Leaderboard saved to {JSON_LEADERBOARD}")
+    return run_id
+
+def evaluate_model(model_name, model_args, label, batch_size=16, wandb_project=None, wandb_run_name=None,
+                   checkpoint_dir=None, cache_path=None, cache_max_entries=None, scoring_mode="default",
+                   max_batch_tokens=None, device="cuda:0", prompt_cache_dir=None, quick_ci_width=None, quick_seed=0,
+                   model_cache=None, sample_log_dir=None, prefetch_stats=None, profile_subjects=False):
+    """
+    모델 평가 및 저장
     
-    # 종료 시간 기록 및 경과 시간 계산
-    end_time = time.time()
-    elapsed_seconds = end_time - start_time
-    elapsed_time_str = format_time(elapsed_seconds)
+    checkpoint_dir를 지정하면 과목별로 평가하며 체크포인트를 저장하고,
+    재실행 시 완료된 과목을 건너뛰어 이어서 평가 (예: checkpoint_dir=CHECKPOINT_DIR)
     
-    # 전체 평균 정확도
-    overall = results['results']['kmmlu']['acc,none']
+    cache_path를 지정하면 요청별 loglikelihood 결과를 디스크 캐시에서 먼저 찾고,
+    같은 모델 설정으로 다시 실행할 때 이미 계산한 forward pass를 건너뜀
+    (예: cache_path=LL_CACHE_FILE, base_url= 엔드포인트는 요청 문자열과 base_url/model로 키를 만듦)
     
-    # 대분류 점수
-    stem_score = results['results']['kmmlu_stem']['acc,none']
-    humss_score = results['results']['kmmlu_humss']['acc,none']
-    applied_score = results['results']['kmmlu_applied_science']['acc,none']
-    other_score = results['results']['kmmlu_other']['acc,none']
+    scoring_mode="prefix_cache"이면 공통 few-shot prefix의 KV 캐시를 재사용하여 채점
+    (정확도는 기본 경로와 동일, 절약된 prefill 토큰 수는 result_data['scoring']에 기록)
+    scoring_mode="single_pass"이면 context를 한 번만 forward하여 A/B/C/D를 함께 채점,
+    "per_option"이면 선택지마다 따로 forward (모드별 문항/초는 result_data['throughput']에 기록)
     
-    # 개별 과목 점수 수집
-    all_subjects = {}
-    for task, metrics in results['results'].items():
-        if task.startswith('kmmlu_') and 'acc,none' in metrics:
-            if task not in ['kmmlu_stem', 'kmmlu_humss', 'kmmlu_applied_science', 'kmmlu_other', 'kmmlu']:
-                subject_name = task.replace('kmmlu_', '').replace('_', ' ').title()
-                category = get_subject_category(task)
-                all_subjects[subject_name] = {
-                    'score': metrics['acc,none'],
-                    'category': category
-                }
-    
-    # 점수 순으로 정렬
-    sorted_subjects = sorted(all_subjects.items(), key=lambda x: x[1]['score'])
-    
-    all_subjects_ranked = [
-        {
-            "name": name,
-            "score": info['score'],
-            "category": info['category']
-        }
-        for name, info in sorted_subjects
-    ]
+    max_batch_tokens를 지정하면 고정 batch_size 대신 배치당 토큰 예산으로 요청을 묶음
+    ("auto"이면 정밀도별 기본값 scoring.DEFAULT_TOKEN_BUDGETS 사용)
     
-    best_subject = sorted_subjects[-1]
-    worst_subject = sorted_subjects[0]
-    
-    # 결과 정리
-    result_data = {
-        "model": label,
-        "model_path": model_name,
-        "overall": overall,
-        "stem": stem_score,
-        "humss": humss_score,
-        "applied": applied_score,
-        "other": other_score,
-        "best": {
-            "name": best_subject[0],
-            "score": best_subject[1]['score']
-        },
-        "worst": {
-            "name": worst_subject[0],
-            "score": worst_subject[1]['score']
-        },
-        "all_subjects_ranked": all_subjects_ranked,
-        "elapsed_time": elapsed_time_str,  # 걸린 시간 추가
-        "batch_size": batch_size,          # 배치 크기 추가
-        "precision": precision              # 비트 정밀도 추가
-    }
+    batch_size="autotune"이면 모델 로드 후 OOM이 나지 않는 가장 큰 batch_size를 찾아 사용하고
+    로컬 프로파일(autotune.BATCH_PROFILE_FILE)에 저장하여 다음 실행은 그 값부터 시작
+    (토큰 예산 배치에서는 batch_size를 쓰지 않으므로 탐색을 건너뜀)
     
-    # WandB 로깅
-    if wandb_run:
-        try:
-            wandb.log({
-                "overall_accuracy": overall,
-                "stem_accuracy": stem_score,
-                "humss_accuracy": humss_score,
-                "applied_science_accuracy": applied_score,
-                "other_accuracy": other_score,
-                "best_subject_score": best_subject[1]['score'],
-                "worst_subject_score": worst_subject[1]['score'],
-                "elapsed_seconds": elapsed_seconds,
-                "batch_size": batch_size,
-                "precision": precision
-            })
-            
-            top_5 = all_subjects_ranked[-5:][::-1]
-            bottom_5 = all_subjects_ranked[:5]
-            
-            wandb.log({
-                "top_5_subjects": wandb.Table(
-                    columns=["Subject", "Score", "Category"],
-                    data=[[s['name'], s['score'], s['category']] for s in top_5]
-                ),
-                "bottom_5_subjects": wandb.Table(
-                    columns=["Subject", "Score", "Category"],
-                    data=[[s['name'], s['score'], s['category']] for s in bottom_5]
-                )
-            })
-            
-            print("✅ Results logged to WandB")
-        except Exception as e:
-            print(f"⚠️ WandB logging failed: {e}")
-        finally:
-            wandb.finish()
+    device: 모델을 올릴 장치 (예: "cuda:0", "cuda:1", "cpu")
     
-    # 콘솔 출력
-    print(f"\n✅ Evaluation Complete!")
-    print(f"Elapsed Time: {elapsed_time_str}")
-    print(f"Overall: {overall:.2%}")
+    model_args에 base_url= 을 주면 모델을 로드하지 않고 OpenAI 호환 엔드포인트로 채점
+    (예: "base_url=http://localhost:8000/v1,model=...,num_concurrent=8", batch_size는 요청당 prompt 수,
+    요청 수, 재시도, 지연 시간 p50/p95/p99는 result_data['endpoint']에 기록)
     
-    print(f"\n📊 Category Scores:")
-    print(f"  STEM:            {stem_score:.2%}")
-    print(f"  HUMSS:           {humss_score:.2%}")
-    print(f"  Applied Science: {applied_score:.2%}")
-    print(f"  Other:           {other_score:.2%}")
+    prompt_cache_dir를 지정하면 프롬프트 토큰화 결과를 토크나이저별 캐시에서 memory-map으로 읽어 재사용
+    (같은 토크나이저의 다른 모델이나 다른 정밀도 재평가 시 토큰화를 건너뜀, 예: prompt_cache_dir=PROMPT_CACHE_DIR,
+    few-shot 프롬프트 렌더링은 캐시하지 않으므로 매번 실행됨)
     
-    print(f"\n🏆 Best Subject:  {best_subject[0]:35s} {best_subject[1]['score']:.2%} ({best_subject[1]['category']})")
-    print(f"📉 Worst Subject: {worst_subject[0]:35s} {worst_subject[1]['score']:.2%} ({worst_subject[1]['category']})")
+    model_cache를 지정하면 모델을 새로 로드하지 않고 캐시에 이미 올라가 있는 모델을 재사용
+    (model_server.ModelCache, 적중 여부와 절약된 로드 시간은 result_data['model_cache']에 기록)
     
-    print(f"\n📋 Bottom 10 Subjects (낮은 점수):")
-    for i, subject in enumerate(all_subjects_ranked[:10], 1):
-        print(f"  {i:2d}. {subject['name']:35s} {subject['score']:.2%}  [{subject['category']}]")
+    sample_log_dir를 지정하면 문항별 예측(정답, 고른 선택지, 선택지별 loglikelihood, 정답 여부)을
+    <sample_log_dir>/<label>.parquet에 평가 중 row group 단위로 기록 (예: sample_log_dir=SAMPLE_LOG_DIR,
+    sample_log.read_samples로 과목/모델별로 읽음, 경로와 문항 수는 result_data['sample_log']에 기록)
+    checkpoint_dir 모드에서 중단 후 이어서 평가하면 완료된 과목의 문항은 이전 기록에서 가져와 합침
     
-    print(f"\nTotal Subjects Evaluated: {len(all_subjects)} (KMMLU has 45 standard subjects)")
+    quick_ci_width를 지정하면 빠른 근사 평가: 과목별로 문항을 무작위로 뽑아 평가하다가 정확도 신뢰구간 폭이
+    quick_ci_width 이하가 된 과목은 중단하고, 점수는 층화 추정치와 신뢰구간으로 보고
+    (예: quick_ci_width=QUICK_CI_WIDTH, result_data['approximate']=True, 상세는 result_data['quick_eval'],
+    checkpoint_dir보다 우선, quick_seed가 같으면 같은 문항을 뽑음)
     
-    # 저장
-    all_results = load_results()
+    모델 가중치는 시작 시간을 재기 전에 prefetch.ensure_weights로 다운로드/확인하므로 elapsed_time에 다운로드
+    시간이 들어가지 않음 (상태, 크기, 걸린 시간은 result_data['prefetch']에 기록, batch_evaluate처럼
+    WeightPrefetcher로 미리 받은 경우 그 결과를 prefetch_stats로 넘기면 다시 확인하지 않음)
     
-    existing_idx = None
-    for i, r in enumerate(all_results):
-        if r.get('Model') == label or r.get('model_path') == model_name:
-            existing_idx = i
-            break
+    구간별 시간(모델 로드, 프롬프트 구성, 토큰화, forward, 후처리)과 과목별 tokens/sec, requests/sec,
+    최대 host/device 메모리는 result_data['profile']에 기록 (instrumentation 참고)
+    과목별 수치는 과목마다 따로 채점하는 체크포인트 모드에서 기록되고, 그 밖의 모드에서는
+    profile_subjects=True일 때만 과목별로 나눠 채점하여 기록 (배치가 과목 경계에서 끊겨 조금 느려짐)
+    """
     
-    if existing_idx is not None:
-        all_results[existing_idx] = result_data
-    else:
-        all_results.append(result_data)
+    # GPU 메모리 정리 (CPU 평가에서는 CUDA를 건드리지 않음)
+    if str(device).startswith('cuda'):
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    gc.collect()
     
-    # 1. CSV 저장
-    save_results(all_results)
-    print(f"\n💾 Saved to {CSV_FILE}\n")
-    # 2. JSON에 누적 저장
-    append_to_leaderboard(result_data)
+    # 비트 정밀도 추출
+    precision = parse_model_config(model_args)
     
-    return result_data
+    # 정밀도별 기본 토큰 예산
+    if max_batch_tokens == "auto":
+        from scoring import token_budget_for
+        max_batch_tokens = token_budget_for(precision)
+    
+    print(f"\n{'='*60}")
+    print(f"Evaluating: {label}")
+    print(f"Batch Size: {batch_size}" + (f" (token budget: {max_batch_tokens})" if max_batch_tokens else ""))
+    print(f"Precision: {precision}")
+    print(f"Device: {device}")
+    print(f"{'='*60}")
+    
+    # WandB 초기화 (보고 스레드에서 실행되므로 기다리지 않음)
+    wandb_run = None
+    if wandb_project:
+        wandb_run = get_pipeline().start_run(
+            project=wandb_project,
+            name=wandb_run_name or label,
+            config={
+                "model_name": model_name,
+                "model_args": model_args,
+                "label": label,
+                "batch_size": batch_size,
+                "max_batch_tokens": max_batch_tokens,
+                "precision": precision
+            }
+        )
+    
+    ll_cache = None
+    sample_log = None
+    try:
+        # CUDA 메모리 최적화
+        os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
+        
+        # loglikelihood 디스크 캐시 (선택)
+        if cache_path:
+            from loglikelihood_cache import LoglikelihoodCache, CachedLM, model_identity, DEFAULT_MAX_ENTRIES
+            ll_cache = LoglikelihoodCache(cache_path, max_entries=cache_max_entries or DEFAULT_MAX_ENTRIES)
+        
+        # 채점 통계 (모델 생성 시 채점 엔진의 통계 딕셔너리를 연결)
+        scoring_stats = {}
+        
+        # 토큰화 프롬프트 캐시 (모델 생성 시 토크나이저로 캐시 키를 정해 연결)
+        prompt_cache = None
+        
+        # 문항별 예측 로그 (선택)
+        if sample_log_dir:
+            from sample_log import SampleLogLM, SampleLogWriter, sample_log_path
+            sample_log = SampleLogWriter(sample_log_path(label, sample_log_dir), label, metadata={
+                "model_path": model_name,
+                "model_args": model_args,
+                "approximate": bool(quick_ci_width)
+            }, keep_partial=bool(checkpoint_dir) and not quick_ci_width)
+        
+        # 구간별 시간 / 과목별 처리량 / 최대 메모리 측정
+        from instrumentation import EvalProfiler, InstrumentedLM
+        profiler = EvalProfiler(device)
+        
+        def build_lm():
+            """평가 옵션에 맞게 모델 생성 (캐시 사용 시 캐시 래퍼로 감쌈)"""
+            nonlocal batch_size, prompt_cache
+            with profiler.phase('model_load'):
+                autotune = batch_size == "autotune"
+                if autotune and (max_batch_tokens or precision == 'endpoint'):
+                    batch_size, autotune = None, False
+                if model_cache is not None:
+                    # 서버의 모델 캐시에서 꺼내 평가 설정만 바꿔 재사용 (없으면 로드하여 캐시에 보관)
+                    lm = model_cache.get(model_name, model_args, device, lambda: create_lm(
+                        model_args, batch_size=1, device=device, scoring_mode=scoring_mode))
+                    lm.configure(batch_size=1 if autotune else batch_size, scoring_mode=scoring_mode,
+                                 max_batch_tokens=max_batch_tokens)
+                else:
+                    lm = create_lm(model_args, batch_size=1 if autotune else batch_size, device=device,
+                                   scoring_mode=scoring_mode, max_batch_tokens=max_batch_tokens)
+                if autotune:
+                    from autotune import autotune_batch_size, make_forward_probe
+                    batch_size = autotune_batch_size(model_name, precision, make_forward_probe(lm))
+                    lm.batch_size_per_gpu = batch_size
+            if not scoring_stats:
+                scoring_stats.update(lm.scoring_stats)
+            lm.scoring_stats = scoring_stats
+            if prompt_cache_dir and precision != 'endpoint':
+                from prompt_cache import PromptTokenCache
+                if prompt_cache is None:
+                    prompt_cache = PromptTokenCache.for_lm(lm, prompt_cache_dir)
+                lm.prompt_cache = prompt_cache
+            if ll_cache:
+                lm = CachedLM(lm, ll_cache, model_identity(model_name, model_args))
+            lm = InstrumentedLM(lm, profiler, scoring_stats, split_subjects=profile_subjects)
+            if sample_log:
+                lm = SampleLogLM(lm, sample_log)
+            return lm
+        
+        # 모델 가중치 다운로드/확인 (걸린 시간은 elapsed_time에서 제외, 실패하면 모델 로드 단계에서 다시 시도)
+        if prefetch_stats is None and model_cache is None:
+            from prefetch import ensure_weights
+            try:
+                prefetch_stats = ensure_weights(model_args)
+            except Exception as e:
+                print(f"⚠️ Weight prefetch failed: {type(e).__name__}: {e}")
+        
+        # 시작 시간 기록
+        start_time = time.time()
+        
+        quick_summary = None
+        if quick_ci_width:
+            # 빠른 근사 평가: 과목별 층화 표본, 신뢰구간이 좁아진 과목부터 중단
+            from quick_eval import load_subject_sizes, quick_evaluate
+            subject_tasks = list_kmmlu_subject_tasks()
+            with profiler.phase('prompt_build'):
+                subject_sizes = load_subject_sizes(subject_tasks)
+            subject_results, quick_summary = quick_evaluate(
+                build_lm(), subject_tasks, subject_sizes, simple_evaluate,
+                ci_width=quick_ci_width,
+                seed=quick_seed,
+                profiler=profiler
+            )
+        elif checkpoint_dir:
+            # 과목별 체크포인트 모드: 완료된 과목은 건너뛰고 체크포인트로 점수 재구성
+            subject_results = evaluate_subjects_resumable(
+                model_args, label,
+                batch_size=batch_size,
+                checkpoint_dir=checkpoint_dir,
+                lm_factory=build_lm,
+                profiler=profiler,
+                sample_log=sample_log
+            )
+        else:
+            # 평가 실행
+            lm = build_lm()
+            with profiler.evaluation():
+                results = simple_evaluate(
+                    model=lm,
+                    tasks=["kmmlu"],
+                    num_fewshot=5,
+                    log_samples=False
+                )
+        
+        # 종료 시간 기록 및 경과 시간 계산
+        end_time = time.time()
+        elapsed_seconds = end_time - start_time
+        elapsed_time_str = format_time(elapsed_seconds)
+        
+        post_processing_start = time.time()
+        if quick_summary:
+            # 층화 추정치 (과목별 전체 문항 수로 가중)
+            scores = {key: estimate['estimate'] for key, estimate in quick_summary['estimates'].items()}
+        elif checkpoint_dir:
+            # 전체/대분류 점수를 과목별 표본 수로 가중 평균
+            scores = aggregate_subject_scores(subject_results)
+        if quick_summary or checkpoint_dir:
+            overall = scores['overall']
+            stem_score = scores['stem']
+            humss_score = scores['humss']
+            applied_score = scores['applied']
+            other_score = scores['other']
+            subject_accs = {task: info['acc'] for task, info in subject_results.items()}
+        else:
+            # 전체 평균 정확도
+            overall = results['results']['kmmlu']['acc,none']
+            
+            # 대분류 점수
+            stem_score = results['results']['kmmlu_stem']['acc,none']
+            humss_score = results['results']['kmmlu_humss']['acc,none']
+            applied_score = results['results']['kmmlu_applied_science']['acc,none']
+            other_score = results['results']['kmmlu_other']['acc,none']
+            
+            subject_accs = {
+                task: metrics['acc,none']
+                for task, metrics in results['results'].items()
+                if task.startswith('kmmlu_') and 'acc,none' in metrics
+                and task not in ['kmmlu_stem', 'kmmlu_humss', 'kmmlu_applied_science', 'kmmlu_other', 'kmmlu']
+            }
+        
+        # 개별 과목 점수 수집 및 점수 순 정렬
+        all_subjects_ranked = rank_subjects(subject_accs)
+        best_subject = all_subjects_ranked[-1]
+        worst_subject = all_subjects_ranked[0]
+        profiler.phases['post_processing'] += time.time() - post_processing_start
+        
+        # 결과 정리
+        result_data = {
+            "model": label,
+            "model_path": model_name,
+            "overall": overall,
+            "stem": stem_score,
+            "humss": humss_score,
+            "applied": applied_score,
+            "other": other_score,
+            "best": {
+                "name": best_subject['name'],
+                "score": best_subject['score']
+            },
+            "worst": {
+                "name": worst_subject['name'],
+                "score": worst_subject['score']
+            },
+            "all_subjects_ranked": all_subjects_ranked,
+            "elapsed_time": elapsed_time_str,  # 걸린 시간 추가
+            "batch_size": batch_size,          # 배치 크기 추가
+            "max_batch_tokens": max_batch_tokens,  # 배치당 토큰 예산 (None이면 고정 배치)
+            "precision": precision,             # 비트 정밀도 추가
+            "approximate": quick_summary is not None  # 빠른 근사 평가 결과 여부
+        }
+        
+        # 빠른 근사 평가: 점수별 신뢰구간, 평가한 문항 수, 과목별 수렴 여부
+        if quick_summary:
+            result_data["quick_eval"] = quick_summary
+        
+        # padding 효율 및 실효 배치 크기 (채점 엔진이 배치를 직접 구성한 경우)
+        if scoring_stats:
+            from scoring import padding_summary
+            result_data.update(padding_summary(scoring_stats['batching']))
+        
+        # 채점 통계 (prefix 캐시 모드: 절약된 prefill 토큰 수)
+        if scoring_stats:
+            computed = scoring_stats['prefill_tokens_computed']
+            result_data["scoring"] = dict(scoring_stats)
+            if "endpoint" in result_data["scoring"]:
+                # 엔드포인트 요청 수, 재시도, 지연 시간 p50/p95/p99
+                result_data["endpoint"] = result_data["scoring"].pop("endpoint")
+            if computed and scoring_stats['prefill_tokens_baseline']:
+                result_data["scoring"]["prefill_reduction"] = scoring_stats['prefill_tokens_baseline'] / computed
+            
+            # 채점 모드별 처리량 (리더보드에서 모드 간 비교용)
+            seconds = scoring_stats['scoring_seconds']
+            result_data["throughput"] = {
+                "scoring_mode": scoring_mode,
+                "questions": scoring_stats['questions'],
+                "scoring_seconds": seconds,
+                "questions_per_sec": scoring_stats['questions'] / seconds if seconds else 0.0
+            }
+        
+        # 구간별 시간, 과목별 처리량, 최대 메모리
+        result_data["profile"] = profiler.summary()
+        
+        # 가중치 다운로드/확인 (elapsed_time에 포함되지 않은 시간)
+        if prefetch_stats:
+            result_data["prefetch"] = {key: value for key, value in prefetch_stats.items() if key != "repos"}
+        
+        # 토큰화 캐시: 새로 토큰화한 프롬프트 저장 및 절약량
+        if prompt_cache is not None:
+            prompt_cache.save()
+            result_data["prompt_cache"] = prompt_cache.stats()
+        
+        # 모델 캐시 적중 여부 (평가 서버에서 실행한 경우)
+        if model_cache is not None and model_cache.last_lookup:
+            result_data["model_cache"] = dict(model_cache.last_lookup)
+        
+        # 문항별 예측 로그: 남은 row group 기록 후 파일 완성
+        if sample_log:
+            sample_log.close()
+            result_data["sample_log"] = sample_log.stats()
+        
+        # loglikelihood 캐시 적중 통계
+        if ll_cache:
+            result_data["ll_cache"] = ll_cache.stats()
+        
+        # WandB 로깅 (큐에 넣기만 하고 바로 진행, wandb.Table 변환과 전송은 보고 스레드에서 실행)
+        if wandb_run:
+            try:
+                wandb_run.log({
+                    "overall_accuracy": overall,
+                    "stem_accuracy": stem_score,
+                    "humss_accuracy": humss_score,
+                    "applied_science_accuracy": applied_score,
+                    "other_accuracy": other_score,
+                    "best_subject_score": best_subject['score'],
+                    "worst_subject_score": worst_subject['score'],
+                    "elapsed_seconds": elapsed_seconds,
+                    "batch_size": batch_size,
+                    "precision": precision
+                })
+                
+                if quick_summary:
+                    wandb_run.log({
+                        "approximate": True,
+                        "overall_ci_low": quick_summary["estimates"]["overall"]["ci"][0],
+                        "overall_ci_high": quick_summary["estimates"]["overall"]["ci"][1],
+                        "quick_eval_questions": quick_summary["questions"],
+                        "quick_eval_sampled_fraction": quick_summary["sampled_fraction"]
+                    })
+                
+                if "scoring" in result_data:
+                    wandb_run.log({
+                        "scoring_mode": scoring_mode,
+                        "questions_per_sec": result_data["throughput"]["questions_per_sec"],
+                        "scoring_seconds": result_data["scoring"]["scoring_seconds"],
+                        "prefill_tokens_computed": result_data["scoring"]["prefill_tokens_computed"],
+                        "prefill_tokens_saved": result_data["scoring"]["prefill_tokens_saved"]
+                    })
+                
+                if "endpoint" in result_data:
+                    latency = result_data["endpoint"]["latency_ms"]
+                    wandb_run.log({
+                        "endpoint_http_requests": result_data["endpoint"]["http_requests"],
+                        "endpoint_retries": result_data["endpoint"]["retries"],
+                        **{f"endpoint_latency_{key}_ms": latency[key] for key in ("p50", "p95", "p99")}
+                    })
+                
+                if result_data.get("padding_efficiency") is not None:
+                    wandb_run.log({
+                        "padding_efficiency": result_data["padding_efficiency"],
+                        "effective_batch_size_mean": result_data["effective_batch_size"]["mean"]
+                    })
+                
+                profile = result_data["profile"]
+                wandb_run.log({
+                    **{f"phase/{name}_seconds": seconds for name, seconds in profile["phases"].items()},
+                    "tokens_per_sec": profile["tokens_per_sec"],
+                    "requests_per_sec": profile["requests_per_sec"],
+                    "peak_host_memory_mb": profile["peak_host_memory_mb"],
+                    **{f"host_memory/{name}_mb": mb for name, mb in profile["host_memory_mb"].items()},
+                    **({"peak_device_memory_mb": profile["peak_device_memory_mb"]}
+                       if profile["peak_device_memory_mb"] is not None else {}),
+                    "subject_throughput": table(
+                        columns=["Subject", "Requests", "Tokens", "Seconds", "Tokens/sec", "Requests/sec",
+                                 "Peak Device MB", "Peak Host MB"],
+                        data=[[task, s["requests"], s["tokens"], s["seconds"], s["tokens_per_sec"],
+                               s["requests_per_sec"], s["peak_device_memory_mb"], s["peak_host_memory_mb"]]
+                              for task, s in profile["subjects"].items()]
+                    )
+                })
+                
+                if "prompt_cache" in result_data:
+                    wandb_run.log({
+                        "prompt_cache_hit_rate": result_data["prompt_cache"]["hit_rate"],
+                        "prompt_cache_seconds_saved": result_data["prompt_cache"]["seconds_saved"],
+                        "prompt_cache_mapped_mb": result_data["prompt_cache"]["mapped_mb"]
+                    })
+                
+                if "ll_cache" in result_data:
+                    wandb_run.log({
+                        "ll_cache_hits": result_data["ll_cache"]["hits"],
+                        "ll_cache_misses": result_data["ll_cache"]["misses"],
+                        "ll_cache_hit_rate": result_data["ll_cache"]["hit_rate"]
+                    })
+                
+                top_5 = all_subjects_ranked[-5:][::-1]
+                bottom_5 = all_subjects_ranked[:5]
+                
+                wandb_run.log({
+                    "top_5_subjects": table(
+                        columns=["Subject", "Score", "Category"],
+                        data=[[s['name'], s['score'], s['category']] for s in top_5]
+                    ),
+                    "bottom_5_subjects": table(
+                        columns=["Subject", "Score", "Category"],
+                        data=[[s['name'], s['score'], s['category']] for s in bottom_5]
+                    )
+                })
+                
+                print("✅ Results queued for WandB")
+            except Exception as e:
+                print(f"⚠️ WandB logging failed: {e}")
+        
+        # 콘솔 출력
+        print(f"\n✅ Evaluation Complete!")
+        print(f"Elapsed Time: {elapsed_time_str}")
+        if "prefetch" in result_data and result_data["prefetch"]["status"] != "remote":
+            prefetch = result_data["prefetch"]
+            print(f"Weights: {prefetch['status']} ({prefetch['size_mb']:,.0f}MB, {prefetch['seconds']:.1f}s"
+                  + (f", waited {prefetch['wait_seconds']:.1f}s" if "wait_seconds" in prefetch else "")
+                  + ", not counted in elapsed time)")
+        print(f"Overall: {overall:.2%}")
+        if quick_summary:
+            low, high = quick_summary["estimates"]["overall"]["ci"]
+            print(f"⚡ Quick-eval (approximate): {quick_summary['confidence']:.0%} CI {low:.2%} - {high:.2%}, "
+                  f"{quick_summary['questions']:,}/{quick_summary['total_questions']:,} questions "
+                  f"({quick_summary['sampled_fraction']:.1%}) in {quick_summary['rounds']} rounds")
+        profile = result_data["profile"]
+        print("Phases: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in profile["phases"].items()))
+        print(f"Scoring: {profile['tokens_per_sec']:,.0f} tokens/sec, {profile['requests_per_sec']:.1f} requests/sec, "
+              f"peak host {profile['peak_host_memory_mb']:,.0f}MB"
+              + (f", peak device {profile['peak_device_memory_mb']:,.0f}MB"
+                 if profile['peak_device_memory_mb'] is not None else ""))
+        if result_data.get("padding_efficiency") is not None:
+            effective = result_data["effective_batch_size"]
+            print(f"Padding Efficiency: {result_data['padding_efficiency']:.1%} "
+                  f"(batch size min {effective['min']} / mean {effective['mean']:.1f} / max {effective['max']})")
+        if "endpoint" in result_data:
+            from endpoint import print_endpoint_stats
+            print_endpoint_stats(result_data["endpoint"])
+        if "throughput" in result_data and result_data["throughput"]["questions"]:
+            print(f"Throughput: {result_data['throughput']['questions_per_sec']:.2f} questions/sec ({scoring_mode})")
+        if scoring_mode == "prefix_cache" and "scoring" in result_data:
+            print(f"Prefix Cache: {result_data['scoring']['prefill_tokens_saved']:,} prefill tokens saved "
+                  f"({result_data['scoring'].get('prefill_reduction', 1.0):.1f}x fewer)")
+        if "prompt_cache" in result_data:
+            prompt_cache_stats = result_data["prompt_cache"]
+            print(f"Prompt Cache: {prompt_cache_stats['hits']} hits / {prompt_cache_stats['misses']} misses, "
+                  f"~{prompt_cache_stats['seconds_saved']:.1f}s tokenization saved "
+                  f"({prompt_cache_stats['mapped_mb']:.1f}MB mapped)")
+        if "model_cache" in result_data:
+            print(f"Model Cache: {'hit' if result_data['model_cache']['hit'] else 'miss'}, "
+                  f"~{result_data['model_cache']['load_seconds_saved']:.1f}s load time saved")
+        if "ll_cache" in result_data:
+            print(f"LL Cache: {result_data['ll_cache']['hits']} hits / {result_data['ll_cache']['misses']} misses "
+                  f"({result_data['ll_cache']['hit_rate']:.1%})")
+        if "sample_log" in result_data:
+            print(f"Sample Log: {result_data['sample_log']['rows']:,} questions in "
+                  f"{result_data['sample_log']['row_groups']} row group(s) -> {result_data['sample_log']['path']} "
+                  f"({result_data['sample_log']['size_mb']:.2f}MB)")
+        
+        print(f"\n📊 Category Scores:")
+        print(f"  STEM:            {stem_score:.2%}")
+        print(f"  HUMSS:           {humss_score:.2%}")
+        print(f"  Applied Science: {applied_score:.2%}")
+        print(f"  Other:           {other_score:.2%}")
+        
+        print(f"\n🏆 Best Subject:  {best_subject['name']:35s} {best_subject['score']:.2%} ({best_subject['category']})")
+        print(f"📉 Worst Subject: {worst_subject['name']:35s} {worst_subject['score']:.2%} ({worst_subject['category']})")
+        
+        print(f"\n📋 Bottom 10 Subjects (낮은 점수):")
+        for i, subject in enumerate(all_subjects_ranked[:10], 1):
+            print(f"  {i:2d}. {subject['name']:35s} {subject['score']:.2%}  [{subject['category']}]")
+        
+        print(f"\nTotal Subjects Evaluated: {len(all_subjects_ranked)} (KMMLU has 45 standard subjects)")
+        
+        # 저장 (결과 저장소 + CSV/JSON 리더보드, 보고 스레드에서 실행하고 끝까지 실패하면 kmmlu_reports/unsaved에 보관)
+        # 호출한 쪽이 result_data를 바꿔도 저장 내용이 달라지지 않도록 복사본을 넘김
+        get_pipeline().submit(f"store_result({label})", store_result, copy.deepcopy(result_data),
+                              fallback=save_unsaved_result)
+        
+        return result_data
+    finally:
+        # 평가가 실패해도 (OOM 후 재시도 등) 기록 중인 문항별 로그 파일, 캐시 연결, WandB 실행이 열린 채 남지 않도록 정리
+        if sample_log:
+            sample_log.abort()
+        if ll_cache:
+            ll_cache.close()
+        if wandb_run:
+            wandb_run.finish()
 
 if __name__ == "__main__":
     evaluate_model(
@@ -0,0 +1,610 @@
+# generative.py
+# 추론(reasoning) 모델용 생성형 KMMLU 평가
+# 정답 알파벳의 loglikelihood 대신, 모델이 풀이를 생성한 뒤 "정답: A" 형식으로 낸 답을 채점
+# - 문항마다 생성 토큰 예산(token_budget)을 두고, 최종 답 알파벳을 파싱할 수 있게 되면 바로 생성 중단
+#   (<think>...</think>, <thought>...</thought> 안의 생각 구간은 파싱하지 않음,
+#    step마다 새로 생성된 토큰만 decode하고 새 텍스트 주변만 검사하므로 답 확인 비용은 문항당 생성 길이에 비례)
+# - 배치 greedy decoding: 끝난 문항은 배치와 KV 캐시에서 빠지고 남은 문항만 계속 생성
+# - 예산을 다 쓰거나 답 없이 EOS가 나온 문항은 "정답: "을 붙여 A/B/C/D 중 가장 가능성 높은 답을 강제로 받음
+# - 과목/대분류별 정확도 옆에 생성 토큰 수와 답이 나올 때까지 걸린 시간의 분포를 result_data['generative']에 기록
+#
+# 사용 예:
+#   python generative.py run --model LGAI-EXAONE/EXAONE-Deep-7.8B \
+#       --model-args pretrained=LGAI-EXAONE/EXAONE-Deep-7.8B,load_in_8bit=True \
+#       --label EXAONE-Deep-7.8B-gen --token-budget 1024 --batch-size 16
+#   python generative.py demo   (CPU, 작은 무작위 모델 + 합성 KMMLU)
+
+import copy
+import re
+import time
+
+# === 전역 상수 정의 ===
+DEFAULT_TOKEN_BUDGET = 1024      # 문항당 최대 생성 토큰 수
+DEFAULT_GEN_BATCH_SIZE = 16      # 동시에 생성하는 문항 수
+CHOICES = ["A", "B", "C", "D"]
+ANSWER_PREFIX = "정답: "          # 강제 답변 시 생성 뒤에 붙이는 문자열
+THINK_TAGS = (("<think>", "</think>"), ("<thought>", "</thought>"))  # DeepSeek-R1 / EXAONE-Deep
+
+GENERATIVE_INSTRUCTION = (
+    "다음 객관식 문제를 풀이하고, 마지막 줄에 \"정답: A\"처럼 A, B, C, D 중 하나로 최종 답을 쓰세요.\n\n"
+)
+
+
+def _answer_patterns(end):
+    """최종 답 패턴 (end: 답 알파벳 뒤에 와야 하는 조건)"""
+    return [
+        re.compile(r"정답\s*(?:은|는)?\s*[:：]?\s*\**\s*[(\[]?([A-D])" + end),
+        re.compile(r"(?i:answer)\s*(?:is)?\s*[:：]?\s*\**\s*[(\[]?([A-D])" + end),
+        re.compile(r"\\boxed\{\s*([A-D])\s*\}")
+    ]
+
+
+# 최종 답 패턴 (답 구간에서 마지막으로 나온 것을 사용)
+# 생성이 끝난 텍스트(EOS / 예산 소진)는 텍스트 끝의 답도 인정하고,
+# 생성 중에는 답 뒤에 영문자가 아닌 글자가 나와야 인정 ("정답: A" 다음 토큰이 "pple"일 수 있음)
+ANSWER_PATTERNS = _answer_patterns(r"(?![A-Za-z])")
+STREAMING_ANSWER_PATTERNS = _answer_patterns(r"(?=[^A-Za-z])")
+ANSWER_TAIL_CHARS = 64   # 새 텍스트와 함께 다시 검사할 이전 텍스트 길이 (여러 step에 걸쳐 생성된 답 패턴)
+DETOKENIZE_WINDOW = 4    # 새 토큰 앞에 붙여 decode할 이전 토큰 수 (공백/바이트 조각 처리)
+
+
+def render_prompt(doc, tokenizer):
+    """
+    생성형 평가 프롬프트 (채팅 템플릿이 있으면 사용자 메시지로 감싸 생성 프롬프트까지 붙임)
+
+    Returns:
+        tuple: (프롬프트 문자열, 채팅 템플릿 사용 여부)
+    """
+    question = (f"{GENERATIVE_INSTRUCTION}{doc['question'].strip()}\n"
+                f"A. {doc['A']}\nB. {doc['B']}\nC. {doc['C']}\nD. {doc['D']}")
+    if getattr(tokenizer, 'chat_template', None):
+        return tokenizer.apply_chat_template([{"role": "user", "content": question}], tokenize=False,
+                                             add_generation_prompt=True), True
+    return question + "\n\n풀이:", False
+
+
+def open_think_tag(text, prompt=""):
+    """
+    생성 텍스트가 아직 생각 구간 안이면 닫는 태그, 아니면 None
+    (채팅 템플릿이 생성 프롬프트 끝에 여는 태그를 붙이는 모델은 prompt로 판단)
+    """
+    for open_tag, close_tag in THINK_TAGS:
+        if close_tag in text:
+            return None
+        if open_tag in text or prompt.rstrip().endswith(open_tag):
+            return close_tag
+    return None
+
+
+def parse_answer(text, prompt="", finished=True):
+    """
+    생성 텍스트에서 최종 답 알파벳 파싱 (생각 구간은 제외)
+
+    Args:
+        finished: 생성이 끝난 텍스트인지 (False면 텍스트 끝에 걸친 답은 다음 글자가 나올 때까지 인정하지 않음)
+
+    Returns:
+        str: "A"~"D" 또는 None (아직 답이 없거나 생각 중)
+    """
+    if open_think_tag(text, prompt):
+        return None
+    for _, close_tag in THINK_TAGS:
+        if close_tag in text:
+            text = text.rsplit(close_tag, 1)[1]
+            break
+    for pattern in ANSWER_PATTERNS if finished else STREAMING_ANSWER_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            return matches[-1]
+    return None
+
+
+class IncrementalAnswerParser:
+    """
+    문항 하나의 생성 토큰을 step마다 이어 붙이며 최종 답을 찾는 파서 (parse_answer(finished=False)와 같은 기준)
+
+    - 새 토큰은 앞의 몇 토큰과 함께 decode하여 새로 붙은 텍스트만 얻음 (전체 생성 텍스트를 다시 decode하지 않음)
+    - 생각 태그는 새 텍스트 주변에서만 찾아 상태로 기록
+    - 답 패턴은 답 구간(생각 구간 뒤)의 새 텍스트 + 직전 ANSWER_TAIL_CHARS 글자에서만 검사하고,
+      패턴이 보이면 그때 한 번만 전체 텍스트로 parse_answer를 호출
+    """
+
+    def __init__(self, tokenizer, prompt=""):
+        self.tokenizer = tokenizer
+        self.prompt = prompt
+        self.tokens = []
+        self.text = ""
+        self.prefix_offset = 0   # decode 구간 시작 토큰
+        self.read_offset = 0     # 이미 text에 반영된 토큰 수
+        self.seen_tags = set()
+        self.answer_start = 0    # 답 구간 시작 글자 (마지막 닫는 태그 뒤)
+        self.max_tag_len = max(len(tag) for tags in THINK_TAGS for tag in tags)
+
+    def _decode_new(self):
+        """새 토큰이 만든 텍스트 (바이트 조각으로 아직 글자가 완성되지 않았으면 빈 문자열)"""
+        prefix = self.tokenizer.decode(self.tokens[self.prefix_offset:self.read_offset], skip_special_tokens=True)
+        full = self.tokenizer.decode(self.tokens[self.prefix_offset:], skip_special_tokens=True)
+        if len(full) <= len(prefix) or full.endswith("\ufffd"):
+            return ""
+        self.prefix_offset = max(0, len(self.tokens) - DETOKENIZE_WINDOW)
+        self.read_offset = len(self.tokens)
+        return full[len(prefix):]
+
+    def _thinking(self):
+        """open_think_tag와 같은 판단을 기록한 태그로 수행"""
+        for open_tag, close_tag in THINK_TAGS:
+            if close_tag in self.seen_tags:
+                return False
+            if open_tag in self.seen_tags or self.prompt.rstrip().endswith(open_tag):
+                return True
+        return False
+
+    def append(self, token):
+        """
+        토큰 하나를 붙이고 답 확인
+
+        Returns:
+            str: "A"~"D" 또는 None (아직 답이 없거나 생각 중)
+        """
+        self.tokens.append(token)
+        old_len = len(self.text)
+        self.text += self._decode_new()
+        if len(self.text) == old_len:
+            return None
+
+        # 새 텍스트에 걸친 생각 태그 기록 (답 구간은 parse_answer처럼 THINK_TAGS 순서상 먼저인 닫는 태그 뒤)
+        scan_from = max(0, old_len - self.max_tag_len + 1)
+        for tags in THINK_TAGS:
+            for tag in tags:
+                if tag in self.text[scan_from:]:
+                    self.seen_tags.add(tag)
+        for _, close_tag in THINK_TAGS:
+            if close_tag in self.seen_tags:
+                self.answer_start = self.text.rfind(close_tag) + len(close_tag)
+                break
+        if self._thinking():
+            return None
+
+        window = self.text[max(self.answer_start, old_len - ANSWER_TAIL_CHARS):]
+        if any(pattern.search(window) for pattern in STREAMING_ANSWER_PATTERNS):
+            return parse_answer(self.text, self.prompt, finished=False)
+        return None
+
+    def full_text(self):
+        """생성 전체를 한 번에 decode한 텍스트 (결과 기록용)"""
+        return self.tokenizer.decode(self.tokens, skip_special_tokens=True)
+
+
+def distribution(values):
+    """값 목록의 평균 / 중앙값 / p90 / 최댓값 (비어 있으면 None)"""
+    import numpy as np
+
+    if not values:
+        return {"mean": None, "p50": None, "p90": None, "max": None}
+    values = np.asarray(values, dtype=float)
+    p50, p90 = np.percentile(values, [50, 90])
+    return {"mean": float(values.mean()), "p50": float(p50), "p90": float(p90), "max": float(values.max())}
+
+
+class BudgetedGenerator:
+    """
+    토큰 예산이 있는 배치 greedy 생성기
+
+    generate(prompts)는 프롬프트 길이순으로 batch_size개씩 묶어 생성하고, 문항마다
+    {"text", "answer", "tokens", "seconds", "stop", "forced"}를 반환
+    - stop: "answer"(답을 파싱해 중단) / "eos" / "budget"(예산 소진)
+    - seconds: 배치 시작(prefill 포함)부터 그 문항의 답이 정해질 때까지 걸린 시간
+    - 끝난 문항은 DynamicCache.batch_select_indices로 KV 캐시에서 빼고 남은 문항만 다음 step을 계산
+    stats: decode step 수, 계산한 row-step 수와 끝난 문항을 빼지 않았을 때의 row-step 수
+    """
+
+    def __init__(self, model, tokenizer, token_budget=DEFAULT_TOKEN_BUDGET, batch_size=DEFAULT_GEN_BATCH_SIZE,
+                 force_answer=True):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.token_budget = token_budget
+        self.batch_size = batch_size
+        self.force_answer = force_answer
+
+        eos = model.generation_config.eos_token_id
+        eos = set(eos if isinstance(eos, (list, tuple)) else [eos])
+        eos.add(tokenizer.eos_token_id)
+        self.eos_ids = {token for token in eos if token is not None}
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else min(self.eos_ids)
+
+        # 선택지 알파벳 토큰 (" A"처럼 공백이 붙은 토큰도 후보)
+        self.letter_ids = []
+        for letter in CHOICES:
+            candidates = {tokenizer.encode(letter, add_special_tokens=False)[0]}
+            spaced = tokenizer.encode(" " + letter, add_special_tokens=False)
+            if len(spaced) == 1:
+                candidates.add(spaced[0])
+            self.letter_ids.append(sorted(candidates))
+        self.stats = {"batches": 0, "decode_steps": 0, "row_steps": 0, "static_row_steps": 0}
+
+    def _pad_left(self, sequences):
+        import torch
+
+        width = max(len(ids) for ids in sequences)
+        input_ids = torch.tensor([[self.pad_id] * (width - len(ids)) + ids for ids in sequences],
+                                 device=self.model.device)
+        attention_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in sequences],
+                                      device=self.model.device)
+        return input_ids, attention_mask
+
+    def generate(self, prompts, add_special_tokens=True, disable_tqdm=False):
+        from tqdm import tqdm
+
+        encoded = [self.tokenizer.encode(prompt, add_special_tokens=add_special_tokens) for prompt in prompts]
+        # 길이가 비슷한 프롬프트끼리 묶어 padding을 줄임
+        order = sorted(range(len(prompts)), key=lambda i: len(encoded[i]), reverse=True)
+        outputs = [None] * len(prompts)
+        with tqdm(total=len(prompts), disable=disable_tqdm, desc="Generating") as pbar:
+            for start in range(0, len(order), self.batch_size):
+                indices = order[start:start + self.batch_size]
+                batch = self._generate_batch([encoded[i] for i in indices], [prompts[i] for i in indices])
+                for index, output in zip(indices, batch):
+                    outputs[index] = output
+                pbar.update(len(indices))
+        return outputs
+
+    def _generate_batch(self, prompt_ids, prompts):
+        import torch
+
+        start = time.perf_counter()
+        n = len(prompt_ids)
+        parsers = [IncrementalAnswerParser(self.tokenizer, prompt) for prompt in prompts]
+        outputs = [None] * n
+        active = list(range(n))  # 현재 배치의 각 행이 가리키는 문항 번호
+        steps = 0
+
+        def finish(index, stop, answer=None):
+            outputs[index] = {"text": parsers[index].full_text(), "answer": answer,
+                              "tokens": len(parsers[index].tokens), "seconds": time.perf_counter() - start,
+                              "stop": stop, "forced": False}
+
+        with torch.inference_mode():
+            input_ids, attention_mask = self._pad_left(prompt_ids)
+            position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+            out = self.model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                             use_cache=True)
+            while True:
+                cache, next_tokens = out.past_key_values, out.logits[:, -1].argmax(-1)
+                steps += 1
+                self.stats["row_steps"] += len(active)
+                keep = []
+                for row, (index, token) in enumerate(zip(active, next_tokens.tolist())):
+                    if token in self.eos_ids:
+                        # 생성이 끝났으므로 전체 텍스트로 한 번 더 확인
+                        answer = parse_answer(parsers[index].full_text(), prompts[index])
+                        finish(index, "answer" if answer else "eos", answer)
+                        continue
+                    answer = parsers[index].append(token)
+                    if answer:
+                        finish(index, "answer", answer)
+                    elif len(parsers[index].tokens) >= self.token_budget:
+                        # 예산 마지막 토큰으로 끝난 답은 생성이 끝난 텍스트 기준으로 인정
+                        finish(index, "budget", parse_answer(parsers[index].full_text(), prompts[index]))
+                    else:
+                        keep.append(row)
+                if not keep:
+                    break
+
+                # 끝난 문항을 배치와 KV 캐시에서 제거
+                if len(keep) < len(active):
+                    rows = torch.tensor(keep, device=self.model.device)
+                    cache.batch_select_indices(rows)
+                    attention_mask, next_tokens = attention_mask[rows], next_tokens[rows]
+                    active = [active[row] for row in keep]
+                attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(active), 1))], dim=1)
+                out = self.model(input_ids=next_tokens[:, None], attention_mask=attention_mask,
+                                 position_ids=attention_mask.sum(-1, keepdim=True) - 1, past_key_values=cache,
+                                 use_cache=True)
+
+        self.stats["batches"] += 1
+        self.stats["decode_steps"] += steps
+        self.stats["static_row_steps"] += steps * n
+
+        unanswered = [i for i, output in enumerate(outputs) if output["answer"] is None]
+        if self.force_answer and unanswered:
+            self._force_answers(unanswered, prompt_ids, [parser.tokens for parser in parsers], prompts, outputs,
+                                start)
+        return outputs
+
+    def _force_answers(self, indices, prompt_ids, generated, prompts, outputs, start):
+        """답이 없는 문항 뒤에 (생각 구간을 닫고) "정답: "을 붙여 선택지 알파벳 중 logit이 가장 큰 답을 고름"""
+        import torch
+
+        sequences = []
+        for index in indices:
+            close_tag = open_think_tag(outputs[index]["text"], prompts[index])
+            suffix = (f"\n{close_tag}" if close_tag else "") + f"\n\n{ANSWER_PREFIX}"
+            sequences.append(prompt_ids[index] + generated[index]
+                             + self.tokenizer.encode(suffix, add_special_tokens=False))
+        with torch.inference_mode():
+            input_ids, attention_mask = self._pad_left(sequences)
+            position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask,
+                                position_ids=position_ids).logits[:, -1].float()
+        for row, index in enumerate(indices):
+            scores = [logits[row, ids].max().item() for ids in self.letter_ids]
+            outputs[index].update({"answer": CHOICES[scores.index(max(scores))], "forced": True,
+                                   "seconds": time.perf_counter() - start})
+
+
+def load_kmmlu_docs(subject_tasks, limit=None, task_manager=None):
+    """
+    과목별 KMMLU 평가 문항 (lm_eval 태스크의 eval_docs, 데이터셋을 불러옴)
+
+    Args:
+        limit: 과목당 앞에서부터 평가할 문항 수 (None이면 전체)
+
+    Returns:
+        dict: {태스크명: [문항, ...]}
+    """
+    from lm_eval.tasks import TaskManager, get_task_dict
+
+    task_dict = get_task_dict(list(subject_tasks), task_manager or TaskManager())
+    return {task: list(task_dict[task].eval_docs)[:limit] for task in subject_tasks}
+
+
+def summarize_records(records):
+    """문항 기록 목록의 정확도, 답 파싱 비율, 예산 소진 수, 생성 토큰 수 / 답까지 걸린 시간 분포"""
+    n = len(records)
+    return {
+        "acc": sum(record["correct"] for record in records) / n if n else 0.0,
+        "n": n,
+        "answered_rate": sum(record["stop"] == "answer" for record in records) / n if n else 0.0,
+        "budget_exhausted": sum(record["stop"] == "budget" for record in records),
+        "tokens": distribution([record["tokens"] for record in records]),
+        "seconds": distribution([record["seconds"] for record in records])
+    }
+
+
+def evaluate_generative(model_name, model_args, label, token_budget=DEFAULT_TOKEN_BUDGET,
+                        batch_size=DEFAULT_GEN_BATCH_SIZE, device="cuda:0", limit=None, force_answer=True, save=True,
+                        docs_by_subject=None):
+    """
+    생성형 KMMLU 평가 (토큰 예산 + 답 파싱 시 조기 종료 + 끝난 문항이 빠지는 배치 생성)
+
+    Args:
+        model_name: 모델 경로 (예: "LGAI-EXAONE/EXAONE-Deep-7.8B")
+        model_args: 모델 로딩 설정 (evaluate_model과 같은 형식, 예: "pretrained=...,load_in_8bit=True")
+        label: 리더보드 표시 이름 (loglikelihood 평가와 구분되도록 예: "EXAONE-Deep-7.8B-gen")
+        token_budget: 문항당 최대 생성 토큰 수
+        batch_size: 동시에 생성하는 문항 수
+        limit: 과목당 평가할 문항 수 (None이면 전체, 지정하면 근사 결과로 저장)
+        force_answer: 예산을 다 쓴 문항도 "정답: "을 붙여 답을 받음 (False이면 오답 처리)
+        save: True이면 결과 저장소와 CSV/JSON 보기에 저장
+        docs_by_subject: {태스크명: [문항, ...]} (지정하지 않으면 lm_eval KMMLU 데이터셋에서 불러옴)
+
+    Returns:
+        dict: result_data (과목/대분류별 생성 토큰 수와 답까지 걸린 시간 분포는 result_data['generative'])
+    """
+    from evaluate_model import (
+        aggregate_subject_scores, create_lm, format_time, list_kmmlu_subject_tasks, parse_model_config,
+        rank_subjects, store_result
+    )
+    from reporting import get_pipeline, save_unsaved_result
+
+    subject_tasks = list_kmmlu_subject_tasks()
+    if docs_by_subject is None:
+        docs_by_subject = load_kmmlu_docs(subject_tasks, limit)
+    elif limit:
+        docs_by_subject = {task: docs[:limit] for task, docs in docs_by_subject.items()}
+
+    print(f"\n{'='*60}")
+    print(f"Generative evaluation: {label}")
+    print(f"Token budget: {token_budget}/question, batch size {batch_size}")
+    print(f"{'='*60}")
+
+    start_time = time.time()
+    lm = create_lm(model_args, batch_size=1, device=device)
+    load_seconds = time.time() - start_time
+    generator = BudgetedGenerator(lm.model, lm.tokenizer, token_budget, batch_size, force_answer)
+
+    items = [(task, doc) for task, docs in docs_by_subject.items() for doc in docs]
+    prompts = [render_prompt(doc, lm.tokenizer) for _, doc in items]
+    generate_start = time.time()
+    # 채팅 템플릿이 이미 BOS 등 특수 토큰을 넣으므로 토큰화할 때 다시 붙이지 않음
+    outputs = generator.generate([prompt for prompt, _ in prompts], add_special_tokens=not prompts[0][1])
+    generate_seconds = time.time() - generate_start
+
+    records = {task: [] for task in docs_by_subject}
+    for (task, doc), output in zip(items, outputs):
+        records[task].append({**output, "correct": output["answer"] == CHOICES[doc["answer"] - 1]})
+    all_records = [record for task_records in records.values() for record in task_records]
+
+    subject_results = {
+        task: {"acc": summarize_records(task_records)["acc"], "n": len(task_records), "category": subject_tasks[task]}
+        for task, task_records in records.items()
+    }
+    scores = aggregate_subject_scores(subject_results)
+    all_subjects_ranked = rank_subjects({task: info['acc'] for task, info in subject_results.items()})
+    elapsed_seconds = time.time() - start_time
+    generated_tokens = sum(record["tokens"] for record in all_records)
+    stats = generator.stats
+
+    result_data = {
+        "model": label,
+        # loglikelihood 평가 결과가 리더보드에서 대체되지 않도록 모델 경로를 구분
+        "model_path": f"{model_name}@generative",
+        "overall": scores['overall'],
+        "stem": scores['stem'],
+        "humss": scores['humss'],
+        "applied": scores['applied'],
+        "other": scores['other'],
+        "best": {"name": all_subjects_ranked[-1]['name'], "score": all_subjects_ranked[-1]['score']},
+        "worst": {"name": all_subjects_ranked[0]['name'], "score": all_subjects_ranked[0]['score']},
+        "all_subjects_ranked": all_subjects_ranked,
+        "elapsed_time": format_time(elapsed_seconds),
+        "batch_size": batch_size,
+        "precision": parse_model_config(model_args),
+        "approximate": limit is not None,
+        "throughput": {
+            "scoring_mode": "generative",
+            "questions": len(all_records),
+            "scoring_seconds": generate_seconds,
+            "questions_per_sec": len(all_records) / generate_seconds if generate_seconds else 0.0
+        },
+        "generative": {
+            "token_budget": token_budget,
+            "force_answer": force_answer,
+            "load_seconds": load_seconds,
+            "generated_tokens": generated_tokens,
+            "tokens_per_sec": generated_tokens / generate_seconds if generate_seconds else 0.0,
+            "stop_reasons": {stop: sum(record["stop"] == stop for record in all_records)
+                             for stop in ("answer", "eos", "budget")},
+            "forced": sum(record["forced"] for record in all_records),
+            "decode": {
+                **stats,
+                # 끝난 문항을 배치에서 빼지 않았다면 계산했을 row-step 대비 절약 비율
+                "row_steps_saved": 1 - stats["row_steps"] / stats["static_row_steps"] if stats["static_row_steps"] else 0.0
+            },
+            "overall": summarize_records(all_records),
+            "categories": {
+                category: summarize_records([record for task, task_records in records.items()
+                                             if subject_tasks[task] == category for record in task_records])
+                for category in sorted(set(subject_tasks[task] for task in records))
+            },
+            "subjects": {task: summarize_records(task_records) for task, task_records in records.items()}
+        }
+    }
+
+    print_generative_summary(result_data)
+    if save:
+        # evaluate_model과 같이 보고 스레드에서 저장 (반환한 result_data를 호출 쪽이 바꿔도 저장 내용은 그대로)
+        get_pipeline().submit(f"store_result({label})", store_result, copy.deepcopy(result_data),
+                              fallback=save_unsaved_result)
+    return result_data
+
+
+def print_generative_summary(result_data):
+    """대분류별 정확도, 답 파싱 비율, 예산 소진 수, 생성 토큰 / 답까지 걸린 시간 분포 표 출력"""
+    from tabulate import tabulate
+
+    generative = result_data["generative"]
+    rows = []
+    for name, summary in [*generative["categories"].items(), ("Overall", generative["overall"])]:
+        tokens, seconds = summary["tokens"], summary["seconds"]
+        rows.append([name, summary["n"], f"{summary['acc']:.2%}", f"{summary['answered_rate']:.1%}",
+                     summary["budget_exhausted"], f"{tokens['p50']:.0f} / {tokens['p90']:.0f}",
+                     f"{seconds['p50']:.2f}s / {seconds['p90']:.2f}s"])
+    print(f"\n✅ Generative Evaluation Complete: {result_data['model']} ({result_data['elapsed_time']})")
+    print(tabulate(rows, headers=["Category", "Questions", "Accuracy", "Answered", "Budget Hit",
+                                  "Tokens p50/p90", "Time-to-answer p50/p90"], tablefmt="grid"))
+    decode = generative["decode"]
+    print(f"Generated {generative['generated_tokens']:,} tokens ({generative['tokens_per_sec']:.1f} tokens/sec), "
+          f"{generative['forced']} forced answer(s), "
+          f"{decode['row_steps_saved']:.1%} decode rows saved by dropping finished questions")
+
+
+# 스크립트 확인용 생성 텍스트: (생성할 텍스트, 기대하는 답, 기대하는 stop)
+SCRIPTED_GENERATIONS = [
+    ("풀이: 계산하면 정답: B\n이 뒤의 설명은 생성되지 않아야 함", "B", "answer"),
+    ("정답: C", "C", "answer"),                                   # 텍스트 끝의 답은 EOS에서 확정
+    ("정답: Apple은 오답이고 정답: D.", "D", "answer"),            # "A" 뒤에 영문자가 이어지면 답이 아님
+    ("<think>정답: A인가?</think> 최종 정답: B 입니다", "B", "answer"),  # 생각 구간의 답은 무시
+    ("답을 모르겠다. " * 8, None, "budget"),                        # 답 없이 예산 소진 -> 강제 답변
+]
+
+
+def _scripted_check(model_dir, token_budget=32):
+    """
+    정해진 텍스트를 greedy로 생성하는 모델로 조기 중단과 배치 축소 확인
+    (작은 무작위 모델은 답 패턴을 생성하지 않으므로, 실제 모델의 logits을 스크립트 토큰으로 덮어씀)
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForCausalLM.from_pretrained(model_dir, dtype=torch.float32).eval()
+    # 프롬프트 길이가 모두 달라야 attention_mask 길이로 행을 구분할 수 있음
+    prompts = [f"문제 {i}:" + " 보기" * i for i in range(len(SCRIPTED_GENERATIONS))]
+    lengths = [len(tokenizer.encode(prompt)) for prompt in prompts]
+    assert len(set(lengths)) == len(lengths), lengths
+    scripts = {length: tokenizer.encode(text, add_special_tokens=False)
+               for length, (text, _, _) in zip(lengths, SCRIPTED_GENERATIONS)}
+
+    class ScriptedModel(torch.nn.Module):
+        """스크립트가 있는 행은 (프롬프트 길이 = attention_mask 길이 - 생성한 토큰 수) 다음 스크립트 토큰을 top-1로"""
+
+        def __init__(self):
+            super().__init__()
+            self.model, self.generation_config, self.step = model, model.generation_config, 0
+
+        @property
+        def device(self):
+            return self.model.device
+
+        def forward(self, input_ids, attention_mask, past_key_values=None, **kwargs):
+            out = self.model(input_ids=input_ids, attention_mask=attention_mask, past_key_values=past_key_values,
+                             **kwargs)
+            self.step = 0 if past_key_values is None else self.step + 1
+            for row, length in enumerate((attention_mask.sum(-1) - self.step).tolist()):
+                script = scripts.get(length)
+                if script is not None:
+                    token = script[self.step] if self.step < len(script) else tokenizer.eos_token_id
+                    out.logits[row, -1] = float('-inf')
+                    out.logits[row, -1, token] = 0.0
+            return out
+
+    generator = BudgetedGenerator(ScriptedModel(), tokenizer, token_budget=token_budget,
+                                  batch_size=len(prompts))
+    outputs = generator.generate(prompts, disable_tqdm=True)
+    for (text, answer, stop), output in zip(SCRIPTED_GENERATIONS, outputs):
+        assert output["stop"] == stop, (text, output)
+        assert output["forced"] == (answer is None) and (answer is None or output["answer"] == answer), (text, output)
+    # 답이 확정되면 나머지 스크립트는 생성하지 않음
+    assert outputs[0]["tokens"] < len(scripts[lengths[0]]), outputs[0]
+    stats = generator.stats
+    saved = 1 - stats["row_steps"] / stats["static_row_steps"]
+    assert saved > 0, stats
+    print(f"✅ Scripted generation: {sum(output['stop'] == 'answer' for output in outputs)}/{len(outputs)} "
+          f"answered early, {outputs[0]['tokens']}/{len(scripts[lengths[0]])} tokens for the first answer, "
+          f"{saved:.1%} decode rows saved")
+
+
+def _demo():
+    """CPU에서 작은 무작위 모델과 합성 문항으로 생성형 평가 확인 (임시 폴더에 결과 저장)"""
+    import os
+    import tempfile
+
+    from evaluate_model import list_kmmlu_subject_tasks
+    from synthetic import make_synthetic_docs, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    subject_tasks = list_kmmlu_subject_tasks()
+    docs = make_synthetic_docs(subjects=[task[len('kmmlu_'):] for task in subject_tasks], n_questions=2)
+    os.chdir(tempfile.mkdtemp())
+
+    evaluate_generative(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama-gen", token_budget=16,
+                        batch_size=8, device="cpu",
+                        docs_by_subject={task: docs[task[len('kmmlu_'):]]["test"] for task in subject_tasks})
+    _scripted_check(model_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Budgeted generative KMMLU evaluation for reasoning models")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="evaluate one model generatively")
+    run_parser.add_argument("--model", required=True, help="model path (e.g. LGAI-EXAONE/EXAONE-Deep-7.8B)")
+    run_parser.add_argument("--model-args", required=True, help="lm_eval model_args string")
+    run_parser.add_argument("--label", required=True, help="leaderboard name (e.g. EXAONE-Deep-7.8B-gen)")
+    run_parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    run_parser.add_argument("--batch-size", type=int, default=DEFAULT_GEN_BATCH_SIZE)
+    run_parser.add_argument("--device", default="cuda:0")
+    run_parser.add_argument("--limit", type=int, help="questions per subject (saved as approximate)")
+    run_parser.add_argument("--no-force-answer", action="store_true",
+                            help="count questions without a parsed answer as wrong instead of forcing one")
+    subparsers.add_parser("demo", help="CPU demo with a tiny random model and synthetic KMMLU")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        evaluate_generative(args.model, args.model_args, args.label, token_budget=args.token_budget,
+                            batch_size=args.batch_size, device=args.device, limit=args.limit,
+                            force_answer=not args.no_force_answer)
+    else:
+        _demo()
@@ -0,0 +1,270 @@
+# instrumentation.py
+# 평가 구간별 시간(모델 로드, 프롬프트 구성, 토큰화, forward, 후처리)과
+# 과목별 처리량(tokens/sec, requests/sec) 및 최대 메모리 사용량(host/device) 측정
+# 모델/라이브러리 버전 변경 시 성능 회귀를 찾기 위한 기록
+# host 메모리는 이번 평가의 구간 안에서 측정한 현재 RSS의 최댓값
+# (ru_maxrss는 프로세스 시작 이후 최댓값이라 배치/서버에서 앞서 평가한 모델의 메모리까지 섞임)
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from lm_wrappers import DelegatingLM
+
+# 측정 구간 (출력/기록 순서)
+PHASES = ['model_load', 'prompt_build', 'tokenization', 'forward', 'post_processing']
+
+# 측정 구간이 열려 있는 동안 현재 RSS를 읽는 간격 (초)
+HOST_MEMORY_SAMPLE_INTERVAL = 0.05
+
+
+def host_memory_mb():
+    """현재 프로세스의 RSS (MB)"""
+    import psutil
+    return psutil.Process().memory_info().rss / 1024 ** 2
+
+
+class HostMemorySampler:
+    """
+    측정 구간(window)이 열려 있는 동안 백그라운드 스레드에서 현재 RSS를 주기적으로 읽어 구간별 최댓값 기록
+    구간은 겹쳐도 됨 (예: 평가 전체 구간 안의 과목 구간), 열린 구간이 없으면 스레드는 종료
+    """
+
+    def __init__(self, interval=HOST_MEMORY_SAMPLE_INTERVAL):
+        import psutil
+
+        self.interval = interval
+        self._process = psutil.Process()
+        self._windows = {}  # id(window) -> window (같은 값의 window가 여럿일 수 있으므로 id로 구분)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _rss_mb(self):
+        return self._process.memory_info().rss / 1024 ** 2
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = self._rss_mb()
+            with self._lock:
+                if not self._windows:
+                    self._thread = None
+                    return
+                for window in self._windows.values():
+                    window["peak"] = max(window["peak"], rss)
+
+    @contextmanager
+    def window(self):
+        """구간 안에서의 최대 RSS를 window["peak"] (MB)에 기록"""
+        window = {"peak": self._rss_mb()}
+        with self._lock:
+            self._windows[id(window)] = window
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kmmlu-host-memory", daemon=True)
+                self._thread.start()
+        try:
+            yield window
+        finally:
+            rss = self._rss_mb()
+            with self._lock:
+                del self._windows[id(window)]
+            window["peak"] = max(window["peak"], rss)
+
+
+def device_peak_memory_mb(device):
+    """장치의 최대 할당 메모리 (MB, CUDA가 아니면 None)"""
+    import torch
+
+    if not str(device).startswith('cuda') or not torch.cuda.is_available():
+        return None
+    return torch.cuda.max_memory_allocated(device) / 1024 ** 2
+
+
+def reset_device_peak_memory(device):
+    """장치 최대 메모리 기록 초기화 (과목별 최대치 측정용)"""
+    import torch
+
+    if str(device).startswith('cuda') and torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats(device)
+
+
+class EvalProfiler:
+    """
+    평가 한 번의 구간별 시간과 과목별 처리량 기록
+
+    - phase(name): 코드 구간 시간을 직접 측정 (예: 모델 로드)
+    - evaluation(): simple_evaluate 호출을 감싸면 InstrumentedLM과 함께
+      프롬프트 구성(첫 채점 요청 전까지)과 후처리(마지막 채점 이후) 시간을 나눠 기록
+    - host 메모리: phase / evaluation 구간마다 현재 RSS의 최댓값을 기록 (host_memory_mb: {구간 이름: MB})
+    """
+
+    def __init__(self, device=None):
+        self.device = device
+        self.phases = defaultdict(float)
+        self.subjects = {}
+        self.totals = {"requests": 0, "tokens": 0, "seconds": 0.0}
+        self.device_peak = None  # 채점 호출들의 최대 장치 메모리 (MB, CUDA가 아니면 None)
+        self.host_memory = HostMemorySampler()
+        self.host_peaks = {}  # 구간 이름 -> 구간 안의 최대 RSS (MB)
+        self._evaluation_start = None
+        self._last_lm_return = None
+
+    def _record_host_peak(self, name, peak):
+        self.host_peaks[name] = max(self.host_peaks.get(name, 0.0), peak)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        with self.host_memory.window() as memory:
+            try:
+                yield
+            finally:
+                self.phases[name] += time.time() - start
+        self._record_host_peak(name, memory["peak"])
+
+    @contextmanager
+    def evaluation(self):
+        """simple_evaluate 한 번을 감싸는 구간"""
+        with self.host_memory.window() as memory, self._evaluation():
+            yield
+        self._record_host_peak('evaluation', memory["peak"])
+
+    @contextmanager
+    def _evaluation(self):
+        self._evaluation_start = time.time()
+        self._last_lm_return = None
+        try:
+            yield
+        finally:
+            end = time.time()
+            if self._last_lm_return is None:
+                # 채점 요청이 없었으면 전체를 프롬프트 구성으로 기록
+                self.phases['prompt_build'] += end - self._evaluation_start
+            else:
+                self.phases['post_processing'] += end - self._last_lm_return
+            self._evaluation_start = None
+
+    def lm_call_started(self):
+        """LM 호출 시작: 이번 평가의 첫 호출이면 그 전까지를 프롬프트 구성 시간으로 기록"""
+        now = time.time()
+        if self._evaluation_start is not None and self._last_lm_return is None:
+            self.phases['prompt_build'] += now - self._evaluation_start
+        elif self._last_lm_return is not None:
+            # 요청 종류가 여러 개인 경우 호출 사이 시간은 후처리로 기록
+            self.phases['post_processing'] += now - self._last_lm_return
+
+    def lm_call_finished(self):
+        self._last_lm_return = time.time()
+
+    def record_call(self, requests, tokens, seconds):
+        """채점 호출 하나의 요청 수 / 토큰 수 / 시간 / 최대 장치 메모리 (전체 처리량, 최대 메모리 계산용)"""
+        self.totals["requests"] += requests
+        self.totals["tokens"] += tokens
+        self.totals["seconds"] += seconds
+        peak = device_peak_memory_mb(self.device)
+        if peak is not None:
+            self.device_peak = max(self.device_peak or 0.0, peak)
+
+    def record_subject(self, task_name, requests, tokens, seconds, forward_seconds, peak_host_memory_mb=None):
+        """과목 하나의 채점 결과 기록 (체크포인트 모드에서 같은 과목이 여러 번 오면 누적)"""
+        entry = self.subjects.setdefault(task_name, {
+            "requests": 0, "tokens": 0, "seconds": 0.0, "forward_seconds": 0.0, "peak_device_memory_mb": None,
+            "peak_host_memory_mb": None
+        })
+        entry["requests"] += requests
+        entry["tokens"] += tokens
+        entry["seconds"] += seconds
+        entry["forward_seconds"] += forward_seconds
+        entry["tokens_per_sec"] = entry["tokens"] / entry["seconds"] if entry["seconds"] else 0.0
+        entry["requests_per_sec"] = entry["requests"] / entry["seconds"] if entry["seconds"] else 0.0
+        peak = device_peak_memory_mb(self.device)
+        if peak is not None:
+            entry["peak_device_memory_mb"] = max(entry["peak_device_memory_mb"] or 0.0, peak)
+        if peak_host_memory_mb is not None:
+            entry["peak_host_memory_mb"] = max(entry["peak_host_memory_mb"] or 0.0, peak_host_memory_mb)
+
+    def summary(self):
+        """
+        result_data에 저장할 요약
+
+        Returns:
+            dict: phases(구간별 초), subjects(과목별 처리량/메모리), 전체 tokens/sec, requests/sec,
+                  최대 메모리 (peak_host_memory_mb는 이번 평가의 구간들에서 측정한 최대 RSS,
+                  host_memory_mb는 구간별 최대 RSS)
+        """
+        tokens = self.totals["tokens"]
+        requests = self.totals["requests"]
+        seconds = self.totals["seconds"]
+        return {
+            "phases": {name: self.phases.get(name, 0.0) for name in PHASES},
+            "subjects": self.subjects,
+            "tokens": tokens,
+            "requests": requests,
+            "tokens_per_sec": tokens / seconds if seconds else 0.0,
+            "requests_per_sec": requests / seconds if seconds else 0.0,
+            "peak_host_memory_mb": max(self.host_peaks.values()) if self.host_peaks else host_memory_mb(),
+            "host_memory_mb": dict(self.host_peaks),
+            "peak_device_memory_mb": self.device_peak if self.device_peak is not None else device_peak_memory_mb(self.device)
+        }
+
+
+class InstrumentedLM(DelegatingLM):
+    """
+    loglikelihood 호출마다 시간/토큰 수를 기록하는 LM 래퍼
+
+    lm_eval은 모든 과목의 요청을 한 번에 넘기므로, 과목별 수치는 호출에 과목이 하나뿐일 때
+    (체크포인트 모드 등) 또는 split_subjects=True일 때만 기록함
+    split_subjects=True: 과목 단위로 나눠 내부 LM을 호출하여 과목마다 시간/토큰 수/메모리 기록
+    (배치가 과목 경계를 넘지 않으므로 과목마다 마지막 배치 하나가 덜 차서 처리량이 조금 줄어듦)
+
+    토큰화 시간 = 호출 시간 - forward 시간 (채점 엔진의 scoring_seconds 증가분)
+    토큰 수 = 채점 엔진이 받은 context + continuation 토큰 수 (scoring_stats['input_tokens'] 증가분)
+    """
+
+    def __init__(self, lm, profiler, scoring_stats, split_subjects=False):
+        super().__init__(lm)
+        self.profiler = profiler
+        self.scoring_stats = scoring_stats
+        self.split_subjects = split_subjects
+
+    def _timed_call(self, requests, task_name=None):
+        """내부 LM 호출 하나를 측정 (task_name이 있으면 과목별 수치로도 기록)"""
+        reset_device_peak_memory(self.profiler.device)
+        forward_before = self.scoring_stats.get('scoring_seconds', 0.0)
+        tokens_before = self.scoring_stats.get('input_tokens', 0)
+        start = time.time()
+
+        with self.profiler.host_memory.window() as memory:
+            results = self.lm.loglikelihood(requests)
+
+        seconds = time.time() - start
+        forward_seconds = self.scoring_stats.get('scoring_seconds', 0.0) - forward_before
+        tokens = self.scoring_stats.get('input_tokens', 0) - tokens_before
+        self.profiler.phases['forward'] += forward_seconds
+        self.profiler.phases['tokenization'] += seconds - forward_seconds
+        self.profiler.record_call(len(requests), tokens, seconds)
+        if task_name is not None:
+            self.profiler.record_subject(task_name, len(requests), tokens, seconds, forward_seconds,
+                                         peak_host_memory_mb=memory["peak"])
+        return results
+
+    def loglikelihood(self, requests):
+        self.profiler.lm_call_started()
+
+        # 과목별 요청 묶기 (원래 순서로 결과를 되돌리기 위해 인덱스 보관)
+        by_task = defaultdict(list)
+        for i, request in enumerate(requests):
+            task_name = getattr(request, 'task_name', None) or request.metadata[0]
+            by_task[task_name].append(i)
+
+        if len(by_task) == 1 or not self.split_subjects:
+            results = self._timed_call(requests, next(iter(by_task)) if len(by_task) == 1 else None)
+        else:
+            results = [None] * len(requests)
+            for task_name, indices in by_task.items():
+                for i, result in zip(indices, self._timed_call([requests[i] for i in indices], task_name)):
+                    results[i] = result
+
+        self.profiler.lm_call_finished()
+        return results
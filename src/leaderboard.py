@@ -0,0 +1,170 @@
+# leaderboard.py
+# 결과 저장소(result_store)를 열 단위로 조회하는 리더보드 쿼리 계층
+# 필요한 열만 SQL로 읽어 pandas DataFrame(pyarrow 타입)으로 반환하고,
+# 필터/그룹 집계/과목별 top-k/페이지 나누기는 모두 SQLite에서 처리하여 전체 기록을 메모리에 올리지 않음
+
+import os
+
+import pandas as pd
+
+from result_store import LATEST_RUN_CONDITION, RESULT_DB, RUN_COLUMNS, ResultStore
+
+# === 전역 상수 정의 ===
+# 조회 가능한 열 (SQL에 그대로 들어가므로 이 목록에 있는 이름만 허용)
+LEADERBOARD_COLUMNS = ['run_id', 'created_at', 'model'] + [name for name, _, _ in RUN_COLUMNS]
+CATEGORY_COLUMNS = ['overall', 'stem', 'humss', 'applied', 'other']
+GROUP_AGGREGATES = {'mean': 'AVG', 'max': 'MAX', 'min': 'MIN'}
+DEFAULT_PAGE_SIZE = 50
+
+
+def _check_columns(columns):
+    """허용되지 않은 열 이름이면 오류"""
+    unknown = [column for column in columns if column not in LEADERBOARD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown leaderboard column(s): {unknown} (available: {LEADERBOARD_COLUMNS})")
+
+
+class LeaderboardQuery:
+    """
+    리더보드 조회 (필터 조건은 모든 메서드에서 같은 이름의 키워드 인자로 지정)
+
+    필터:
+        precision: 정밀도 (예: "8bit", ["float16", "bfloat16"])
+        family: 모델 계열 (표시 이름 또는 모델 경로에 포함된 문자열, 대소문자 무시, 예: "EXAONE", "upstage/")
+        since / until: 기록 시각 범위 (ISO 형식 문자열, 예: "2025-10-01")
+        latest_only: True이면 모델별 최신 실행만 (기본값), False이면 모든 실행 기록
+        approximate: False이면 전체 평가만, True이면 빠른 근사 평가(quick-eval)만, None이면 모두 (기본값)
+    """
+
+    def __init__(self, store_path=RESULT_DB):
+        if not os.path.exists(store_path):
+            raise FileNotFoundError(f"Result store not found: {store_path}")
+        self.store = ResultStore(store_path)
+        self.conn = self.store.conn
+
+    def _where(self, precision=None, family=None, since=None, until=None, latest_only=True, approximate=None):
+        """필터 조건을 SQL WHERE 절과 파라미터로 변환"""
+        conditions, params = [], []
+        if latest_only:
+            conditions.append(LATEST_RUN_CONDITION)
+        if approximate is not None:
+            conditions.append("COALESCE(r.approximate, 0) = ?")
+            params.append(int(approximate))
+        if precision is not None:
+            precisions = [precision] if isinstance(precision, str) else list(precision)
+            conditions.append(f"r.precision IN ({','.join('?' * len(precisions))})")
+            params += precisions
+        if family:
+            conditions.append("(r.model LIKE ? OR r.model_path LIKE ?)")
+            params += [f"%{family}%"] * 2
+        if since:
+            conditions.append("r.created_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("r.created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def _read(self, sql, params, chunksize=None):
+        """SQL 결과를 pyarrow 타입 DataFrame으로 읽기 (chunksize를 주면 청크 단위 반복자)"""
+        return pd.read_sql_query(sql, self.conn, params=params, chunksize=chunksize, dtype_backend='pyarrow')
+
+    def count(self, **filters):
+        """필터에 맞는 실행 수"""
+        where, params = self._where(**filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM runs r {where}", params).fetchone()[0]
+
+    def runs(self, columns=None, sort_by='overall', ascending=False, limit=None, offset=0, **filters):
+        """
+        실행 목록 조회
+
+        Args:
+            columns: 읽을 열 목록 (기본값: 전체 LEADERBOARD_COLUMNS)
+            sort_by: 정렬 기준 열
+            limit / offset: 페이지 나누기
+
+        Returns:
+            pd.DataFrame
+        """
+        columns = columns or LEADERBOARD_COLUMNS
+        _check_columns(list(columns) + [sort_by])
+        where, params = self._where(**filters)
+        # 같은 점수는 run_id 순으로 고정하여 페이지 경계가 실행마다 바뀌지 않도록 함
+        sql = (f"SELECT {', '.join(f'r.{column}' for column in columns)} FROM runs r {where} "
+               f"ORDER BY r.{sort_by} {'ASC' if ascending else 'DESC'}, r.run_id ASC")
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset]
+        return self._read(sql, params)
+
+    def pages(self, page_size=DEFAULT_PAGE_SIZE, columns=None, sort_by='overall', ascending=False, **filters):
+        """
+        정렬된 실행 목록을 page_size 행씩 나눠 반환 (한 번에 한 페이지만 메모리에 올림)
+
+        Yields:
+            (시작 순위, pd.DataFrame)
+        """
+        columns = columns or LEADERBOARD_COLUMNS
+        _check_columns(list(columns) + [sort_by])
+        where, params = self._where(**filters)
+        sql = (f"SELECT {', '.join(f'r.{column}' for column in columns)} FROM runs r {where} "
+               f"ORDER BY r.{sort_by} {'ASC' if ascending else 'DESC'}, r.run_id ASC")
+        start = 1
+        for page in self._read(sql, params, chunksize=page_size):
+            yield start, page
+            start += len(page)
+
+    def group_by(self, by='precision', columns=None, agg='mean', **filters):
+        """
+        열 기준 그룹 집계 (예: 정밀도별 평균 대분류 점수)
+
+        Args:
+            by: 그룹 기준 열 (예: "precision", "scoring_mode", "model_path")
+            columns: 집계할 열 (기본값: CATEGORY_COLUMNS)
+            agg: "mean", "max", "min"
+
+        Returns:
+            pd.DataFrame: by, runs(실행 수), 집계 열
+        """
+        columns = columns or CATEGORY_COLUMNS
+        _check_columns([by] + list(columns))
+        if agg not in GROUP_AGGREGATES:
+            raise ValueError(f"agg must be one of {list(GROUP_AGGREGATES)}, got {agg!r}")
+        where, params = self._where(**filters)
+        aggregates = ', '.join(f"{GROUP_AGGREGATES[agg]}(r.{column}) AS {column}" for column in columns)
+        sql = (f"SELECT r.{by} AS {by}, COUNT(*) AS runs, {aggregates} FROM runs r {where} "
+               f"GROUP BY r.{by} ORDER BY {columns[0]} DESC")
+        return self._read(sql, params)
+
+    def top_by_subject(self, subject, k=10, columns=('model', 'precision', 'overall'), ascending=False, **filters):
+        """
+        특정 과목 점수 기준 상위 k개 실행
+
+        Args:
+            subject: 과목 표시 이름 (예: "Math", "Korean History")
+            ascending: True이면 하위 k개
+
+        Returns:
+            pd.DataFrame: subject_score + 지정한 열
+        """
+        _check_columns(list(columns))
+        where, params = self._where(**filters)
+        where = f"{where} AND s.subject = ?" if where else "WHERE s.subject = ?"
+        sql = (f"SELECT s.score AS subject_score, {', '.join(f'r.{column}' for column in columns)} "
+               f"FROM subject_scores s JOIN runs r ON r.run_id = s.run_id {where} "
+               f"ORDER BY s.score {'ASC' if ascending else 'DESC'}, r.run_id ASC LIMIT ?")
+        return self._read(sql, params + [subject, k])
+
+    def subjects(self):
+        """저장된 과목 이름 목록"""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT subject FROM subject_scores ORDER BY subject")]
+
+    def to_arrow(self, columns=None, **filters):
+        """조회 결과를 pyarrow Table로 반환 (다른 도구로 넘기거나 Parquet 저장용)"""
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(self.runs(columns=columns, **filters), preserve_index=False)
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,54 @@
+# lm_wrappers.py
+# lm_eval LM 객체를 감싸는 래퍼의 공통 기반 클래스
+# simple_evaluate는 LM 하위 클래스만 받으므로 래퍼도 LM을 상속해야 함
+
+from lm_eval.api.model import LM
+
+
+class DelegatingLM(LM):
+    """
+    내부 LM에 모든 호출을 위임하는 래퍼 기반 클래스
+
+    하위 클래스는 loglikelihood 등 필요한 메서드만 재정의하고,
+    나머지 속성(device, tokenizer, tok_encode 등)은 내부 LM에서 그대로 가져옴
+    """
+
+    def __init__(self, lm):
+        super().__init__()
+        self.lm = lm
+
+    def __getattr__(self, attr):
+        # 일반 속성 조회가 실패한 경우에만 호출됨 (self.lm 자체는 __dict__에 있음)
+        if attr == 'lm':
+            raise AttributeError(attr)
+        return getattr(self.lm, attr)
+
+    @property
+    def rank(self):
+        return self.lm.rank
+
+    @property
+    def world_size(self):
+        return self.lm.world_size
+
+    @property
+    def tokenizer_name(self):
+        return self.lm.tokenizer_name
+
+    def chat_template(self, chat_template=False):
+        return self.lm.chat_template(chat_template)
+
+    def apply_chat_template(self, chat_history, add_generation_prompt=True):
+        return self.lm.apply_chat_template(chat_history, add_generation_prompt)
+
+    def set_cache_hook(self, cache_hook):
+        self.lm.set_cache_hook(cache_hook)
+
+    def loglikelihood(self, requests):
+        return self.lm.loglikelihood(requests)
+
+    def loglikelihood_rolling(self, requests):
+        return self.lm.loglikelihood_rolling(requests)
+
+    def generate_until(self, requests):
+        return self.lm.generate_until(requests)
@@ -0,0 +1,245 @@
+# loglikelihood_cache.py
+# 요청 단위 loglikelihood 결과를 디스크에 저장하여 여러 실행에서 재사용하는 캐시
+# 모델 정체성(경로, revision, 정밀도 설정, PEFT 어댑터, 토크나이저) + context/continuation 문자열 해시를 키로 사용
+# (토크나이저 fingerprint가 키에 들어가므로 조회할 때 토큰화하지 않음)
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from evaluate_model import parse_model_config
+from lm_wrappers import DelegatingLM
+
+# === 전역 상수 정의 ===
+LL_CACHE_FILE = 'kmmlu_ll_cache.sqlite'
+DEFAULT_MAX_ENTRIES = 5_000_000  # 약 수백 MB
+
+# 캐시 키에 포함할 정밀도 관련 model_args 항목
+PRECISION_ARG_KEYS = ['dtype', 'load_in_8bit', 'load_in_4bit', 'bnb_4bit_compute_dtype', 'bnb_4bit_quant_type']
+
+# 캐시 키에 포함할 가중치를 바꾸는 model_args 항목 (어댑터 / delta 가중치)
+# 모델 출력을 바꾸는 항목이 새로 생기면 여기에 추가해야 서로 다른 모델이 캐시를 공유하지 않음
+WEIGHT_ARG_KEYS = ['peft', 'delta']
+
+# SQLite 한 쿼리에 넣을 수 있는 파라미터 수 제한을 피하기 위한 청크 크기
+_QUERY_CHUNK = 500
+
+# 조회된 항목의 LRU 시각은 모아 두었다가 쓰기(put_many) / close 때 함께 갱신
+# (조회마다 쓰기 잠금을 잡으면 동시에 읽는 프로세스들이 서로를 기다림)
+TOUCH_FLUSH_SIZE = 100_000
+
+
+def weights_signature(path):
+    """
+    로컬 가중치 폴더의 파일별 (이름, 크기, 수정 시각) (같은 경로에 다시 학습한 어댑터를 구분, Hub 저장소는 None)
+    """
+    if not os.path.isdir(path):
+        return None
+    return sorted((name, os.path.getsize(os.path.join(path, name)), os.stat(os.path.join(path, name)).st_mtime_ns)
+                  for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+
+
+def model_identity(model_name, model_args):
+    """
+    캐시 키에 쓰일 모델 정체성 정보
+
+    Args:
+        model_name: 모델 경로 (예: "upstage/SOLAR-10.7B-v1.0")
+        model_args: "pretrained=...,load_in_8bit=True,peft=..." 형식의 문자열
+
+    Returns:
+        dict: 모델 경로, revision, 정밀도 및 정밀도 관련 설정
+              (peft= 등 가중치를 바꾸는 항목이 있으면 경로, revision, 로컬 파일 정보를 "weights"에 추가,
+              base_url= 엔드포인트는 주소와 모델 이름을 "endpoint"에 추가)
+    """
+    args = dict(item.split('=', 1) for item in model_args.split(',') if '=' in item)
+    identity = {
+        "model_path": args.get('pretrained', model_name),
+        "revision": args.get('revision', 'main'),
+        "precision": parse_model_config(model_args),
+        "precision_args": {key: args[key] for key in PRECISION_ARG_KEYS if key in args}
+    }
+    # 어댑터가 없는 모델은 이전과 같은 키를 유지 (기존 캐시 재사용)
+    weights = {
+        key: {"path": args[key], "revision": args.get('revision', 'main'), "files": weights_signature(args[key])}
+        for key in WEIGHT_ARG_KEYS if key in args
+    }
+    if weights:
+        identity["weights"] = weights
+    if 'base_url' in args:
+        identity["endpoint"] = {"base_url": args['base_url'].rstrip('/'), "model": args.get('model', model_name)}
+    return identity
+
+
+def identity_fingerprint(identity):
+    """모델 정체성 딕셔너리를 고정 길이 해시로 변환"""
+    payload = json.dumps(identity, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LoglikelihoodCache:
+    """
+    SQLite 기반 loglikelihood 결과 캐시 (content-addressed)
+
+    - WAL 모드로 열어 여러 프로세스가 동시에 읽어도 쓰기와 충돌하지 않음
+      (조회는 쓰기 잠금을 잡지 않고, 마지막 사용 시각은 메모리에 모았다가 쓰기 / close 때 한 번에 갱신)
+    - 항목 수가 max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제 (LRU)
+    - hits/misses는 이 객체를 사용한 모든 조회에 대해 누적
+    """
+
+    def __init__(self, path=LL_CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # 조회된 키 -> 마지막 조회 시각 (아직 DB에 반영하지 않은 LRU 갱신)
+
+        # isolation_level=None: 트랜잭션을 직접 BEGIN/COMMIT으로 관리
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                logprob REAL NOT NULL,
+                is_greedy INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+
+    def get_many(self, keys):
+        """
+        여러 키를 한 번에 조회
+
+        Returns:
+            dict: {키: (logprob, is_greedy)} (캐시에 있는 키만 포함)
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), _QUERY_CHUNK):
+            chunk = unique_keys[i:i + _QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT key, logprob, is_greedy FROM entries WHERE key IN ({placeholders})',
+                chunk
+            ).fetchall()
+            for key, logprob, is_greedy in rows:
+                found[key] = (logprob, bool(is_greedy))
+
+        now = time.time()
+        self._touched.update((key, now) for key in found)
+        if len(self._touched) >= TOUCH_FLUSH_SIZE:
+            self.flush_touches()
+        return found
+
+    def _write_touches(self):
+        """모아 둔 마지막 사용 시각을 DB에 반영 (쓰기 트랜잭션 안에서 호출)"""
+        if self._touched:
+            self.conn.executemany('UPDATE entries SET last_access = ? WHERE key = ?',
+                                  [(at, key) for key, at in self._touched.items()])
+            self._touched = {}
+
+    def flush_touches(self):
+        """모아 둔 LRU 갱신을 한 번의 쓰기로 반영 (실패해도 조회에는 영향 없음)"""
+        if not self._touched:
+            return
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self._write_touches()
+            self.conn.execute('COMMIT')
+        except sqlite3.OperationalError:
+            # 다른 프로세스가 오래 쓰기 잠금을 잡고 있으면 LRU 갱신만 건너뜀
+            if self.conn.in_transaction:
+                self.conn.execute('ROLLBACK')
+            self._touched = {}
+
+    def put_many(self, items):
+        """
+        여러 결과를 한 번에 저장하고 용량 초과 시 LRU 삭제
+
+        Args:
+            items: [(키, (logprob, is_greedy)), ...]
+        """
+        if not items:
+            return
+        now = time.time()
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._write_touches()
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO entries (key, logprob, is_greedy, last_access) VALUES (?, ?, ?, ?)',
+                [(key, float(logprob), int(bool(is_greedy)), now) for key, (logprob, is_greedy) in items]
+            )
+
+            overflow = self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    'DELETE FROM entries WHERE key IN '
+                    '(SELECT key FROM entries ORDER BY last_access LIMIT ?)',
+                    (overflow,)
+                )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        """캐시 적중/실패 통계"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "path": self.path
+        }
+
+    def close(self):
+        self.flush_touches()
+        self.conn.close()
+
+
+class CachedLM(DelegatingLM):
+    """
+    loglikelihood 요청을 캐시에서 먼저 찾고, 없는 요청만 내부 모델로 계산하는 LM 래퍼
+    """
+
+    def __init__(self, lm, cache, identity):
+        super().__init__(lm)
+        self.cache = cache
+        # 토크나이저(와 BOS 설정)를 정체성에 넣어 같은 문자열이면 같은 토큰이 되도록 보장
+        # (엔드포인트 모델은 서버가 토큰화하므로 base_url/model이 정체성)
+        tokenizer = getattr(lm, 'tokenizer', None)
+        if tokenizer is not None:
+            from prompt_cache import tokenizer_fingerprint
+            identity = {**identity, "tokenizer": tokenizer_fingerprint(tokenizer, getattr(lm, 'add_bos_token', False))}
+        self.fingerprint = identity_fingerprint(identity)
+
+    def _request_key(self, request):
+        """
+        모델 정체성 + context/continuation 문자열로 캐시 키 생성
+        (토큰화하지 않으므로 프롬프트 캐시의 적중/실패 통계에 조회가 섞이지 않음)
+        """
+        context, continuation = request.args
+        payload = json.dumps([self.fingerprint, context, continuation], separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def loglikelihood(self, requests):
+        keys = [self._request_key(request) for request in requests]
+        cached = self.cache.get_many(keys)
+
+        results = [cached.get(key) for key in keys]
+        miss_indices = [i for i, result in enumerate(results) if result is None]
+        self.cache.hits += len(requests) - len(miss_indices)
+        self.cache.misses += len(miss_indices)
+
+        if miss_indices:
+            computed = self.lm.loglikelihood([requests[i] for i in miss_indices])
+            for i, result in zip(miss_indices, computed):
+                results[i] = result
+            self.cache.put_many([(keys[i], results[i]) for i in miss_indices])
+
+        return results
@@ -0,0 +1,423 @@
+# model_server.py
+# 로드한 모델을 메모리에 올려 둔 채로 여러 평가 작업을 처리하는 상주 평가 서버
+# 모델은 메모리 한도 안에서 LRU 캐시에 보관하고, 평가 작업(evaluate_model 인자)은 로컬 소켓으로 받아 순서대로 실행
+# (작업은 별도 작업 스레드에서 실행하므로 평가 중에도 stats / shutdown 요청에 바로 응답)
+# 같은 모델을 배치 크기/채점 모드/빠른 평가 등 설정만 바꿔 반복 평가할 때 모델 로드 시간을 절약
+#
+# 사용 예:
+#   서버:  python model_server.py serve --device cuda:0
+#   작업:  batch_evaluate.py에서 EVAL_SERVER = SERVER_ADDRESS 로 설정하면 models 목록을 서버로 보냄
+#   상태:  python model_server.py stats
+#   종료:  python model_server.py shutdown
+#   인증:  serve가 무작위 키를 만들어 SERVER_AUTHKEY_FILE(0600)에 저장하고 클라이언트는 그 파일을 읽음
+#          (여러 사용자가 쓰는 호스트에서도 키를 모르면 작업을 보낼 수 없음, KMMLU_SERVER_AUTHKEY 환경 변수로 직접 지정 가능)
+#   확인:  python model_server.py demo   (CPU, 작은 무작위 모델 + 합성 KMMLU)
+
+import os
+import queue
+import secrets
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from multiprocessing.connection import Client, Listener
+
+from autotune import free_memory, run_with_oom_backoff
+from evaluate_model import evaluate_model, parse_model_config
+from scheduler import estimate_memory_gb
+
+# === 전역 상수 정의 ===
+SERVER_ADDRESS = ('localhost', 6150)
+SERVER_AUTHKEY_ENV = 'KMMLU_SERVER_AUTHKEY'   # 설정하면 키 파일 대신 이 값을 서버/클라이언트 키로 사용
+SERVER_AUTHKEY_FILE = os.path.join(os.path.expanduser('~'), '.kmmlu_eval_server.key')
+AUTHKEY_BYTES = 32
+DEFAULT_MAX_MODELS = 2          # 동시에 올려 둘 최대 모델 수
+DEVICE_MEMORY_FRACTION = 0.8    # 메모리 한도를 정하지 않으면 GPU 전체 메모리의 80%까지 모델 보관
+
+
+def model_memory_gb(lm):
+    """로드된 모델의 파라미터 + 버퍼 크기 (GB)"""
+    model = getattr(lm, 'model', None)
+    if model is None:
+        return 0.0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors) / 1024 ** 3
+
+
+def default_memory_limit_gb(device):
+    """장치별 기본 모델 캐시 메모리 한도 (CPU는 None = 모델 수 한도만 적용)"""
+    import torch
+
+    if not str(device).startswith('cuda') or not torch.cuda.is_available():
+        return None
+    return torch.cuda.get_device_properties(torch.device(device)).total_memory / 1024 ** 3 * DEVICE_MEMORY_FRACTION
+
+
+def create_authkey(path=SERVER_AUTHKEY_FILE):
+    """
+    서버 인증 키 준비 (KMMLU_SERVER_AUTHKEY가 없으면 무작위 키를 만들어 소유자만 읽을 수 있는 파일에 저장)
+    Listener/Client는 받은 메시지를 unpickle하므로 키는 소스에 고정하지 않음
+
+    Returns:
+        bytes: 인증 키
+    """
+    if os.environ.get(SERVER_AUTHKEY_ENV):
+        return os.environ[SERVER_AUTHKEY_ENV].encode()
+    authkey = secrets.token_bytes(AUTHKEY_BYTES)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        os.fchmod(f.fileno(), 0o600)   # 이미 있던 파일의 권한도 소유자 전용으로
+        f.write(authkey)
+    return authkey
+
+
+def load_authkey(path=SERVER_AUTHKEY_FILE):
+    """
+    클라이언트 인증 키 읽기 (KMMLU_SERVER_AUTHKEY 또는 serve가 만든 키 파일, 둘 다 없으면 연결하지 않음)
+
+    Returns:
+        bytes: 인증 키
+    """
+    if os.environ.get(SERVER_AUTHKEY_ENV):
+        return os.environ[SERVER_AUTHKEY_ENV].encode()
+    if not os.path.exists(path):
+        raise RuntimeError(f"No eval server key: start the server (python model_server.py serve) "
+                           f"or set {SERVER_AUTHKEY_ENV}")
+    if os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"Eval server key file {path} must be readable by its owner only (chmod 600)")
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ModelCache:
+    """
+    로드된 모델의 LRU 캐시
+
+    - 키는 (model_args, device): 같은 가중치/정밀도/장치이면 batch_size, scoring_mode 등 평가 설정이 달라도 재사용
+    - 새 모델을 로드하기 전에 예상 메모리(scheduler.estimate_memory_gb)만큼 자리를 비우고,
+      로드 후 실제 크기가 한도를 넘으면 가장 오래 쓰지 않은 모델부터 추가로 내림
+    - last_lookup: 마지막 조회의 적중 여부와 절약된 로드 시간 (evaluate_model이 result_data에 기록)
+    """
+
+    def __init__(self, max_memory_gb=None, max_models=DEFAULT_MAX_MODELS):
+        self.max_memory_gb = max_memory_gb
+        self.max_models = max_models
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.load_seconds_saved = 0.0
+        self.last_lookup = None
+
+    def memory_gb(self):
+        # list()로 복사한 뒤 읽음 (stats 요청은 작업 스레드가 캐시를 바꾸는 중에도 들어옴)
+        return sum(entry["memory_gb"] for entry in list(self.entries.values()))
+
+    def _over_limit(self, extra_gb=0.0, extra_models=0):
+        if self.max_models is not None and len(self.entries) + extra_models > self.max_models:
+            return True
+        return self.max_memory_gb is not None and self.memory_gb() + extra_gb > self.max_memory_gb
+
+    def _evict(self, extra_gb=0.0, extra_models=0, keep=None):
+        """한도 안에 들어올 때까지 가장 오래 쓰지 않은 모델부터 내림 (keep 키는 제외)"""
+        while self._over_limit(extra_gb, extra_models):
+            candidates = [key for key in self.entries if key != keep]
+            if not candidates:
+                break
+            entry = self.entries.pop(candidates[0])
+            self.evictions += 1
+            print(f"♻️ Model cache: evicted {entry['model_name']} ({entry['memory_gb']:.1f}GB)")
+            del entry
+            free_memory()
+
+    def get(self, model_name, model_args, device, loader):
+        """
+        캐시된 모델 반환 (없으면 loader()로 로드하여 보관)
+
+        Args:
+            loader: 모델을 로드하는 함수 (예: lambda: create_lm(model_args, device=device))
+
+        Returns:
+            로드된 lm
+        """
+        key = (model_args, str(device))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+            self.load_seconds_saved += entry["load_seconds"]
+            self.last_lookup = {"hit": True, "load_seconds": 0.0, "load_seconds_saved": entry["load_seconds"]}
+            print(f"♻️ Model cache hit: {model_name} (~{entry['load_seconds']:.1f}s load saved)")
+            return entry["lm"]
+
+        self._evict(estimate_memory_gb(model_name, model_args) or 0.0, extra_models=1)
+        start = time.time()
+        lm = loader()
+        load_seconds = time.time() - start
+        self.entries[key] = {
+            "model_name": model_name,
+            "lm": lm,
+            "memory_gb": model_memory_gb(lm),
+            "load_seconds": load_seconds,
+            "hits": 0
+        }
+        self.misses += 1
+        self.load_seconds += load_seconds
+        self._evict(keep=key)
+        self.last_lookup = {"hit": False, "load_seconds": load_seconds, "load_seconds_saved": 0.0}
+        return lm
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "models": [
+                {"model_name": entry["model_name"], "model_args": key[0], "device": key[1],
+                 "memory_gb": entry["memory_gb"], "load_seconds": entry["load_seconds"], "hits": entry["hits"]}
+                for key, entry in list(self.entries.items())
+            ],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_gb": self.memory_gb(),
+            "max_memory_gb": self.max_memory_gb,
+            "load_seconds": self.load_seconds,
+            "load_seconds_saved": self.load_seconds_saved
+        }
+
+
+class EvalServer:
+    """
+    평가 작업을 로컬 소켓으로 받아 하나씩 실행하는 서버 (작업은 도착 순서대로 처리)
+
+    accept 루프는 evaluate 요청을 작업 큐에 넣기만 하고, 작업 스레드가 하나씩 실행하여 그 연결로 응답함
+    stats / shutdown은 accept 루프에서 바로 응답 (평가가 진행 중이어도 기다리지 않음)
+    shutdown 후에는 새 요청을 받지 않고, 이미 받은 작업은 모두 마친 뒤 종료
+
+    메시지: {"op": "evaluate", "job": evaluate_model 인자} / {"op": "stats"} / {"op": "shutdown"}
+    응답:   {"status": "ok" 또는 "failed", "result": result_data, "error": ..., "cache": 모델 캐시 통계}
+            (stats / shutdown은 "jobs": 완료/실패/대기 작업 수와 실행 중인 작업의 label)
+    """
+
+    def __init__(self, address=SERVER_ADDRESS, authkey=None, device="cuda:0", max_memory_gb=None,
+                 max_models=DEFAULT_MAX_MODELS):
+        self.address = address
+        self.authkey = authkey if authkey is not None else create_authkey()
+        self.device = device
+        self.cache = ModelCache(max_memory_gb if max_memory_gb is not None else default_memory_limit_gb(device),
+                                max_models)
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.job_queue = queue.Queue()   # (연결, evaluate 메시지), 종료 신호는 None
+        self.running_job = None          # 실행 중인 작업의 label
+
+    def run_job(self, job):
+        """evaluate_model 인자 하나를 실행 (OOM 시 배치 크기 또는 토큰 예산을 줄여 재시도, 모델은 캐시에 유지)"""
+        kwargs = {"device": self.device, **job}
+        return run_with_oom_backoff(
+            lambda batch_size, max_batch_tokens: evaluate_model(
+                **{**kwargs, "batch_size": batch_size, "max_batch_tokens": max_batch_tokens},
+                model_cache=self.cache
+            ),
+            model_name=kwargs["model_name"],
+            precision=parse_model_config(kwargs["model_args"]),
+            batch_size=kwargs.get("batch_size", 16),
+            max_batch_tokens=kwargs.get("max_batch_tokens")
+        )
+
+    def handle(self, message):
+        """메시지 하나 처리"""
+        op = message.get("op")
+        if op == "evaluate":
+            try:
+                result = self.run_job(message["job"])
+                self.jobs_done += 1
+                return {"status": "ok", "result": result, "cache": self.cache.stats()}
+            except Exception as e:
+                self.jobs_failed += 1
+                reply = {"status": "failed", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+            # except 블록을 벗어나 실패한 평가의 프레임(traceback)을 놓은 뒤 메모리 정리
+            free_memory()
+            return {**reply, "cache": self.cache.stats()}
+        if op in ("stats", "shutdown"):
+            return {"status": "ok", "cache": self.cache.stats(),
+                    "jobs": {"done": self.jobs_done, "failed": self.jobs_failed,
+                             "pending": self.job_queue.qsize(), "running": self.running_job}}
+        return {"status": "failed", "error": f"Unknown op: {op!r}"}
+
+    def listen(self):
+        """작업을 받을 소켓 열기 (port 0이면 빈 포트 배정, 실제 주소는 listener.address)"""
+        return Listener(self.address, authkey=self.authkey, backlog=64)
+
+    @staticmethod
+    def _reply(conn, reply):
+        """응답을 보내고 연결 닫기"""
+        with conn:
+            try:
+                conn.send(reply)
+            except OSError:
+                print("⚠️ Client disconnected before the reply was sent")
+
+    def _job_worker(self):
+        """작업 큐의 evaluate 요청을 도착 순서대로 하나씩 실행하고 응답 (종료 신호 None을 받을 때까지)"""
+        while True:
+            item = self.job_queue.get()
+            if item is None:
+                return
+            conn, message = item
+            self.running_job = message.get("job", {}).get("label")
+            try:
+                reply = self.handle(message)
+            finally:
+                self.running_job = None
+            self._reply(conn, reply)
+
+    def serve_forever(self, listener=None):
+        """shutdown 메시지를 받을 때까지 요청을 받고, 받은 작업을 모두 마친 뒤 반환"""
+        worker = threading.Thread(target=self._job_worker, name="kmmlu-eval-jobs", daemon=True)
+        worker.start()
+        with listener or self.listen() as listener:
+            print(f"🚀 Eval server listening on {listener.address[0]}:{listener.address[1]} (device {self.device})")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"⚠️ Rejected connection: {e}")
+                    continue
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    conn.close()
+                    continue
+                if message.get("op") == "evaluate":
+                    # 작업 스레드가 실행 후 이 연결로 응답
+                    self.job_queue.put((conn, message))
+                    continue
+                self._reply(conn, self.handle(message))
+                if message.get("op") == "shutdown":
+                    pending = self.job_queue.qsize() + (self.running_job is not None)
+                    print(f"👋 Eval server shutting down" + (f" after {pending} remaining job(s)" if pending else ""))
+                    break
+        self.job_queue.put(None)
+        worker.join()
+
+
+class EvalClient:
+    """평가 서버 클라이언트 (요청마다 연결을 열고 응답을 받을 때까지 기다림, 키를 주지 않으면 load_authkey)"""
+
+    def __init__(self, address=SERVER_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey if authkey is not None else load_authkey()
+
+    def _request(self, message):
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(message)
+            return conn.recv()
+
+    def evaluate(self, **job):
+        """evaluate_model 인자로 평가 실행 (응답 딕셔너리 반환)"""
+        return self._request({"op": "evaluate", "job": job})
+
+    def stats(self):
+        return self._request({"op": "stats"})
+
+    def shutdown(self):
+        return self._request({"op": "shutdown"})
+
+
+def print_cache_stats(cache):
+    """모델 캐시 통계 출력"""
+    print(f"📦 Model cache: {cache['hits']} hits / {cache['misses']} misses, {cache['evictions']} evictions, "
+          f"~{cache['load_seconds_saved']:.1f}s load time saved ({cache['memory_gb']:.1f}GB held)")
+    for model in cache["models"]:
+        print(f"   - {model['model_name']} [{model['device']}] {model['memory_gb']:.2f}GB, "
+              f"loaded in {model['load_seconds']:.1f}s, {model['hits']} hits")
+
+
+def _demo():
+    """CPU에서 작은 무작위 모델과 합성 KMMLU로 서버 재사용 확인 (임시 폴더에 결과 저장)"""
+    import contextlib
+    import io
+    import tempfile
+
+    import evaluate_model as em
+    from synthetic import make_offline_evaluate, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    model_args = f"pretrained={model_dir},dtype=float32"
+    em.simple_evaluate = make_offline_evaluate(n_questions=4)
+    os.chdir(tempfile.mkdtemp())
+
+    authkey = secrets.token_bytes(AUTHKEY_BYTES)   # 데모는 키 파일을 건드리지 않음
+    server = EvalServer(address=('localhost', 0), authkey=authkey, device="cpu", max_models=1)
+    listener = server.listen()
+    thread = threading.Thread(target=server.serve_forever, args=(listener,), daemon=True)
+    thread.start()
+
+    client = EvalClient(listener.address, authkey)
+    for label, job in [
+        ("tiny (batch 4)", {"batch_size": 4}),
+        ("tiny (batch 16)", {"batch_size": 16}),
+        ("tiny (single_pass)", {"batch_size": 16, "scoring_mode": "single_pass"}),
+        ("tiny (bfloat16)", {"batch_size": 16, "model_args": f"pretrained={model_dir},dtype=bfloat16"})
+    ]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            reply = client.evaluate(**{"model_name": model_dir, "model_args": model_args, "label": label, **job})
+        lookup = reply["result"]["model_cache"] if reply["status"] == "ok" else {}
+        print(f"✅ {label}: {reply['status']}, cache {'hit' if lookup.get('hit') else 'miss'}, "
+              f"load {lookup.get('load_seconds', 0.0):.2f}s")
+
+    # 평가가 진행 중일 때도 stats가 작업 완료를 기다리지 않고 바로 응답하는지 확인
+    label = "tiny (stats while running)"
+    running_stats = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        job = threading.Thread(target=client.evaluate, daemon=True, kwargs={
+            "model_name": model_dir, "model_args": model_args, "label": label, "batch_size": 4})
+        job.start()
+        while job.is_alive() and running_stats is None:
+            start = time.time()
+            reply = client.stats()
+            if reply["jobs"]["running"] == label:
+                running_stats = (reply, time.time() - start)
+            time.sleep(0.02)
+        job.join()
+    assert running_stats is not None, "stats was not answered while a job was running"
+    print(f"✅ stats answered in {running_stats[1] * 1000:.0f}ms while '{label}' was running")
+
+    print_cache_stats(client.stats()["cache"])
+    client.shutdown()
+    thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Persistent KMMLU evaluation server with a model cache")
+    parser.add_argument("--host", default=SERVER_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=SERVER_ADDRESS[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="run the server")
+    serve.add_argument("--device", default="cuda:0")
+    serve.add_argument("--max-memory-gb", type=float, help="model cache memory limit (default: 80%% of GPU memory)")
+    serve.add_argument("--max-models", type=int, default=DEFAULT_MAX_MODELS)
+
+    subparsers.add_parser("stats", help="print model cache statistics")
+    subparsers.add_parser("shutdown", help="stop the server")
+    subparsers.add_parser("demo", help="CPU demo with a tiny random model")
+    args = parser.parse_args()
+
+    address = (args.host, args.port)
+    if args.command == "serve":
+        EvalServer(address, device=args.device, max_memory_gb=args.max_memory_gb,
+                   max_models=args.max_models).serve_forever()
+    elif args.command == "stats":
+        reply = EvalClient(address).stats()
+        print(f"Jobs: {reply['jobs']['done']} done, {reply['jobs']['failed']} failed")
+        print_cache_stats(reply["cache"])
+    elif args.command == "shutdown":
+        EvalClient(address).shutdown()
+    else:
+        _demo()
@@ -0,0 +1,223 @@
+# prefetch.py
+# 모델 가중치 미리 받기 / 확인 단계
+# 평가 큐의 모델 가중치를 백그라운드 스레드 풀에서 미리 다운로드(또는 로컬 캐시에 빠짐없이 있는지 확인)하여
+# 현재 모델을 평가하는 동안 다음 모델의 다운로드가 끝나도록 함
+# - 로컬 폴더: 가중치 파일이 모두 있는지만 확인
+# - Hub 저장소: HF 캐시에 완전한 스냅샷이 있으면 네트워크 없이 사용, 없으면 가중치(safetensors 우선)와
+#   config / 토크나이저 파일만 다운로드 (from_pretrained와 같은 HF 캐시를 사용하므로 로드 시 다시 받지 않음)
+# - base_url= (엔드포인트) 모델은 받을 가중치가 없으므로 건너뜀
+# evaluate_model은 시작 전에 ensure_weights를 호출하므로 다운로드 시간은 elapsed_time에 들어가지 않고
+# result_data['prefetch']에 따로 기록됨
+#
+# 사용 예:
+#   python cli.py prefetch              (batch_evaluate.models 전체를 미리 받기)
+#   python prefetch.py upstage/SOLAR-10.7B-v1.0 K-intelligence/Midm-2.0-Mini-Instruct
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# === 전역 상수 정의 ===
+DEFAULT_PREFETCH_WORKERS = 2   # 동시에 받는 모델 수 (큐 앞쪽 모델부터 차례로)
+# 가중치 외에 받는 파일 (config, 토크나이저, 채팅 템플릿, 원격 코드)
+SUPPORT_PATTERNS = ["*.json", "*.model", "*.txt", "*.py", "*.tiktoken", "*.jinja"]
+WEIGHT_INDEX_FILES = ["model.safetensors.index.json", "pytorch_model.bin.index.json"]
+WEIGHT_FILES = ["model.safetensors", "pytorch_model.bin", "adapter_model.safetensors", "adapter_model.bin"]
+
+
+def parse_weight_args(model_args):
+    """
+    model_args에서 받아야 할 가중치 저장소 추출
+
+    Returns:
+        tuple: ([(모델 또는 어댑터 경로, revision), ...], 엔드포인트 여부)
+    """
+    args = dict(part.split('=', 1) for part in model_args.split(',') if '=' in part)
+    if 'base_url' in args:
+        return [], True
+    repos = [(args['pretrained'], args.get('revision'))] if 'pretrained' in args else []
+    if 'peft' in args:
+        repos.append((args['peft'], None))
+    return repos, False
+
+
+def missing_weight_files(folder):
+    """
+    폴더에 없는 가중치 파일 목록 (샤딩된 모델은 index 파일에 적힌 shard를 모두 확인)
+
+    Returns:
+        list: 없는 파일 이름 (가중치 파일이 하나도 없으면 ["<weights>"])
+    """
+    for index_name in WEIGHT_INDEX_FILES:
+        index_path = os.path.join(folder, index_name)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                shards = sorted(set(json.load(f)["weight_map"].values()))
+            return [shard for shard in shards if not os.path.exists(os.path.join(folder, shard))]
+    if any(os.path.exists(os.path.join(folder, name)) for name in WEIGHT_FILES):
+        return []
+    return ["<weights>"]
+
+
+def _folder_size_mb(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 ** 2
+
+
+def fetch_repo(repo, revision=None):
+    """
+    저장소 하나의 가중치를 로컬에 준비
+
+    Returns:
+        dict: {"repo", "path", "status" ("local" / "cached" / "downloaded"), "seconds", "size_mb"}
+    """
+    start = time.time()
+    if os.path.isdir(repo):
+        missing = missing_weight_files(repo)
+        if missing:
+            raise FileNotFoundError(f"Local model folder {repo} is missing weight files: {missing[:5]}")
+        return {"repo": repo, "path": repo, "status": "local", "seconds": time.time() - start,
+                "size_mb": _folder_size_mb(repo)}
+
+    from huggingface_hub import HfApi, snapshot_download
+    from huggingface_hub.errors import LocalEntryNotFoundError
+
+    # HF 캐시에 완전한 스냅샷이 있으면 네트워크 요청 없이 사용
+    try:
+        folder = snapshot_download(repo, revision=revision, local_files_only=True)
+        if not missing_weight_files(folder):
+            return {"repo": repo, "path": folder, "status": "cached", "seconds": time.time() - start,
+                    "size_mb": _folder_size_mb(folder)}
+    except LocalEntryNotFoundError:
+        pass
+
+    # safetensors가 있으면 .bin은 받지 않음 (transformers도 safetensors를 우선 사용)
+    files = [sibling.rfilename for sibling in HfApi().model_info(repo, revision=revision).siblings]
+    weight_pattern = "*.safetensors" if any(name.endswith('.safetensors') for name in files) else "*.bin"
+    folder = snapshot_download(repo, revision=revision, allow_patterns=[weight_pattern, *SUPPORT_PATTERNS])
+    missing = missing_weight_files(folder)
+    if missing:
+        raise FileNotFoundError(f"Download of {repo} is missing weight files: {missing[:5]}")
+    return {"repo": repo, "path": folder, "status": "downloaded", "seconds": time.time() - start,
+            "size_mb": _folder_size_mb(folder)}
+
+
+def weight_status(model_args):
+    """
+    네트워크 요청 없이 model_args의 가중치가 로컬에 준비되어 있는지 확인 (cli.py batch --validate)
+
+    Returns:
+        str: "remote" (엔드포인트), "local" / "cached" (준비됨), "missing" (받아야 함), "incomplete" (일부 shard 없음)
+    """
+    repos, remote = parse_weight_args(model_args)
+    if remote:
+        return "remote"
+    statuses = []
+    for repo, revision in repos:
+        if os.path.isdir(repo):
+            statuses.append("incomplete" if missing_weight_files(repo) else "local")
+            continue
+        from huggingface_hub import snapshot_download
+        from huggingface_hub.errors import LocalEntryNotFoundError
+        try:
+            folder = snapshot_download(repo, revision=revision, local_files_only=True)
+        except LocalEntryNotFoundError:
+            statuses.append("missing")
+            continue
+        statuses.append("incomplete" if missing_weight_files(folder) else "cached")
+    return next((s for s in ("missing", "incomplete", "cached") if s in statuses), "local")
+
+
+def ensure_weights(model_args):
+    """
+    model_args의 모델(과 어댑터) 가중치를 로컬에 준비
+
+    Returns:
+        dict: {"status", "seconds", "size_mb", "repos": [fetch_repo 결과, ...]}
+              status는 저장소 중 가장 오래 걸린 경우 기준 ("downloaded" > "cached" > "local", 엔드포인트는 "remote")
+    """
+    repos, remote = parse_weight_args(model_args)
+    if remote:
+        return {"status": "remote", "seconds": 0.0, "size_mb": 0.0, "repos": []}
+    fetched = [fetch_repo(repo, revision) for repo, revision in repos]
+    statuses = {item["status"] for item in fetched}
+    status = next((s for s in ("downloaded", "cached", "local") if s in statuses), "local")
+    return {"status": status, "seconds": sum(item["seconds"] for item in fetched),
+            "size_mb": sum(item["size_mb"] for item in fetched), "repos": fetched}
+
+
+class WeightPrefetcher:
+    """
+    평가 큐의 가중치를 백그라운드 스레드 풀에서 미리 준비
+
+    submit(model_args): 준비 작업 추가 (같은 model_args는 한 번만, 넣은 순서대로 시작)
+    wait(model_args): 준비가 끝날 때까지 기다리고 ensure_weights 결과에 wait_seconds(평가가 기다린 시간) 추가
+                      실패한 경우 경고만 출력하고 None 반환 (평가 단계의 from_pretrained가 다시 시도)
+    """
+
+    def __init__(self, max_workers=DEFAULT_PREFETCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kmmlu-prefetch")
+        self.futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, model_args):
+        with self._lock:
+            if model_args not in self.futures:
+                self.futures[model_args] = self.executor.submit(ensure_weights, model_args)
+            return self.futures[model_args]
+
+    def submit_all(self, models):
+        """(모델경로, 로딩설정, 표시이름) 목록을 큐 순서대로 추가"""
+        for _, model_args, _ in models:
+            self.submit(model_args)
+
+    def wait(self, model_args):
+        start = time.time()
+        try:
+            stats = self.submit(model_args).result()
+        except Exception as e:
+            print(f"⚠️ Prefetch failed for {model_args}: {type(e).__name__}: {e}")
+            return None
+        return {**stats, "wait_seconds": time.time() - start}
+
+    def close(self, cancel_pending=False):
+        self.executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(cancel_pending=exc_info[0] is not None)
+
+
+def prefetch_models(models, max_workers=DEFAULT_PREFETCH_WORKERS):
+    """
+    models 목록 전체를 미리 받고 모델별 결과 출력
+
+    Returns:
+        dict: {표시이름: ensure_weights 결과 또는 None(실패)}
+    """
+    results = {}
+    with WeightPrefetcher(max_workers) as prefetcher:
+        prefetcher.submit_all(models)
+        for _, model_args, label in models:
+            stats = prefetcher.wait(model_args)
+            results[label] = stats
+            if stats is not None:
+                print(f"📦 {label}: {stats['status']} ({stats['size_mb']:,.0f}MB, {stats['seconds']:.1f}s)")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download or verify model weights ahead of evaluation")
+    parser.add_argument("models", nargs="+", help="model paths or Hub repos")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PREFETCH_WORKERS)
+    args = parser.parse_args()
+
+    prefetch_models([(model, f"pretrained={model}", model) for model in args.models], args.workers)
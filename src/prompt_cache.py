@@ -0,0 +1,325 @@
+# prompt_cache.py
+# 렌더링된 KMMLU 프롬프트의 토큰화 결과를 디스크에 저장하고 memory-map으로 읽어 재사용하는 캐시
+# 토크나이저 fingerprint + 태스크 버전 + few-shot 시드/개수가 같으면 다른 모델(같은 토크나이저)이나
+# 다른 정밀도로 다시 평가할 때 토큰화를 건너뜀
+#
+# 캐시하는 것은 토큰화뿐: few-shot 프롬프트 렌더링(lm_eval이 요청을 만드는 단계)은 매번 실행되고,
+# 항목은 렌더링된 context/continuation 문자열로 찾음
+# (few-shot 시드/개수는 캐시 폴더를 나눌 뿐 렌더링을 건너뛰게 하지 않음, 문자열이 키이므로 설정이 달라도 잘못 적중하지 않음)
+#
+# 저장 형식 (캐시 키마다 폴더 하나):
+#   manifest.json                 현재 버전 폴더 이름과 통계
+#   <버전>/ctx_hashes.npy          context 해시 (uint64, 정렬)
+#   <버전>/ctx_offsets.npy         context 토큰 시작/끝 위치 (int64, 길이 C+1)
+#   <버전>/ctx_tokens.npy          context 토큰 ID (int32, 이어붙임)
+#   <버전>/pair_*.npy              (context, continuation) 쌍별 continuation 토큰 (같은 구조)
+# context는 선택지 4개가 공유하므로 한 번만 저장
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from itertools import chain
+
+import numpy as np
+from filelock import FileLock
+
+# === 전역 상수 정의 ===
+PROMPT_CACHE_DIR = 'kmmlu_prompt_cache'
+DEFAULT_FEWSHOT_SEED = 1234  # lm_eval simple_evaluate의 기본 fewshot_random_seed
+
+
+def _hash(*parts):
+    """문자열들을 64비트 정수 해시로 변환 (각 부분 길이를 앞에 붙여 경계가 섞이지 않게 함)"""
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        data = part.encode('utf-8')
+        h.update(len(data).to_bytes(8, 'little'))
+        h.update(data)
+    return int.from_bytes(h.digest(), 'little')
+
+
+def tokenizer_fingerprint(tokenizer, add_bos_token=False):
+    """
+    토크나이저 정체성 해시 (어휘, 병합 규칙, 정규화/전처리 설정, 특수 토큰 포함)
+    이름이 달라도 내용이 같은 토크나이저는 같은 fingerprint를 가짐
+    """
+    h = hashlib.sha256()
+    h.update(type(tokenizer).__name__.encode('utf-8'))
+    h.update(f"add_bos_token={bool(add_bos_token)}".encode('utf-8'))
+    backend = getattr(tokenizer, 'backend_tokenizer', None)
+    if backend is not None:
+        h.update(backend.to_str().encode('utf-8'))
+    else:
+        h.update(json.dumps(sorted(tokenizer.get_vocab().items()), ensure_ascii=False).encode('utf-8'))
+    h.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+
+def kmmlu_task_version(task_manager=None):
+    """
+    lm_eval 버전 + KMMLU 태스크 설정 파일(프롬프트 템플릿) 내용의 해시
+    템플릿이나 lm_eval 버전이 바뀌면 캐시 키가 달라짐
+    """
+    import lm_eval
+    from lm_eval.tasks import TaskManager
+
+    task_manager = task_manager or TaskManager()
+    task_dir = os.path.dirname(task_manager.task_index['kmmlu']['yaml_path'])
+    h = hashlib.sha256(lm_eval.__version__.encode('utf-8'))
+    for filename in sorted(os.listdir(task_dir)):
+        path = os.path.join(task_dir, filename)
+        if os.path.isfile(path):
+            h.update(filename.encode('utf-8'))
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def prompt_cache_key(tokenizer_hash, task_version, num_fewshot=5, fewshot_seed=DEFAULT_FEWSHOT_SEED):
+    """
+    캐시 폴더 이름
+    (num_fewshot / fewshot_seed는 설정별로 표를 나눠 작게 유지하기 위한 것, 항목 자체는 렌더링된 문자열로 구분)
+    """
+    return f"tok-{tokenizer_hash[:16]}_task-{task_version}_{num_fewshot}shot_seed{fewshot_seed}"
+
+
+class _TokenTable:
+    """
+    해시 → 토큰 시퀀스 표 (정렬된 해시 + 위치 + 이어붙인 토큰)
+    np.load(mmap_mode='r')로 열어 필요한 부분만 디스크에서 읽음
+    """
+
+    def __init__(self, hashes, offsets, tokens):
+        self.hashes = hashes
+        self.offsets = offsets
+        self.tokens = tokens
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+
+    @classmethod
+    def load(cls, directory, prefix):
+        return cls(*(np.load(os.path.join(directory, f"{prefix}_{name}.npy"), mmap_mode='r')
+                     for name in ('hashes', 'offsets', 'tokens')))
+
+    def save(self, directory, prefix):
+        for name in ('hashes', 'offsets', 'tokens'):
+            np.save(os.path.join(directory, f"{prefix}_{name}.npy"), getattr(self, name))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def get(self, key):
+        """해시에 해당하는 토큰 목록 (없으면 None)"""
+        i = int(np.searchsorted(self.hashes, np.uint64(key)))
+        if i == len(self.hashes) or int(self.hashes[i]) != key:
+            return None
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]].tolist()
+
+    def merged(self, new_items):
+        """
+        기존 표와 새 항목 {해시: 토큰 목록}을 합친 새 표 (해시 순 정렬)
+        """
+        if not new_items:
+            return self
+        new_hashes = np.fromiter(new_items.keys(), dtype=np.uint64, count=len(new_items))
+        new_lengths = np.fromiter((len(tokens) for tokens in new_items.values()), dtype=np.int64,
+                                  count=len(new_items))
+        new_tokens = np.fromiter(chain.from_iterable(new_items.values()), dtype=np.int32)
+
+        old_lengths = np.diff(np.asarray(self.offsets))
+        hashes = np.concatenate([np.asarray(self.hashes), new_hashes])
+        lengths = np.concatenate([old_lengths, new_lengths])
+        starts = np.concatenate([np.asarray(self.offsets[:-1]),
+                                 len(self.tokens) + np.concatenate([[0], np.cumsum(new_lengths)[:-1]])])
+        tokens = np.concatenate([np.asarray(self.tokens), new_tokens])
+
+        # 해시 순으로 정렬한 뒤 토큰을 한 번에 모음
+        order = np.argsort(hashes, kind='stable')
+        lengths, starts = lengths[order], starts[order]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        gather = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + np.repeat(starts, lengths)
+        return _TokenTable(hashes[order], offsets, tokens[gather].astype(np.int32))
+
+
+class PromptTokenCache:
+    """
+    (context, continuation) → (context 토큰, continuation 토큰) 캐시
+    프롬프트를 렌더링한 뒤의 토큰화만 건너뜀 (렌더링된 문자열이 있어야 조회할 수 있음)
+
+    - 조회는 memory-map된 배열에서 이진 탐색 (파일 전체를 읽지 않음, 여러 프로세스가 페이지 캐시 공유)
+    - 새로 토큰화한 항목은 메모리에 모았다가 save()에서 기존 항목과 합쳐 새 버전으로 저장
+    - 저장은 새 버전 폴더를 만든 뒤 manifest.json을 교체하므로 읽는 중인 프로세스에 영향 없음
+    """
+
+    def __init__(self, cache_dir, key):
+        self.path = os.path.join(cache_dir, key)
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.encode_seconds = 0.0
+        self._pending_contexts = {}
+        self._pending_pairs = {}
+        self._load()
+
+    @classmethod
+    def for_lm(cls, lm, cache_dir=PROMPT_CACHE_DIR, num_fewshot=5, fewshot_seed=DEFAULT_FEWSHOT_SEED,
+               task_version=None):
+        """HFLM의 토크나이저 설정으로 캐시 키를 만들어 캐시 열기"""
+        tokenizer_hash = tokenizer_fingerprint(lm.tokenizer, getattr(lm, 'add_bos_token', False))
+        key = prompt_cache_key(tokenizer_hash, task_version or kmmlu_task_version(), num_fewshot, fewshot_seed)
+        return cls(cache_dir, key)
+
+    def _read_manifest(self):
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load(self):
+        manifest = self._read_manifest()
+        self.manifest = manifest or {}
+        if manifest:
+            version_dir = os.path.join(self.path, manifest['version'])
+            self.contexts = _TokenTable.load(version_dir, 'ctx')
+            self.pairs = _TokenTable.load(version_dir, 'pair')
+        else:
+            self.contexts = _TokenTable.empty()
+            self.pairs = _TokenTable.empty()
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def get(self, context, continuation):
+        """캐시된 토큰화 결과 (없으면 None)"""
+        start = time.perf_counter()
+        context_hash = _hash(context)
+        pair_hash = _hash(context, continuation)
+        context_enc = self._pending_contexts.get(context_hash) or self.contexts.get(context_hash)
+        continuation_enc = None
+        if context_enc is not None:
+            continuation_enc = self._pending_pairs.get(pair_hash)
+            if continuation_enc is None:
+                continuation_enc = self.pairs.get(pair_hash)
+        self.lookup_seconds += time.perf_counter() - start
+
+        if continuation_enc is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return context_enc, continuation_enc
+
+    def put(self, context, continuation, context_enc, continuation_enc, seconds=0.0):
+        """새로 토큰화한 결과 추가 (save() 전까지는 메모리에만 보관)"""
+        self._pending_contexts.setdefault(_hash(context), list(context_enc))
+        self._pending_pairs[_hash(context, continuation)] = list(continuation_enc)
+        self.encode_seconds += seconds
+
+    def save(self):
+        """
+        새 항목을 기존 캐시와 합쳐 새 버전으로 저장 (여러 프로세스가 동시에 저장해도 잠금으로 순서 보장)
+
+        Returns:
+            int: 추가된 항목 수
+        """
+        if not self._pending_pairs:
+            return 0
+        os.makedirs(self.path, exist_ok=True)
+        with FileLock(os.path.join(self.path, 'write.lock')):
+            # 다른 프로세스가 먼저 저장했을 수 있으므로 최신 버전 위에 합침
+            self._load()
+            new_contexts = {h: t for h, t in self._pending_contexts.items() if self.contexts.get(h) is None}
+            new_pairs = {h: t for h, t in self._pending_pairs.items() if self.pairs.get(h) is None}
+            contexts = self.contexts.merged(new_contexts)
+            pairs = self.pairs.merged(new_pairs)
+
+            version = f"v{time.time_ns()}-{os.getpid()}"
+            version_dir = os.path.join(self.path, version)
+            os.makedirs(version_dir)
+            contexts.save(version_dir, 'ctx')
+            pairs.save(version_dir, 'pair')
+
+            # 이번 실행에서 잰 요청당 토큰화 시간을 남겨 다음 실행의 절약 시간 추정에 사용
+            added = len(new_pairs)
+            encode_per_request = (self.encode_seconds / self.misses if self.misses
+                                  else self.manifest.get('encode_seconds_per_request', 0.0))
+            manifest = {
+                "version": version,
+                "contexts": len(contexts),
+                "pairs": len(pairs),
+                "tokens": int(len(contexts.tokens) + len(pairs.tokens)),
+                "encode_seconds_per_request": encode_per_request
+            }
+            tmp_path = os.path.join(self.path, 'manifest.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, os.path.join(self.path, 'manifest.json'))
+
+            # 이전 버전 정리 (이미 열어 둔 프로세스는 파일이 지워져도 계속 읽을 수 있음)
+            for name in os.listdir(self.path):
+                if name.startswith('v') and name != version:
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+        self._pending_contexts, self._pending_pairs = {}, {}
+        self._load()
+        print(f"💾 Prompt cache: +{added} prompts ({len(self.pairs)} total) in {self.path}")
+        return added
+
+    def disk_bytes(self):
+        """현재 버전 파일 크기 합 (memory-map되는 크기)"""
+        if not self.manifest:
+            return 0
+        version_dir = os.path.join(self.path, self.manifest['version'])
+        return sum(os.path.getsize(os.path.join(version_dir, name)) for name in os.listdir(version_dir))
+
+    def stats(self):
+        """
+        캐시 적중 통계와 절약량 추정
+
+        - seconds_saved: 적중 수 × 요청당 토큰화 시간 - 조회 시간
+        - context_dedup_ratio: 요청마다 context 토큰을 따로 저장했을 때 대비 저장 토큰 비율
+        """
+        total = self.hits + self.misses
+        encode_per_request = (self.encode_seconds / self.misses if self.misses
+                              else self.manifest.get('encode_seconds_per_request', 0.0))
+        context_tokens = len(self.contexts.tokens)
+        per_request_tokens = context_tokens * len(self.pairs) / len(self.contexts) if len(self.contexts) else 0
+        return {
+            "key": self.key,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "encode_seconds": self.encode_seconds,
+            "lookup_seconds": self.lookup_seconds,
+            "seconds_saved": max(0.0, self.hits * encode_per_request - self.lookup_seconds),
+            "mapped_mb": self.disk_bytes() / 1024 ** 2,
+            "context_dedup_ratio": context_tokens / per_request_tokens if per_request_tokens else 1.0
+        }
+
+
+if __name__ == "__main__":
+    # CPU에서 작은 모델로 첫 실행(토큰화 + 저장)과 두 번째 실행(캐시 적중) 비교
+    import tempfile
+    from evaluate_model import create_lm
+    from synthetic import make_synthetic_docs, make_synthetic_requests, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    cache_dir = tempfile.mkdtemp()
+    requests = make_synthetic_requests(make_synthetic_docs(subjects=["math", "law", "nursing"], n_questions=30))
+
+    outputs = []
+    for run in ("cold", "warm"):
+        lm = create_lm(f"pretrained={model_dir},dtype=float32", batch_size=16, device="cpu")
+        lm.prompt_cache = PromptTokenCache.for_lm(lm, cache_dir, task_version="demo")
+        start = time.perf_counter()
+        outputs.append(lm.loglikelihood(requests))
+        seconds = time.perf_counter() - start
+        lm.prompt_cache.save()
+        print(f"{run}: {seconds:.2f}s {lm.prompt_cache.stats()}")
+
+    print("identical results:", all(abs(a[0] - b[0]) < 1e-6 for a, b in zip(*outputs)))
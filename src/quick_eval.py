@@ -0,0 +1,204 @@
+# quick_eval.py
+# 빠른 근사 평가 (quick-eval)
+# 45개 과목 각각에서 문항을 무작위로 조금씩 뽑아 라운드 단위로 평가하고,
+# 과목별 정확도 신뢰구간이 기준 폭보다 좁아진 과목은 더 이상 평가하지 않음
+# 전체/대분류 점수는 과목별 전체 문항 수로 가중한 층화 추정치와 신뢰구간으로 보고
+# (새 체크포인트가 리더보드 상위권과 같은 구간에 있는지 빠르게 확인하는 용도, 리더보드에는 근사 결과로 표시)
+
+import math
+import random
+from contextlib import nullcontext
+from statistics import NormalDist
+
+from evaluate_model import CATEGORY_RESULT_KEYS, aggregate_subject_scores
+
+# === 전역 상수 정의 ===
+QUICK_CI_WIDTH = 0.2            # 과목별 신뢰구간 폭이 이 값 이하가 되면 그 과목 평가 중단
+QUICK_CONFIDENCE = 0.95         # 신뢰수준
+QUICK_INITIAL_QUESTIONS = 16    # 첫 라운드에서 과목마다 뽑는 문항 수
+QUICK_STEP_QUESTIONS = 16       # 이후 라운드마다 과목별로 추가하는 문항 수
+
+
+def z_score(confidence=QUICK_CONFIDENCE):
+    """양측 신뢰구간의 z 값 (예: 0.95 -> 1.96)"""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def _finite_population_correction(n, total):
+    """유한 모집단 보정 계수 (과목 문항을 모두 평가하면 0)"""
+    if n >= total:
+        return 0.0
+    if total <= 1:
+        return 1.0
+    return math.sqrt((total - n) / (total - 1))
+
+
+def wilson_interval(correct, n, total=None, z=None):
+    """
+    정확도의 Wilson 신뢰구간 (total을 주면 유한 모집단 보정 적용)
+
+    Args:
+        correct: 맞힌 문항 수
+        n: 평가한 문항 수
+        total: 과목 전체 문항 수
+        z: z 값 (기본값: QUICK_CONFIDENCE)
+
+    Returns:
+        tuple: (하한, 상한)
+    """
+    if n == 0:
+        return 0.0, 1.0
+    z = z_score() if z is None else z
+    p = correct / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    if total is not None:
+        half *= _finite_population_correction(n, total)
+        if half == 0.0:
+            return p, p
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_estimate(subjects, z=None):
+    """
+    과목(층)별 표본 정확도로 전체/대분류 정확도와 신뢰구간 추정
+    과목마다 전체 문항 수로 가중하므로 전체 평가의 표본 수 가중 평균(aggregate_subject_scores)과 같은 값을 추정
+
+    Args:
+        subjects: {태스크명: {"correct": ..., "n": ..., "total": ..., "category": ...}}
+
+    Returns:
+        dict: {"overall": {"estimate", "ci"}, "stem": {...}, "humss": {...}, "applied": {...}, "other": {...}}
+    """
+    z = z_score() if z is None else z
+    estimates = aggregate_subject_scores({
+        task: {"acc": info['correct'] / info['n'] if info['n'] else 0.0, "n": info['total'],
+               "category": info['category']}
+        for task, info in subjects.items()
+    })
+
+    # 층화 분산: sum((N_h / N)^2 * p_h(1 - p_h) / n_h * fpc_h^2)
+    # p_h는 Agresti-Coull 보정값을 써서 0% / 100% 과목의 분산이 0이 되지 않도록 함
+    groups = {"overall": list(subjects)}
+    for category, key in CATEGORY_RESULT_KEYS.items():
+        groups[key] = [task for task, info in subjects.items() if info['category'] == category]
+
+    summary = {}
+    for key, tasks in groups.items():
+        total = sum(subjects[task]['total'] for task in tasks)
+        variance = 0.0
+        for task in tasks:
+            info = subjects[task]
+            if not total or not info['n']:
+                continue
+            p = (info['correct'] + z * z / 2) / (info['n'] + z * z)
+            fpc = _finite_population_correction(info['n'], info['total'])
+            variance += (info['total'] / total) ** 2 * p * (1 - p) / info['n'] * fpc ** 2
+        half = z * math.sqrt(variance)
+        estimate = estimates[key]
+        summary[key] = {"estimate": estimate, "ci": [max(0.0, estimate - half), min(1.0, estimate + half)]}
+    return summary
+
+
+def load_subject_sizes(subject_tasks, task_manager=None):
+    """
+    과목별 평가 문항 수 (lm_eval 태스크의 eval_docs 길이, 데이터셋을 불러옴)
+
+    Returns:
+        dict: {태스크명: 문항 수}
+    """
+    from lm_eval.tasks import TaskManager, get_task_dict
+
+    task_dict = get_task_dict(list(subject_tasks), task_manager or TaskManager())
+    return {task: len(task_dict[task].eval_docs) for task in subject_tasks}
+
+
+def quick_evaluate(lm, subject_tasks, subject_sizes, evaluate_fn, ci_width=QUICK_CI_WIDTH,
+                   confidence=QUICK_CONFIDENCE, initial_questions=QUICK_INITIAL_QUESTIONS,
+                   step_questions=QUICK_STEP_QUESTIONS, max_questions=None, num_fewshot=5, seed=0, profiler=None):
+    """
+    과목별 층화 표본 평가 (신뢰구간이 충분히 좁아진 과목부터 중단)
+
+    과목마다 문항 순서를 seed로 한 번 섞어 두고, 라운드마다 아직 수렴하지 않은 과목의 다음 문항들을
+    simple_evaluate(samples=...) 한 번으로 함께 평가함 (같은 seed면 같은 문항을 같은 순서로 평가)
+
+    Args:
+        lm: 로드된 모델
+        subject_tasks: {태스크명: 대분류}
+        subject_sizes: {태스크명: 전체 문항 수} (load_subject_sizes 참고)
+        evaluate_fn: lm_eval simple_evaluate와 같은 형태의 함수
+        ci_width: 과목별 신뢰구간 폭 기준
+        max_questions: 과목별 최대 평가 문항 수 (None이면 제한 없음)
+        profiler: 구간별 시간을 기록할 instrumentation.EvalProfiler (선택)
+
+    Returns:
+        tuple: (subject_results {태스크명: {"acc", "n", "category"}}, quick_eval 요약 딕셔너리)
+    """
+    z = z_score(confidence)
+    rnd = random.Random(seed)
+    order = {task: rnd.sample(range(subject_sizes[task]), subject_sizes[task]) for task in sorted(subject_tasks)}
+    limits = {task: min(subject_sizes[task], max_questions or subject_sizes[task]) for task in subject_tasks}
+    subjects = {
+        task: {"correct": 0, "n": 0, "total": subject_sizes[task], "category": category, "converged": False}
+        for task, category in subject_tasks.items()
+    }
+
+    # 대분류별로 섞이도록 과목을 대분류 순서로 정렬하여 평가
+    active = sorted((task for task in subject_tasks if limits[task]), key=lambda task: (subject_tasks[task], task))
+    rounds = 0
+    while active:
+        rounds += 1
+        samples = {}
+        for task in active:
+            n = subjects[task]['n']
+            samples[task] = order[task][n:min(n + (step_questions if n else initial_questions), limits[task])]
+
+        if hasattr(lm, 'set_sample_indices'):
+            # 문항별 로그(sample_log.SampleLogLM)가 lm_eval이 다시 매긴 번호 대신 원래 문항 번호를 기록하도록 전달
+            lm.set_sample_indices(samples)
+        with profiler.evaluation() if profiler else nullcontext():
+            results = evaluate_fn(model=lm, tasks=list(samples), num_fewshot=num_fewshot, samples=samples,
+                                  log_samples=False)
+
+        for task in samples:
+            n = results['n-samples'][task]['effective']
+            subjects[task]['correct'] += round(results['results'][task]['acc,none'] * n)
+            subjects[task]['n'] += n
+
+        still_active = []
+        for task in active:
+            info = subjects[task]
+            low, high = wilson_interval(info['correct'], info['n'], info['total'], z)
+            info['ci'] = [low, high]
+            if high - low <= ci_width:
+                info['converged'] = True
+            elif info['n'] < limits[task]:
+                still_active.append(task)
+        print(f"🔁 Quick-eval round {rounds}: {sum(len(indices) for indices in samples.values())} questions "
+              f"over {len(samples)} subjects, {len(active) - len(still_active)} subject(s) done")
+        active = still_active
+
+    estimates = stratified_estimate(subjects, z)
+    questions = sum(info['n'] for info in subjects.values())
+    total_questions = sum(info['total'] for info in subjects.values())
+    summary = {
+        "ci_width": ci_width,
+        "confidence": confidence,
+        "seed": seed,
+        "rounds": rounds,
+        "questions": questions,
+        "total_questions": total_questions,
+        "sampled_fraction": questions / total_questions if total_questions else 0.0,
+        "estimates": estimates,
+        "subjects": {
+            task: {"acc": info['correct'] / info['n'] if info['n'] else 0.0, "n": info['n'], "total": info['total'],
+                   "ci": info.get('ci', [0.0, 1.0]), "converged": info['converged']}
+            for task, info in subjects.items()
+        }
+    }
+    subject_results = {
+        task: {"acc": info['acc'], "n": info['n'], "category": subject_tasks[task]}
+        for task, info in summary['subjects'].items()
+    }
+    return subject_results, summary
@@ -0,0 +1,234 @@
+# reporting.py
+# WandB 로깅과 결과 저장(결과 저장소 + CSV/JSON 보기)을 백그라운드 스레드에서 처리하는 비동기 보고 파이프라인
+# 평가 루프는 작업을 큐에 넣기만 하고 바로 다음 모델로 넘어가며, 보고 스레드가 작업을 순서대로 실행
+# - 실패한 작업은 지수 백오프로 재시도하고, 끝까지 실패하면 로컬 파일로 남김
+# - wandb가 설치되어 있지 않거나 초기화에 실패하면 로컬 파일 싱크(kmmlu_reports/*.jsonl)에 기록
+# - 프로세스 종료 시(atexit) 큐에 남은 작업을 모두 처리한 뒤 종료
+
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+from datetime import datetime
+
+# === 전역 상수 정의 ===
+REPORT_DIR = 'kmmlu_reports'     # 로컬 파일 싱크 / 저장 실패한 결과 보관 폴더
+REPORT_QUEUE_SIZE = 256          # 큐가 가득 차면 평가 루프가 잠시 기다림 (메모리 상한)
+MAX_RETRIES = 3                  # 작업당 재시도 횟수
+BACKOFF_SECONDS = 1.0            # 첫 재시도 대기 시간 (재시도마다 2배)
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def table(columns, data):
+    """
+    WandB 표 데이터 (보고 스레드에서 wandb.Table로 변환, 로컬 싱크에는 그대로 기록)
+
+    Returns:
+        dict: {"_type": "table", "columns": [...], "data": [[...], ...]}
+    """
+    return {"_type": "table", "columns": list(columns), "data": [list(row) for row in data]}
+
+
+def _is_table(value):
+    return isinstance(value, dict) and value.get("_type") == "table"
+
+
+def _safe_name(name):
+    return re.sub(r'[^\w.-]+', '_', name)
+
+
+class LocalSink:
+    """WandB 대신 실행 하나의 로그를 JSONL 파일에 기록 (한 줄에 이벤트 하나)"""
+
+    def __init__(self, project, name, config, sink_dir=REPORT_DIR):
+        os.makedirs(sink_dir, exist_ok=True)
+        self.path = os.path.join(sink_dir, f"{_safe_name(project or 'local')}__{_safe_name(name)}.jsonl")
+        self.step = 0
+        self._write({"event": "init", "project": project, "name": name, "config": config})
+
+    def _write(self, entry):
+        entry = {"time": datetime.now().isoformat(timespec='seconds'), **entry}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def log(self, data):
+        self._write({"event": "log", "step": self.step, "data": data})
+        self.step += 1
+
+    def finish(self):
+        self._write({"event": "finish"})
+
+
+class ReportRun:
+    """
+    실행 하나의 WandB 로깅 핸들 (evaluate_model에서 사용)
+    log/finish는 큐에 넣기만 하고 바로 반환하며, 실제 wandb 호출은 보고 스레드에서 실행
+    """
+
+    def __init__(self, pipeline, project, name, config):
+        self.pipeline = pipeline
+        self.project = project
+        self.name = name
+        self.config = config
+        self.backend = None  # wandb Run 또는 LocalSink (보고 스레드에서 설정)
+        pipeline.submit(f"wandb.init({name})", self._init_wandb, fallback=self._init_local)
+
+    def log(self, data):
+        self.pipeline.submit(f"wandb.log({self.name})", self._log, data, fallback=self._log_local)
+
+    def finish(self):
+        self.pipeline.submit(f"wandb.finish({self.name})", self._finish)
+
+    # --- 아래는 보고 스레드에서 실행 ---
+
+    def _init_wandb(self):
+        try:
+            import wandb
+        except ImportError:
+            print("⚠️ wandb not installed, logging to local files instead. To enable wandb logging, run: pip install wandb")
+            self._init_local()
+            return
+        self.backend = wandb.init(project=self.project, name=self.name, config=self.config, reinit=True)
+        print(f"✅ WandB logging enabled: {self.project}/{self.name}")
+
+    def _init_local(self):
+        self.backend = LocalSink(self.project, self.name, self.config, self.pipeline.sink_dir)
+        print(f"📝 Logging {self.name} to {self.backend.path}")
+
+    def _log(self, data):
+        if isinstance(self.backend, LocalSink):
+            self.backend.log(data)
+            return
+        import wandb
+
+        self.backend.log({
+            key: wandb.Table(columns=value["columns"], data=value["data"]) if _is_table(value) else value
+            for key, value in data.items()
+        })
+
+    def _log_local(self, data):
+        """wandb.log가 끝까지 실패한 항목은 로컬 파일로 남김"""
+        if not isinstance(self.backend, LocalSink):
+            self.backend = LocalSink(self.project, self.name, self.config, self.pipeline.sink_dir)
+        self.backend.log(data)
+
+    def _finish(self):
+        if self.backend is not None:
+            self.backend.finish()
+
+
+class ReportingPipeline:
+    """
+    보고 작업 큐 + 작업 스레드 하나 (작업은 넣은 순서대로 실행)
+
+    submit(name, fn, *args, fallback=...): fn(*args)를 보고 스레드에서 실행
+        실패하면 BACKOFF_SECONDS, 2배, 4배... 기다렸다가 MAX_RETRIES번까지 다시 시도하고,
+        그래도 실패하면 fallback(*args)를 실행 (없으면 경고만 출력)
+    flush(): 큐에 들어간 작업이 모두 끝날 때까지 대기
+    close(): flush 후 작업 스레드 종료 (프로세스 종료 시 자동 호출)
+    """
+
+    def __init__(self, maxsize=REPORT_QUEUE_SIZE, max_retries=MAX_RETRIES, backoff_seconds=BACKOFF_SECONDS,
+                 sink_dir=REPORT_DIR):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.sink_dir = sink_dir
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="kmmlu-reporting", daemon=True)
+        self._thread.start()
+
+    def submit(self, name, fn, *args, fallback=None):
+        """작업 추가 (큐가 가득 차 있으면 자리가 날 때까지 대기)"""
+        if self._closed:
+            raise RuntimeError("Reporting pipeline is closed")
+        self.queue.put((name, fn, args, fallback))
+
+    def start_run(self, project, name, config):
+        """WandB 실행 시작 (wandb가 없거나 초기화에 실패하면 로컬 파일 싱크)"""
+        return ReportRun(self, project, name, config)
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        pending = self.queue.qsize()
+        if pending:
+            print(f"⏳ Flushing {pending} pending report task(s)...")
+        self.flush()
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join()
+
+    def _worker(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                self._run(*task)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, name, fn, args, fallback):
+        for attempt in range(self.max_retries + 1):
+            try:
+                fn(*args)
+                self.completed += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"⚠️ Report task failed after {attempt + 1} attempt(s): {name}: {e}")
+                    break
+                delay = self.backoff_seconds * 2 ** attempt
+                self.retries += 1
+                print(f"🔁 Report task {name} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+        self.failed += 1
+        if fallback is None:
+            return
+        try:
+            fallback(*args)
+        except Exception:
+            print(f"⚠️ Fallback for {name} failed:\n{traceback.format_exc()}")
+
+    def stats(self):
+        return {"pending": self.queue.qsize(), "completed": self.completed, "failed": self.failed,
+                "retries": self.retries}
+
+
+def get_pipeline():
+    """프로세스 공용 보고 파이프라인 (처음 호출 시 생성, 종료 시 자동 flush)"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ReportingPipeline()
+            atexit.register(_pipeline.close)
+        return _pipeline
+
+
+def flush_reports():
+    """공용 파이프라인에 남은 작업을 모두 처리 (atexit가 실행되지 않는 worker 프로세스 종료 전 등)"""
+    if _pipeline is not None:
+        _pipeline.flush()
+
+
+def save_unsaved_result(result_data, sink_dir=REPORT_DIR):
+    """결과 저장이 끝까지 실패한 result_data를 JSON 파일로 보관 (나중에 ResultStore.append로 다시 추가)"""
+    path = os.path.join(sink_dir, 'unsaved', f"{_safe_name(result_data['model'])}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result_data, f, indent=2, ensure_ascii=False)
+    print(f"💾 Result for {result_data['model']} could not be stored; kept in {path}")
@@ -0,0 +1,225 @@
+# result_store.py
+# 평가 결과를 추가 전용(append-only)으로 저장하는 SQLite 결과 저장소
+# 실행마다 한 행을 추가하고 이전 기록은 수정하지 않으며, 모델/경로/정밀도에 인덱스를 둠
+# kmmlu_results.csv와 kmmlu_leaderboard.json은 이 저장소에서 만든 파생 보기(view)
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+# === 전역 상수 정의 ===
+RESULT_DB = 'kmmlu_results.sqlite'
+
+# runs 테이블의 평면화된 열: (열 이름, SQL 타입, result_data에서 값을 꺼내는 함수)
+# 조회/정렬에 쓰는 값만 열로 두고, 전체 result_data는 result_json에 그대로 보관
+# 새 열을 추가하면 기존 DB에도 ALTER TABLE로 자동 추가됨
+RUN_COLUMNS = [
+    ("model_path", "TEXT", lambda r: r.get('model_path')),
+    ("precision", "TEXT", lambda r: r.get('precision')),
+    ("overall", "REAL", lambda r: r.get('overall')),
+    ("stem", "REAL", lambda r: r.get('stem')),
+    ("humss", "REAL", lambda r: r.get('humss')),
+    ("applied", "REAL", lambda r: r.get('applied')),
+    ("other", "REAL", lambda r: r.get('other')),
+    ("best_name", "TEXT", lambda r: (r.get('best') or {}).get('name')),
+    ("best_score", "REAL", lambda r: (r.get('best') or {}).get('score')),
+    ("worst_name", "TEXT", lambda r: (r.get('worst') or {}).get('name')),
+    ("worst_score", "REAL", lambda r: (r.get('worst') or {}).get('score')),
+    ("elapsed_time", "TEXT", lambda r: r.get('elapsed_time')),
+    ("batch_size", "TEXT", lambda r: None if r.get('batch_size') is None else str(r['batch_size'])),
+    ("max_batch_tokens", "INTEGER", lambda r: r.get('max_batch_tokens')),
+    ("scoring_mode", "TEXT", lambda r: (r.get('throughput') or {}).get('scoring_mode')),
+    ("questions_per_sec", "REAL", lambda r: (r.get('throughput') or {}).get('questions_per_sec')),
+    ("load_seconds", "REAL", lambda r: (r.get('profile') or {}).get('phases', {}).get('model_load')),
+    ("forward_seconds", "REAL", lambda r: (r.get('profile') or {}).get('phases', {}).get('forward')),
+    ("tokens_per_sec", "REAL", lambda r: (r.get('profile') or {}).get('tokens_per_sec')),
+    ("requests_per_sec", "REAL", lambda r: (r.get('profile') or {}).get('requests_per_sec')),
+    ("peak_host_memory_mb", "REAL", lambda r: (r.get('profile') or {}).get('peak_host_memory_mb')),
+    ("peak_device_memory_mb", "REAL", lambda r: (r.get('profile') or {}).get('peak_device_memory_mb')),
+    ("approximate", "INTEGER", lambda r: int(bool(r.get('approximate')))),
+    ("overall_ci_low", "REAL",
+     lambda r: (r.get('quick_eval') or {}).get('estimates', {}).get('overall', {}).get('ci', [None, None])[0]),
+    ("overall_ci_high", "REAL",
+     lambda r: (r.get('quick_eval') or {}).get('estimates', {}).get('overall', {}).get('ci', [None, None])[1]),
+    ("questions_evaluated", "INTEGER", lambda r: (r.get('quick_eval') or {}).get('questions'))
+]
+
+# 별칭 r의 실행이 모델별 최신 실행인지 판단하는 SQL 조건
+# (이후에 같은 표시 이름이나 같은 모델 경로로 다시 평가된 실행이 없음)
+# 전체 평가와 빠른 근사 평가(approximate)는 따로 비교하므로, 근사 평가가 나중에 있어도 전체 평가 결과를 가리지 않음
+# (approximate 열이 없던 이전 기록은 NULL = 전체 평가)
+LATEST_RUN_CONDITION = """NOT EXISTS (
+    SELECT 1 FROM runs later
+    WHERE later.run_id > r.run_id
+      AND (later.model = r.model OR later.model_path = r.model_path)
+      AND COALESCE(later.approximate, 0) = COALESCE(r.approximate, 0)
+)"""
+
+
+class ResultStore:
+    """
+    SQLite 기반 추가 전용 결과 저장소
+
+    - runs: 실행 하나당 한 행 (run_id 증가 순서 = 기록 순서)
+    - subject_scores: 실행별 과목 점수 (과목 기준 조회용)
+    - 같은 모델(표시 이름 또는 모델 경로)의 가장 최근 실행이 리더보드에 표시되는 결과
+      (전체 평가와 빠른 근사 평가는 각각 최신 실행 하나씩)
+    - WAL 모드 + BEGIN IMMEDIATE 트랜잭션으로 여러 프로세스가 동시에 추가해도 안전
+    """
+
+    def __init__(self, path=RESULT_DB):
+        self.path = path
+
+        # isolation_level=None: 트랜잭션을 직접 BEGIN/COMMIT으로 관리
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    result_json TEXT NOT NULL
+                )
+            """)
+            existing = {row['name'] for row in self.conn.execute('PRAGMA table_info(runs)')}
+            for name, sql_type, _ in RUN_COLUMNS:
+                if name not in existing:
+                    self.conn.execute(f'ALTER TABLE runs ADD COLUMN {name} {sql_type}')
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS subject_scores (
+                    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                    subject TEXT NOT NULL,
+                    category TEXT,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (run_id, subject)
+                )
+            """)
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_model ON runs(model)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_model_path ON runs(model_path)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_precision ON runs(precision)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_subject_scores_subject ON subject_scores(subject, score)')
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def append(self, result_data, created_at=None):
+        """
+        실행 결과 한 건 추가
+
+        Args:
+            result_data: evaluate_model()이 만든 결과 딕셔너리
+            created_at: 기록 시각 (기본값: 현재 시각, ISO 형식)
+
+        Returns:
+            int: 추가된 run_id
+        """
+        return self.append_many([result_data], created_at=created_at)[0]
+
+    def append_many(self, results, created_at=None):
+        """
+        여러 실행 결과를 한 트랜잭션으로 추가 (기존 리더보드 가져오기 등 대량 추가용)
+
+        Returns:
+            list: 추가된 run_id 목록
+        """
+        created_at = created_at or datetime.now().isoformat(timespec='seconds')
+        names = ['created_at', 'model', 'result_json'] + [name for name, _, _ in RUN_COLUMNS]
+        insert_sql = f"INSERT INTO runs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        run_ids = []
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            for result_data in results:
+                values = [created_at, result_data['model'], json.dumps(result_data, ensure_ascii=False)]
+                values += [extract(result_data) for _, _, extract in RUN_COLUMNS]
+                run_id = self.conn.execute(insert_sql, values).lastrowid
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO subject_scores (run_id, subject, category, score) VALUES (?, ?, ?, ?)',
+                    [(run_id, s['name'], s.get('category'), s['score'])
+                     for s in result_data.get('all_subjects_ranked', [])]
+                )
+                run_ids.append(run_id)
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return run_ids
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def last_run_id(self):
+        """가장 최근 run_id (비어 있으면 0)"""
+        return self.conn.execute('SELECT COALESCE(MAX(run_id), 0) FROM runs').fetchone()[0]
+
+    def latest_run_ids(self):
+        """
+        모델별 최신 실행의 run_id 목록 (기록 순서)
+        이후에 같은 표시 이름이나 같은 모델 경로로 다시 평가된 실행은 제외
+        """
+        rows = self.conn.execute(f"SELECT r.run_id FROM runs r WHERE {LATEST_RUN_CONDITION} ORDER BY r.run_id").fetchall()
+        return [row['run_id'] for row in rows]
+
+    def latest_results(self):
+        """모델별 최신 결과 딕셔너리 목록 (리더보드 보기의 내용)"""
+        run_ids = self.latest_run_ids()
+        results = []
+        for i in range(0, len(run_ids), 500):
+            chunk = run_ids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT result_json FROM runs WHERE run_id IN ({','.join('?' * len(chunk))}) ORDER BY run_id",
+                chunk
+            ).fetchall()
+            results.extend(json.loads(row['result_json']) for row in rows)
+        return results
+
+    def history(self, model=None, model_path=None, precision=None):
+        """
+        조건에 맞는 모든 실행 기록 (인덱스 열로 필터링, 기록 순서)
+
+        Returns:
+            list: [{"run_id": ..., "created_at": ..., "result": result_data}, ...]
+        """
+        conditions, params = [], []
+        for column, value in (("model", model), ("model_path", model_path), ("precision", precision)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(
+            f"SELECT run_id, created_at, result_json FROM runs {where} ORDER BY run_id", params
+        ).fetchall()
+        return [
+            {"run_id": row['run_id'], "created_at": row['created_at'], "result": json.loads(row['result_json'])}
+            for row in rows
+        ]
+
+    def import_leaderboard(self, leaderboard_path):
+        """
+        기존 JSON 리더보드의 결과를 저장소로 가져오기 (저장소가 비어 있을 때 한 번만)
+
+        Returns:
+            int: 가져온 결과 수
+        """
+        if len(self) or not os.path.exists(leaderboard_path):
+            return 0
+        try:
+            with open(leaderboard_path, 'r', encoding='utf-8') as f:
+                leaderboard = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return 0
+
+        created_at = datetime.fromtimestamp(os.path.getmtime(leaderboard_path)).isoformat(timespec='seconds')
+        self.append_many(leaderboard, created_at=created_at)
+        print(f"📥 Imported {len(leaderboard)} results from {leaderboard_path} into {self.path}")
+        return len(leaderboard)
+
+    def close(self):
+        self.conn.close()
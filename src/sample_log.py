@@ -0,0 +1,342 @@
+# sample_log.py
+# 문항별 예측 로그 (Parquet)
+# 평가 중 loglikelihood 결과를 문항 단위로 묶어 문항 번호, 과목, 대분류, 정답, 고른 선택지,
+# 선택지별 loglikelihood, 정답 여부를 Parquet 파일에 row group 단위로 바로 기록
+# (메모리에는 기록 전 row group 하나 분량만 유지, 오답 분석을 위해 평가를 다시 돌릴 필요 없음)
+#
+# 저장 형식: 모델(표시 이름)마다 파일 하나 kmmlu_samples/<표시 이름>.parquet (같은 이름으로 다시 평가하면 덮어씀)
+#   체크포인트 모드에서 중단된 평가는 기록한 문항을 .<표시 이름>.parquet.partial에 남기고,
+#   이어서 평가할 때 체크포인트가 있는 과목의 문항을 거기서(없으면 이전 로그에서) 가져와 합침
+#   model, task, subject, category   문자열 (dictionary 인코딩)
+#   question_id                      과목 안 문항 번호 (lm_eval doc_id, quick-eval에서도 원래 문항 번호)
+#   answer, chosen                   정답 / 고른 선택지 (0=A, 1=B, 2=C, 3=D)
+#   loglikelihoods                   선택지별 loglikelihood (float32 리스트)
+#   correct                          정답 여부
+# 파일 메타데이터에 model_path, model_args, approximate, created 기록
+#
+# 사용 예:
+#   python sample_log.py --models SOLAR-10.7B-v1.0 --subjects biology math   (과목별 정확도)
+#   python sample_log.py --subjects accounting --errors                      (오답 목록)
+#   python sample_log.py --demo   (CPU, 작은 무작위 모델 + 합성 KMMLU)
+
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from lm_wrappers import DelegatingLM
+
+# === 전역 상수 정의 ===
+SAMPLE_LOG_DIR = 'kmmlu_samples'
+ROW_GROUP_SIZE = 4096   # row group당 문항 수 (기록 전 메모리에 모아 두는 최대 문항 수)
+OPTION_LETTERS = "ABCD"
+
+SAMPLE_SCHEMA = pa.schema([
+    ("model", pa.string()),
+    ("task", pa.string()),
+    ("subject", pa.string()),
+    ("category", pa.string()),
+    ("question_id", pa.int32()),
+    ("answer", pa.int8()),
+    ("chosen", pa.int8()),
+    ("loglikelihoods", pa.list_(pa.float32())),
+    ("correct", pa.bool_()),
+])
+
+
+def sample_log_path(label, sample_dir=SAMPLE_LOG_DIR):
+    """모델 표시 이름의 문항별 로그 파일 경로"""
+    return os.path.join(sample_dir, re.sub(r'[^\w.-]+', '_', label) + '.parquet')
+
+
+def _task_name(subject):
+    """과목 이름을 태스크명으로 변환 (예: "Criminal Law", "criminal_law" -> "kmmlu_criminal_law")"""
+    name = subject.strip().lower().replace(' ', '_').replace('-', '_')
+    return name if name.startswith('kmmlu_') else f"kmmlu_{name}"
+
+
+class SampleLogWriter:
+    """
+    문항별 예측을 Parquet 파일에 row group 단위로 기록
+    임시 파일에 쓰다가 close()에서 최종 경로로 옮기므로 중단된 평가가 이전 로그를 망가뜨리지 않음
+    평가가 실패하면 abort()로 임시 파일을 정리 (keep_partial=True이면 이어서 평가할 때 쓰도록 보관)
+    """
+
+    def __init__(self, path, model, metadata=None, row_group_size=ROW_GROUP_SIZE, keep_partial=False):
+        from evaluate_model import get_subject_category
+
+        self._get_category = get_subject_category
+        self.path = path
+        self.model = model
+        self.row_group_size = row_group_size
+        self.keep_partial = keep_partial
+        self.metadata = metadata or {}
+        self.rows = 0
+        self.row_groups = 0
+        self._columns = {name: [] for name in SAMPLE_SCHEMA.names}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # '.'으로 시작하는 파일은 pyarrow dataset이 읽지 않으므로 기록 중인 파일이 read_samples에 섞이지 않음
+        self._tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        self.partial_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.partial")
+        schema = SAMPLE_SCHEMA.with_metadata({
+            key: json.dumps(value, ensure_ascii=False)
+            for key, value in {**(metadata or {}), "created": datetime.now().isoformat(timespec='seconds')}.items()
+        })
+        self._writer = pq.ParquetWriter(self._tmp_path, schema, compression='zstd')
+
+    def add(self, task, question_id, answer, loglikelihoods):
+        """문항 하나 추가 (row group 크기가 차면 파일에 기록)"""
+        chosen = max(range(len(loglikelihoods)), key=loglikelihoods.__getitem__)
+        row = {
+            "model": self.model,
+            "task": task,
+            "subject": task.replace('kmmlu_', '').replace('_', ' ').title(),
+            "category": self._get_category(task),
+            "question_id": question_id,
+            "answer": answer,
+            "chosen": chosen,
+            "loglikelihoods": loglikelihoods,
+            "correct": chosen == answer,
+        }
+        for name, value in row.items():
+            self._columns[name].append(value)
+        self.rows += 1
+        if len(self._columns["task"]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """모아 둔 문항을 row group 하나로 기록"""
+        if not self._columns["task"]:
+            return
+        self._writer.write_table(pa.Table.from_pydict(self._columns, schema=self._writer.schema))
+        self.row_groups += 1
+        self._columns = {name: [] for name in SAMPLE_SCHEMA.names}
+
+    def resume(self, tasks):
+        """
+        이어서 평가할 때 이미 끝난 과목(체크포인트가 있는 과목)의 문항을 이전 기록에서 가져와 추가
+        중단된 평가의 기록(partial)을 먼저 찾고 없는 과목은 이전에 완성된 로그에서 찾음
+        (model_args가 다른 기록은 사용하지 않음)
+
+        Args:
+            tasks: 이미 끝난 과목 태스크명 목록
+
+        Returns:
+            int: 가져온 문항 수 (기록을 찾지 못한 과목은 경고 출력)
+        """
+        remaining = set(tasks)
+        restored = 0
+        for source in (self.partial_path, self.path):
+            if not remaining or not os.path.exists(source):
+                continue
+            metadata = pq.read_schema(source).metadata or {}
+            model_args = metadata.get(b"model_args")
+            if model_args is not None and json.loads(model_args) != self.metadata.get("model_args"):
+                continue
+            table = pq.read_table(source, filters=[("task", "in", sorted(remaining))], schema=SAMPLE_SCHEMA)
+            if table.num_rows:
+                self.flush()
+                self._writer.write_table(table.cast(self._writer.schema))
+                self.row_groups += 1
+                self.rows += table.num_rows
+                restored += table.num_rows
+                remaining -= set(table.column("task").to_pylist())
+        if remaining:
+            print(f"⚠️ Sample log has no rows for {len(remaining)} checkpointed subject(s); "
+                  f"they will be missing from {self.path}")
+        return restored
+
+    @property
+    def closed(self):
+        return self._writer is None
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp_path, self.path)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def abort(self):
+        """
+        평가 실패 시 기록 중인 파일 정리 (close() 후에는 아무것도 하지 않음)
+        keep_partial=True이면 지금까지 기록한 문항을 partial 파일로 보관, 아니면 임시 파일 삭제
+        """
+        if self._writer is None:
+            return
+        try:
+            if self.keep_partial:
+                self.flush()
+        finally:
+            self._writer.close()
+            self._writer = None
+            if self.keep_partial:
+                os.replace(self._tmp_path, self.partial_path)
+            elif os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "rows": self.rows,
+            "row_groups": self.row_groups,
+            "size_mb": os.path.getsize(self.path) / 1024 ** 2 if os.path.exists(self.path) else 0.0
+        }
+
+
+class SampleLogLM(DelegatingLM):
+    """
+    loglikelihood 결과를 문항 단위로 묶어 SampleLogWriter에 기록하는 LM 래퍼
+    lm_eval은 과목의 모든 요청을 loglikelihood 한 번으로 넘기므로 호출 하나 안에서 선택지 4개가 모두 모임
+    """
+
+    def __init__(self, lm, writer):
+        super().__init__(lm)
+        self.writer = writer
+        self.sample_indices = {}
+
+    def set_sample_indices(self, samples):
+        """
+        simple_evaluate(samples=...)로 평가할 문항 번호 지정
+        lm_eval은 samples 문항을 원래 순서대로 0부터 다시 번호를 매기므로, 기록할 때 원래 문항 번호로 되돌림
+        """
+        self.sample_indices = {task: sorted(indices) for task, indices in samples.items() if indices}
+
+    def loglikelihood(self, requests):
+        results = self.lm.loglikelihood(requests)
+
+        # 문항별 선택지 loglikelihood (정답은 KMMLU 태스크 설정의 doc_to_target과 같은 answer - 1)
+        options = defaultdict(dict)
+        answers = {}
+        for request, (logprob, _) in zip(requests, results):
+            key = (request.task_name, request.doc_id)
+            options[key][request.idx] = logprob
+            answers[key] = request.doc['answer'] - 1
+        for (task, doc_id), scores in options.items():
+            indices = self.sample_indices.get(task)
+            self.writer.add(task, indices[doc_id] if indices else doc_id, answers[(task, doc_id)],
+                            [scores[idx] for idx in sorted(scores)])
+        return results
+
+
+def read_samples(models=None, subjects=None, categories=None, columns=None, wrong_only=False,
+                 sample_dir=SAMPLE_LOG_DIR):
+    """
+    문항별 로그에서 필요한 모델/과목/컬럼만 읽음
+    조건은 row group 통계로 먼저 걸러지므로 조건에 맞지 않는 파일과 row group은 읽지 않음
+
+    Args:
+        models: 모델 표시 이름 목록 (None이면 전체)
+        subjects: 과목 목록 ("biology", "Criminal Law", "kmmlu_math" 형식 모두 가능)
+        categories: 대분류 목록 (예: ["STEM"])
+        columns: 읽을 컬럼 목록 (None이면 전체)
+        wrong_only: True이면 오답만
+
+    Returns:
+        pyarrow.Table (pandas가 필요하면 .to_pandas())
+    """
+    dataset = ds.dataset(sample_dir, format='parquet')
+    conditions = []
+    if models:
+        conditions.append(ds.field("model").isin(list(models)))
+    if subjects:
+        conditions.append(ds.field("task").isin([_task_name(subject) for subject in subjects]))
+    if categories:
+        conditions.append(ds.field("category").isin(list(categories)))
+    if wrong_only:
+        conditions.append(~ds.field("correct"))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def subject_accuracy(table):
+    """
+    read_samples 결과에서 모델/과목별 정확도 계산
+
+    Returns:
+        list: [{"model", "subject", "category", "questions", "accuracy"}, ...] (모델, 과목 순)
+    """
+    grouped = table.group_by(["model", "subject", "category"]).aggregate([
+        ("correct", "count"), ("correct", "mean")
+    ])
+    rows = [
+        {"model": row["model"], "subject": row["subject"], "category": row["category"],
+         "questions": row["correct_count"], "accuracy": row["correct_mean"]}
+        for row in grouped.to_pylist()
+    ]
+    return sorted(rows, key=lambda row: (row["model"], row["subject"]))
+
+
+def print_samples(models=None, subjects=None, categories=None, errors=False, limit=50, sample_dir=SAMPLE_LOG_DIR):
+    """과목별 정확도 표 또는 오답 목록 출력"""
+    from tabulate import tabulate
+
+    if errors:
+        table = read_samples(models, subjects, categories, wrong_only=True, sample_dir=sample_dir,
+                             columns=["model", "subject", "question_id", "answer", "chosen", "loglikelihoods"])
+        rows = [
+            [row["model"], row["subject"], row["question_id"], OPTION_LETTERS[row["answer"]],
+             OPTION_LETTERS[row["chosen"]], " ".join(f"{ll:.2f}" for ll in row["loglikelihoods"])]
+            for row in table.slice(0, limit).to_pylist()
+        ]
+        print(tabulate(rows, headers=["Model", "Subject", "Question", "Answer", "Chosen", "Loglikelihoods (A-D)"],
+                       tablefmt="grid"))
+        print(f"❌ {table.num_rows} wrong answer(s)" + (f" (showing first {limit})" if table.num_rows > limit else ""))
+    else:
+        table = read_samples(models, subjects, categories, sample_dir=sample_dir,
+                             columns=["model", "subject", "category", "correct"])
+        rows = [[row["model"], row["subject"], row["category"], row["questions"], f"{row['accuracy']:.2%}"]
+                for row in subject_accuracy(table)]
+        print(tabulate(rows, headers=["Model", "Subject", "Category", "Questions", "Accuracy"], tablefmt="grid"))
+
+
+def _demo():
+    """CPU에서 작은 무작위 모델 + 합성 KMMLU로 로그를 기록하고 다시 읽어 확인 (임시 폴더에 결과 저장)"""
+    import tempfile
+
+    import evaluate_model as em
+    from synthetic import make_offline_evaluate, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    em.simple_evaluate = make_offline_evaluate(n_questions=4)
+    os.chdir(tempfile.mkdtemp())
+
+    result_data = em.evaluate_model(model_dir, f"pretrained={model_dir},dtype=float32", "tiny-llama",
+                                    batch_size=16, device="cpu", sample_log_dir=SAMPLE_LOG_DIR)
+    table = read_samples(columns=["correct"])
+    print(f"\n📝 {table.num_rows} questions logged, accuracy from log "
+          f"{sum(table.column('correct').to_pylist()) / table.num_rows:.2%} (reported {result_data['overall']:.2%})")
+    print_samples(subjects=["biology", "accounting"])
+    print_samples(subjects=["biology"], errors=True, limit=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect per-question KMMLU prediction logs")
+    parser.add_argument("--models", nargs="+", help="model display names (default: all)")
+    parser.add_argument("--subjects", nargs="+", help="subjects (e.g. biology criminal_law)")
+    parser.add_argument("--categories", nargs="+", help="categories (e.g. STEM HUMSS)")
+    parser.add_argument("--errors", action="store_true", help="list wrong answers instead of per-subject accuracy")
+    parser.add_argument("--limit", type=int, default=50, help="max wrong answers to show")
+    parser.add_argument("--dir", default=SAMPLE_LOG_DIR, help="sample log directory")
+    parser.add_argument("--demo", action="store_true", help="CPU demo with a tiny random model and synthetic KMMLU")
+    args = parser.parse_args()
+
+    if args.demo:
+        _demo()
+    else:
+        print_samples(args.models, args.subjects, args.categories, errors=args.errors, limit=args.limit,
+                      sample_dir=args.dir)
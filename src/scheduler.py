@@ -0,0 +1,302 @@
+# scheduler.py
+# 여러 worker 프로세스에 모델 평가 작업을 나눠 실행하는 병렬 스케줄러
+# 각 worker는 GPU 하나 또는 CPU(스레드 수 제한)에 고정되고,
+# 부모 프로세스가 예상 메모리 사용량에 맞춰 작업을 배정하고 결과/실패/재시도를 관리
+
+import multiprocessing as mp
+import os
+import queue
+import re
+import time
+import traceback
+
+from evaluate_model import parse_model_config
+
+# === 정밀도별 파라미터당 바이트 수 ===
+BYTES_PER_PARAM = {
+    'float32': 4.0,
+    'float16': 2.0,
+    'bfloat16': 2.0,
+    '8bit': 1.0,
+    '4bit': 0.5,
+    'int8-dynamic': 1.0,
+    'unknown': 2.0
+}
+MEMORY_OVERHEAD = 1.2        # 가중치 외 버퍼/단편화 여유
+ACTIVATION_MEMORY_GB = 2.0   # 채점 시 활성값/KV 캐시 여유
+
+DEFAULT_MAX_RETRIES = 1
+
+
+def estimate_num_params(model_name):
+    """
+    모델 이름에서 파라미터 수(단위: 십억) 추정 (예: "EXAONE-Deep-7.8B" → 7.8)
+
+    Returns:
+        float 또는 None (이름에 크기가 없는 경우)
+    """
+    matches = re.findall(r'(\d+(?:\.\d+)?)\s*[Bb](?![a-zA-Z])', model_name.split('/')[-1])
+    return float(matches[-1]) if matches else None
+
+
+def estimate_memory_gb(model_name, model_args, num_params_b=None):
+    """
+    정밀도와 파라미터 수로 평가에 필요한 메모리(GB) 추정
+
+    Returns:
+        float 또는 None (파라미터 수를 알 수 없는 경우)
+    """
+    num_params_b = num_params_b or estimate_num_params(model_name)
+    if num_params_b is None:
+        return None
+    bytes_per_param = BYTES_PER_PARAM.get(parse_model_config(model_args), BYTES_PER_PARAM['unknown'])
+    return num_params_b * bytes_per_param * MEMORY_OVERHEAD + ACTIVATION_MEMORY_GB
+
+
+def gpu_workers():
+    """사용 가능한 GPU마다 worker 하나 (메모리 용량은 장치 전체 메모리)"""
+    import torch
+
+    return [
+        {"device": f"cuda:{i}", "memory_gb": torch.cuda.get_device_properties(i).total_memory / 1024 ** 3}
+        for i in range(torch.cuda.device_count())
+    ]
+
+
+def cpu_workers(num_workers, threads_per_worker=None, memory_gb=None):
+    """
+    CPU worker 목록 (스레드 수와 메모리를 worker 수로 나눠 배정)
+
+    Args:
+        threads_per_worker: worker별 intra-op 스레드 수 (None이면 코어 수 / worker 수)
+        memory_gb: 전체 메모리 (None이면 시스템 전체 메모리)
+    """
+    if memory_gb is None:
+        import psutil
+        memory_gb = psutil.virtual_memory().total / 1024 ** 3
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+    return [
+        {"device": "cpu", "memory_gb": memory_gb / num_workers, "num_threads": threads_per_worker}
+        for _ in range(num_workers)
+    ]
+
+
+def _pin_worker(worker):
+    """
+    worker 프로세스를 장치에 고정 (torch import 전에 호출해야 함)
+
+    Returns:
+        str: 이 프로세스 안에서 사용할 device 문자열
+    """
+    device = worker["device"]
+    if device.startswith("cuda:"):
+        # 지정한 GPU만 보이게 하여 이 프로세스에서는 항상 cuda:0으로 사용
+        os.environ["CUDA_VISIBLE_DEVICES"] = device.split(":", 1)[1]
+        return "cuda:0"
+
+    if worker.get("num_threads"):
+        from cpu_backend import configure_cpu_threads
+        configure_cpu_threads(worker["num_threads"])
+    return device
+
+
+def _worker_main(worker_id, worker, inbox, outbox, job_fn):
+    """worker 프로세스: inbox에서 작업을 받아 실행하고 결과를 outbox로 보냄 (None을 받으면 종료)"""
+    from reporting import flush_reports
+
+    device = _pin_worker(worker)
+    while True:
+        job = inbox.get()
+        if job is None:
+            # multiprocessing worker는 atexit를 실행하지 않으므로 남은 보고/저장 작업을 직접 처리
+            flush_reports()
+            break
+        try:
+            result = job_fn(**job["kwargs"], device=device)
+            outbox.put(("done", worker_id, job["id"], result))
+        except Exception as e:
+            outbox.put(("failed", worker_id, job["id"], f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+def make_jobs(models, **common_kwargs):
+    """
+    batch_evaluate.py의 models 목록을 작업 목록으로 변환
+
+    Args:
+        models: [(모델경로, 로딩설정, 표시이름), ...]
+        common_kwargs: 모든 작업에 공통으로 넘길 인자
+    """
+    jobs = []
+    for i, (model_name, model_args, label) in enumerate(models):
+        jobs.append({
+            "id": i,
+            "label": label,
+            "memory_gb": estimate_memory_gb(model_name, model_args),
+            "kwargs": {"model_name": model_name, "model_args": model_args, "label": label, **common_kwargs},
+            "attempts": 0
+        })
+    return jobs
+
+
+def _fits(job, worker):
+    """작업의 예상 메모리가 worker에 들어가는지 (추정 불가한 작업은 가장 큰 worker에서만 실행)"""
+    if job["memory_gb"] is None:
+        return True
+    return job["memory_gb"] <= worker["memory_gb"]
+
+
+def run_parallel(jobs, workers, job_fn, max_retries=DEFAULT_MAX_RETRIES, poll_interval=1.0):
+    """
+    작업 목록을 worker 풀에서 병렬 실행
+
+    배정 규칙: 쉬고 있는 worker에게 그 worker 메모리에 들어가는 작업 중 가장 큰 작업을 먼저 배정
+    (메모리 추정이 없는 작업은 가장 큰 worker가 맡음). 실패한 작업은 max_retries번까지 다시 대기열에 넣고,
+    worker 프로세스가 비정상 종료되면 진행 중이던 작업을 다시 넣고 worker를 새로 띄움
+
+    Args:
+        jobs: make_jobs()의 반환값
+        workers: gpu_workers() 또는 cpu_workers()의 반환값
+        job_fn: job_fn(**kwargs, device=...) - worker에서 실행할 최상위 함수 (pickle 가능해야 함)
+
+    Returns:
+        dict: {작업 라벨: {"status": "ok"|"failed", "result"|"error": ..., "attempts": ..., "worker": ...}}
+    """
+    ctx = mp.get_context("spawn")
+    outbox = ctx.Queue()
+    largest = max(worker["memory_gb"] for worker in workers)
+
+    # 메모리 추정이 큰 작업부터 (추정 불가 작업은 가장 큰 것으로 취급)
+    pending = sorted(jobs, key=lambda job: job["memory_gb"] if job["memory_gb"] is not None else float("inf"),
+                     reverse=True)
+    outcomes = {}
+
+    # 어떤 worker에도 들어가지 않는 작업은 바로 실패 처리
+    for job in list(pending):
+        if job["memory_gb"] is not None and job["memory_gb"] > largest:
+            pending.remove(job)
+            outcomes[job["label"]] = {
+                "status": "failed",
+                "error": f"Estimated {job['memory_gb']:.1f}GB exceeds every worker (max {largest:.1f}GB)",
+                "attempts": 0,
+                "worker": None
+            }
+            print(f"❌ {job['label']}: does not fit any worker ({job['memory_gb']:.1f}GB)")
+
+    def start_worker(worker_id):
+        inbox = ctx.Queue()
+        process = ctx.Process(target=_worker_main, args=(worker_id, workers[worker_id], inbox, outbox, job_fn),
+                              daemon=True)
+        process.start()
+        return {"process": process, "inbox": inbox, "job": None}
+
+    pool = {worker_id: start_worker(worker_id) for worker_id in range(len(workers))}
+    jobs_by_id = {job["id"]: job for job in jobs}
+
+    def dispatch():
+        for worker_id, state in pool.items():
+            if state["job"] is not None:
+                continue
+            worker = workers[worker_id]
+            for job in pending:
+                # 추정 불가 작업은 가장 큰 worker에만 배정
+                if _fits(job, worker) and (job["memory_gb"] is not None or worker["memory_gb"] == largest):
+                    pending.remove(job)
+                    job["attempts"] += 1
+                    state["job"] = job["id"]
+                    state["inbox"].put(job)
+                    print(f"▶️ [{worker['device']} #{worker_id}] {job['label']} (attempt {job['attempts']})")
+                    break
+
+    def handle_failure(job, worker_id, error, trace=None):
+        if job["attempts"] <= max_retries:
+            print(f"🔁 {job['label']} failed on worker #{worker_id}, retrying: {error}")
+            pending.append(job)
+        else:
+            outcomes[job["label"]] = {"status": "failed", "error": error, "traceback": trace,
+                                      "attempts": job["attempts"], "worker": workers[worker_id]["device"]}
+            print(f"❌ {job['label']} failed after {job['attempts']} attempt(s): {error}")
+
+    try:
+        dispatch()
+        while pending or any(state["job"] is not None for state in pool.values()):
+            try:
+                message = outbox.get(timeout=poll_interval)
+            except queue.Empty:
+                message = None
+
+            if message is not None:
+                kind, worker_id, job_id = message[:3]
+                job = jobs_by_id[job_id]
+                pool[worker_id]["job"] = None
+                if kind == "done":
+                    outcomes[job["label"]] = {"status": "ok", "result": message[3], "attempts": job["attempts"],
+                                              "worker": workers[worker_id]["device"]}
+                    print(f"✅ {job['label']} done on {workers[worker_id]['device']} #{worker_id}")
+                else:
+                    handle_failure(job, worker_id, message[3], message[4])
+
+            # 비정상 종료된 worker 확인 (예: CUDA 오류로 프로세스가 죽은 경우)
+            for worker_id, state in pool.items():
+                if not state["process"].is_alive():
+                    job_id = state["job"]
+                    pool[worker_id] = start_worker(worker_id)
+                    if job_id is not None:
+                        job = jobs_by_id[job_id]
+                        handle_failure(job, worker_id, f"worker exited with code {state['process'].exitcode}")
+
+            # 남은 작업을 실행할 수 있는 worker가 없으면 중단 (모든 worker가 쉬는데 배정 불가)
+            dispatch()
+            if pending and all(state["job"] is None for state in pool.values()):
+                for job in pending:
+                    outcomes[job["label"]] = {"status": "failed", "error": "No worker can run this job",
+                                              "attempts": job["attempts"], "worker": None}
+                pending.clear()
+    finally:
+        for state in pool.values():
+            if state["process"].is_alive():
+                state["inbox"].put(None)
+        for state in pool.values():
+            state["process"].join(timeout=30)
+            if state["process"].is_alive():
+                state["process"].terminate()
+
+    return outcomes
+
+
+def _demo_job(model_name, model_args, label, device, seconds=0.5, fail_times=0):
+    """CPU 확인용 작업: 잠시 계산하고 fail_times번까지는 일부러 실패"""
+    import torch
+
+    marker = os.path.join(os.environ.get("SCHEDULER_DEMO_DIR", "."), f"{label}.attempts")
+    attempts = int(open(marker).read()) + 1 if os.path.exists(marker) else 1
+    with open(marker, "w") as f:
+        f.write(str(attempts))
+    if attempts <= fail_times:
+        raise RuntimeError(f"simulated failure {attempts}/{fail_times}")
+
+    start = time.time()
+    x = torch.randn(256, 256)
+    while time.time() - start < seconds:
+        x = torch.tanh(x @ x)
+    return {"model": label, "device": device, "threads": torch.get_num_threads(), "pid": os.getpid()}
+
+
+if __name__ == "__main__":
+    # CPU 전용 환경에서 worker 3개로 스케줄러 확인
+    import tempfile
+
+    os.environ["SCHEDULER_DEMO_DIR"] = tempfile.mkdtemp()
+    demo_models = [
+        ("demo/Tiny-0.5B", "pretrained=demo/Tiny-0.5B,dtype=float16", "tiny-a"),
+        ("demo/Small-1.5B", "pretrained=demo/Small-1.5B,load_in_8bit=True", "small-b"),
+        ("demo/Medium-7B", "pretrained=demo/Medium-7B,dtype=float16", "medium-c"),
+        ("demo/Huge-70B", "pretrained=demo/Huge-70B,dtype=float16", "huge-d"),
+        ("demo/Unknown", "pretrained=demo/Unknown,dtype=float16", "unknown-e")
+    ]
+    demo_jobs = make_jobs(demo_models)
+    demo_jobs[1]["kwargs"]["fail_times"] = 1  # 한 번 실패 후 재시도에서 성공
+
+    outcomes = run_parallel(demo_jobs, cpu_workers(3, threads_per_worker=1, memory_gb=60), _demo_job)
+    for label, outcome in outcomes.items():
+        print(f"{label:10s} {outcome['status']:7s} attempts={outcome['attempts']} "
+              f"{outcome.get('result') or outcome.get('error')}")
@@ -0,0 +1,511 @@
+# scoring.py
+# KMMLU loglikelihood 채점 엔진
+# lm_eval HFLM을 상속하여 _loglikelihood_tokens만 교체 (토큰화/요청 처리 흐름은 HFLM 그대로 사용)
+
+import copy
+import os
+import time
+
+import torch
+import torch.nn.functional as F
+from tqdm import tqdm
+from transformers import DynamicCache
+
+from lm_eval.models.huggingface import HFLM
+
+# === 채점 모드 ===
+# default:      HFLM 기본 경로 (한 토큰 선택지는 HFLM logits_cache가 같은 context를 묶어 처리)
+# per_option:   선택지(A/B/C/D)마다 별도로 context 전체를 forward (logits_cache 비활성화)
+# single_pass:  context를 한 번만 forward하고 마지막 위치의 다음 토큰 분포에서 선택지 글자를 함께 읽음
+# prefix_cache: 공통 few-shot prefix의 KV 캐시를 한 번 계산하고 각 문항의 나머지 부분만 forward
+SCORING_MODES = ['default', 'per_option', 'single_pass', 'prefix_cache']
+
+DEFAULT_MIN_PREFIX_TOKENS = 32  # 이보다 짧은 공통 prefix는 캐시하지 않음
+
+# === 정밀도별 기본 배치 토큰 예산 (배치 행 수 × 가장 긴 행의 길이) ===
+# 8bit(bitsandbytes)는 int8 matmul의 중간 활성값 때문에 float16보다 작은 배치에서 OOM이 나는 경우가 많음
+DEFAULT_TOKEN_BUDGETS = {
+    'float32': 16384,
+    'float16': 32768,
+    'bfloat16': 32768,
+    '8bit': 16384,
+    '4bit': 24576,
+    'int8-dynamic': 16384,
+    'unknown': 16384
+}
+
+
+def token_budget_for(precision, overrides=None):
+    """정밀도별 배치 토큰 예산 (overrides에 있으면 우선 사용)"""
+    budgets = {**DEFAULT_TOKEN_BUDGETS, **(overrides or {})}
+    return budgets.get(precision, budgets['unknown'])
+
+
+class _PrefixNode:
+    """공통 prefix 트리(radix tree)의 노드: depth는 루트부터의 토큰 수"""
+
+    __slots__ = ['depth', 'parent', 'children', 'units', 'seq', 'count', 'anchor']
+
+    def __init__(self, depth, parent, seq):
+        self.depth = depth
+        self.parent = parent
+        self.children = []
+        self.units = []      # 이 노드에서 끝나는 채점 단위
+        self.seq = seq       # 이 노드를 지나는 아무 토큰 시퀀스 (구간 토큰 참조용)
+        self.count = 0       # 하위 트리의 채점 단위 수
+        self.anchor = False  # KV 캐시를 계산해 둘 노드인지
+
+
+def _common_prefix_length(a, b, limit):
+    """두 토큰 시퀀스의 공통 prefix 길이 (limit까지만 비교)"""
+    n = min(len(a), len(b), limit)
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def build_prefix_tree(keys):
+    """
+    정렬된 토큰 시퀀스들로 압축 prefix 트리 구성 (인접 시퀀스의 공통 prefix만으로 구성)
+
+    Args:
+        keys: [(토큰 시퀀스, 단위 번호)] 토큰 시퀀스 기준 정렬 상태
+
+    Returns:
+        _PrefixNode: 루트 노드
+    """
+    root = _PrefixNode(0, None, ())
+    stack = [root]
+    prev = ()
+    for seq, unit in keys:
+        lcp = _common_prefix_length(prev, seq, len(seq))
+
+        last = None
+        while stack[-1].depth > lcp:
+            last = stack.pop()
+        if stack[-1].depth < lcp:
+            # 직전 시퀀스와 갈라지는 지점에 내부 노드 삽입
+            parent = stack[-1]
+            node = _PrefixNode(lcp, parent, last.seq)
+            parent.children.remove(last)
+            parent.children.append(node)
+            node.children.append(last)
+            last.parent = node
+            stack.append(node)
+
+        if len(seq) > lcp:
+            leaf = _PrefixNode(len(seq), stack[-1], seq)
+            stack[-1].children.append(leaf)
+            stack.append(leaf)
+        stack[-1].units.append(unit)
+        prev = seq
+    return root
+
+
+class ScoringHFLM(HFLM):
+    """
+    채점 모드를 선택할 수 있는 HFLM
+
+    prefix_cache 모드에서는 요청들의 공통 prefix 트리를 만들고,
+    두 개 이상의 문항이 공유하는 충분히 긴 prefix마다 KV 캐시를 한 번만 계산하여
+    그 아래 문항들은 나머지 토큰만 forward (결과는 HFLM 기본 경로와 동일)
+    
+    max_batch_tokens를 지정하면 고정 batch_size 대신 길이순으로 정렬한 요청을
+    (행 수 × 가장 긴 행 길이) ≤ max_batch_tokens가 되도록 묶어 배치 구성
+    """
+
+    def __init__(self, *args, scoring_mode='default', min_prefix_tokens=DEFAULT_MIN_PREFIX_TOKENS,
+                 max_batch_tokens=None, dynamic_int8=False, **kwargs):
+        if scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring_mode '{scoring_mode}'. Choose from {SCORING_MODES}")
+        if scoring_mode == 'per_option':
+            kwargs['logits_cache'] = False
+        super().__init__(*args, **kwargs)
+        if dynamic_int8:
+            # CPU 전용: nn.Linear 동적 int8 양자화 (model_args에 dynamic_int8=True)
+            from cpu_backend import quantize_dynamic_int8
+            self._model = quantize_dynamic_int8(self._model)
+        self.scoring_mode = scoring_mode
+        self.min_prefix_tokens = int(min_prefix_tokens)
+        self.max_batch_tokens = int(max_batch_tokens) if max_batch_tokens else None
+        self.prompt_cache = None  # prompt_cache.PromptTokenCache (설정하면 토큰화 결과를 캐시에서 재사용)
+        self.scoring_stats = self._new_scoring_stats()
+
+    def _new_scoring_stats(self):
+        """채점 통계 초기값 (평가마다 새로 시작)"""
+        return {
+            "mode": self.scoring_mode,
+            "requests": 0,
+            "questions": 0,                 # 서로 다른 context 수 (= 문항 수)
+            "input_tokens": 0,              # 요청의 context + continuation 토큰 수 합
+            "forward_units": 0,
+            "prefill_tokens_baseline": 0,   # 캐시 없이 forward 했을 토큰 수
+            "prefill_tokens_computed": 0,   # 실제로 forward 한 토큰 수
+            "prefill_tokens_saved": 0,
+            "cached_prefixes": 0,
+            "forward_passes_saved": 0,      # single_pass: 선택지 요청 수 - context forward 수
+            "scoring_seconds": 0.0,
+            "batching": {
+                "max_batch_tokens": self.max_batch_tokens,
+                "batches": 0,
+                "rows": 0,
+                "real_tokens": 0,     # padding을 제외한 입력 토큰 수
+                "padded_tokens": 0,   # 배치 행 수 × 배치 내 최대 길이의 합
+                "min_batch_size": None,
+                "max_batch_size": 0
+            }
+        }
+
+    def configure(self, batch_size=None, scoring_mode=None, max_batch_tokens=None):
+        """
+        이미 로드된 모델을 다른 평가 설정으로 재사용 (model_server의 모델 캐시에서 꺼낸 경우)
+        채점 통계와 프롬프트 캐시 연결은 새 평가를 위해 초기화
+        """
+        scoring_mode = scoring_mode or self.scoring_mode
+        if scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring_mode '{scoring_mode}'. Choose from {SCORING_MODES}")
+        self.scoring_mode = scoring_mode
+        self.logits_cache = scoring_mode != 'per_option'
+        self.max_batch_tokens = int(max_batch_tokens) if max_batch_tokens else None
+        if isinstance(batch_size, int):
+            self.batch_size_per_gpu = batch_size
+        self.prompt_cache = None
+        self.scoring_stats = self._new_scoring_stats()
+
+    def _encode_pair(self, context, continuation):
+        if self.prompt_cache is None:
+            return super()._encode_pair(context, continuation)
+        cached = self.prompt_cache.get(context, continuation)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        context_enc, continuation_enc = super()._encode_pair(context, continuation)
+        self.prompt_cache.put(context, continuation, context_enc, continuation_enc,
+                              seconds=time.perf_counter() - start)
+        return context_enc, continuation_enc
+
+    def _loglikelihood_tokens(self, requests, disable_tqdm=False, override_bs=None):
+        start = time.time()
+        if self.scoring_mode == 'prefix_cache' and self.backend == 'causal':
+            results = self._prefix_cached_loglikelihood(requests, disable_tqdm)
+        elif self.scoring_mode == 'single_pass' and self.backend == 'causal':
+            results = self._single_pass_loglikelihood(requests, disable_tqdm)
+        elif self.max_batch_tokens and self.backend == 'causal':
+            results = self._budgeted_loglikelihood(requests, disable_tqdm)
+        else:
+            results = super()._loglikelihood_tokens(requests, disable_tqdm=disable_tqdm, override_bs=override_bs)
+        self.scoring_stats["requests"] += len(requests)
+        self.scoring_stats["questions"] += len({request_str[0] for request_str, _, _ in requests})
+        self.scoring_stats["input_tokens"] += sum(len(context) + len(continuation) for _, context, continuation in requests)
+        self.scoring_stats["scoring_seconds"] += time.time() - start
+        return results
+
+    def _scoring_batch_size(self):
+        """고정 배치 크기 (auto인 경우 max_batch_size 사용)"""
+        return self.batch_size if isinstance(self.batch_size, int) else self.max_batch_size
+
+    def _batches(self, lengths, prefix_length=0):
+        """
+        길이 내림차순으로 정렬된 행들을 배치로 나눔
+
+        Args:
+            lengths: 각 행의 입력 길이 (내림차순 정렬)
+            prefix_length: 모든 행이 공유하는 KV 캐시 길이 (토큰 예산 계산에 포함)
+
+        Yields:
+            (시작, 끝) 인덱스
+        """
+        batching = self.scoring_stats["batching"]
+        start = 0
+        while start < len(lengths):
+            if self.max_batch_tokens:
+                # 첫 행이 가장 길므로 배치 폭은 lengths[start]로 결정됨
+                size = max(1, self.max_batch_tokens // (lengths[start] + prefix_length))
+            else:
+                size = self._scoring_batch_size()
+            end = min(start + size, len(lengths))
+
+            batching["batches"] += 1
+            batching["rows"] += end - start
+            batching["real_tokens"] += sum(lengths[start:end])
+            batching["padded_tokens"] += (end - start) * lengths[start]
+            batching["min_batch_size"] = min(batching["min_batch_size"] or end - start, end - start)
+            batching["max_batch_size"] = max(batching["max_batch_size"], end - start)
+            yield start, end
+            start = end
+
+    def _budgeted_loglikelihood(self, requests, disable_tqdm=False):
+        """
+        HFLM 기본 경로를 토큰 예산 배치로 실행
+        배치마다 HFLM._loglikelihood_tokens를 그 배치 크기로 호출하므로 채점 방식은 HFLM과 동일
+        """
+        # HFLM Collator와 같은 단위로 묶음: logits_cache가 켜져 있으면 context + continuation[:-1]이 같은 요청은 한 행
+        units = {}
+        for i, (_, context_enc, continuation_enc) in enumerate(requests):
+            tokens = (context_enc + continuation_enc)[-(self.max_length + 1):]
+            key = tuple(tokens[:-1]) if self.logits_cache else i
+            units.setdefault(key, (len(tokens) - 1, []))[1].append(i)
+
+        ordered = sorted(units.values(), key=lambda unit: unit[0], reverse=True)
+        results = [None] * len(requests)
+        pbar = tqdm(total=len(requests), disable=(disable_tqdm or (self.rank != 0)),
+                    desc="Running loglikelihood requests (token budget)")
+
+        fixed_batch_size = self.batch_size_per_gpu
+        try:
+            for start, end in self._batches([length for length, _ in ordered]):
+                indices = [i for _, unit_indices in ordered[start:end] for i in unit_indices]
+                self.batch_size_per_gpu = end - start
+                batch_results = super()._loglikelihood_tokens([requests[i] for i in indices], disable_tqdm=True)
+                for i, result in zip(indices, batch_results):
+                    results[i] = result
+                pbar.update(len(indices))
+        finally:
+            self.batch_size_per_gpu = fixed_batch_size
+
+        pbar.close()
+        return results
+
+    def _forward(self, input_ids, past_key_values=None):
+        """KV 캐시를 이어 붙여 forward (HFLM._model_call과 같은 no_grad/autocast 설정)"""
+        with (
+            torch.no_grad(),
+            torch.autocast(
+                device_type=self.device.type,
+                dtype=self.mixed_precision_dtype,
+                enabled=self.mixed_precision_dtype is not None,
+            ),
+        ):
+            return self.model(input_ids=input_ids, past_key_values=past_key_values, use_cache=True)
+
+    def _extend_cache(self, cache, tokens):
+        """부모 prefix 캐시를 복사하고 tokens만큼 이어서 계산한 새 캐시 반환"""
+        cache = copy.deepcopy(cache) if cache is not None else DynamicCache()
+        input_ids = torch.tensor([tokens], dtype=torch.long, device=self.device)
+        return self._forward(input_ids, past_key_values=cache).past_key_values
+
+    def _single_pass_loglikelihood(self, requests, disable_tqdm=False):
+        """
+        한 토큰짜리 선택지(" A", " B", ...)를 context 한 번의 forward로 함께 채점
+        마지막 context 위치의 log-softmax만 계산하므로 [batch, seq, vocab] 전체 softmax가 필요 없음
+        여러 토큰 선택지는 HFLM 기본 경로로 처리
+        """
+        stats = self.scoring_stats
+        groups = {}    # context 토큰 → [(요청 번호, 선택지 토큰)]
+        fallback = []  # 여러 토큰 선택지 요청 번호
+        for i, (_, context_enc, continuation_enc) in enumerate(requests):
+            if len(continuation_enc) == 1:
+                # HFLM과 같은 왼쪽 잘라내기: (context + continuation)[-(max_length + 1):][:-1]
+                groups.setdefault(tuple(context_enc[-self.max_length:]), []).append((i, continuation_enc[0]))
+            else:
+                fallback.append(i)
+
+        results = [None] * len(requests)
+        if fallback:
+            fallback_results = super()._loglikelihood_tokens([requests[i] for i in fallback], disable_tqdm=disable_tqdm)
+            for i, result in zip(fallback, fallback_results):
+                results[i] = result
+
+        # 길이 내림차순 정렬: 배치 내 padding 최소화
+        contexts = sorted(groups, key=len, reverse=True)
+        pbar = tqdm(total=len(requests) - len(fallback), disable=(disable_tqdm or (self.rank != 0)),
+                    desc="Running loglikelihood requests (single pass)")
+
+        for start, end in self._batches([len(context) for context in contexts]):
+            batch = contexts[start:end]
+            input_ids = torch.zeros((len(batch), len(batch[0])), dtype=torch.long, device=self.device)
+            for row, context in enumerate(batch):
+                # 오른쪽 padding: causal attention이므로 실제 토큰의 logits에는 영향 없음
+                input_ids[row, :len(context)] = torch.tensor(context, dtype=torch.long, device=self.device)
+
+            logits = self._model_call(input_ids)
+            last_positions = torch.tensor([len(context) - 1 for context in batch], device=self.device)
+            log_probs = F.log_softmax(
+                logits[torch.arange(len(batch), device=self.device), last_positions],
+                dim=-1, dtype=self.softmax_dtype
+            )  # [batch, vocab]
+            greedy = log_probs.argmax(dim=-1).tolist()
+
+            for row, context in enumerate(batch):
+                stats["prefill_tokens_computed"] += len(context)
+                stats["forward_units"] += 1
+                stats["forward_passes_saved"] += len(groups[context]) - 1
+                for request_idx, token in groups[context]:
+                    results[request_idx] = (float(log_probs[row, token]), greedy[row] == token)
+                    pbar.update(1)
+
+        pbar.close()
+        return results
+
+    def _prefix_cached_loglikelihood(self, requests, disable_tqdm=False):
+        stats = self.scoring_stats
+
+        # 1. 채점 단위 구성: 입력 토큰(context + continuation[:-1])이 같은 요청은 한 번만 forward
+        #    (HFLM의 logits_cache와 같이 선택지 A/B/C/D가 한 단위로 묶임)
+        units = {}
+        for i, (_, context_enc, continuation_enc) in enumerate(requests):
+            tokens = (context_enc + continuation_enc)[-(self.max_length + 1):]
+            inp = tuple(tokens[:-1])
+            cont = tokens[-len(continuation_enc):]
+            if inp not in units:
+                units[inp] = []
+                stats["prefill_tokens_baseline"] += len(inp)
+            units[inp].append((i, cont))
+
+        unit_inputs = list(units)
+        # prefix로 공유 가능한 길이: 모든 continuation 채점 위치(마지막 context 토큰)보다 앞까지
+        shareable = [len(inp) - max(len(cont) for _, cont in units[inp]) for inp in unit_inputs]
+
+        # 2. 공통 prefix 트리 구성 후 KV 캐시를 둘 노드(anchor) 선택
+        keys = sorted((inp[:limit], u) for u, (inp, limit) in enumerate(zip(unit_inputs, shareable)))
+        root = build_prefix_tree(keys)
+
+        order = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children)
+        for node in reversed(order):
+            node.count = len(node.units) + sum(child.count for child in node.children)
+            node.anchor = node is not root and node.count >= 2 and node.depth >= self.min_prefix_tokens
+
+        results = [None] * len(requests)
+        pbar = tqdm(total=len(requests), disable=(disable_tqdm or (self.rank != 0)),
+                    desc="Running loglikelihood requests (prefix cache)")
+
+        # 3. 깊이 우선으로 anchor 캐시를 계산하며, 각 단위는 가장 가까운 anchor 캐시에서 나머지만 forward
+        #    stack 항목: (노드, 가장 가까운 anchor 노드, 그 anchor의 캐시)
+        stack = [(root, root, None)]
+        pending = {}  # anchor 노드 id → 그 anchor에서 채점할 단위 목록
+        anchors = {id(root): (root, None)}
+        while stack:
+            node, anchor, cache = stack.pop()
+            if node.anchor:
+                cache = self._extend_cache(cache, node.seq[anchor.depth:node.depth])
+                stats["prefill_tokens_computed"] += node.depth - anchor.depth
+                stats["cached_prefixes"] += 1
+                anchor = node
+                anchors[id(node)] = (node, cache)
+            pending.setdefault(id(anchor), []).extend(node.units)
+
+            # anchor 하위 탐색이 끝나는 즉시 채점하여 캐시를 오래 들고 있지 않음
+            if node.anchor or node is root:
+                stack.append((None, anchor, None))  # 이 anchor의 하위 탐색 완료 표시
+            stack.extend((child, anchor, cache) for child in node.children)
+
+            while stack and stack[-1][0] is None:
+                _, done_anchor, _ = stack.pop()
+                done_node, done_cache = anchors.pop(id(done_anchor))
+                self._score_units(
+                    [unit_inputs[u] for u in pending.pop(id(done_anchor), [])],
+                    units, done_node.depth, done_cache, results, pbar
+                )
+
+        pbar.close()
+        stats["prefill_tokens_saved"] = stats["prefill_tokens_baseline"] - stats["prefill_tokens_computed"]
+        return results
+
+    def _score_units(self, inputs, units, depth, cache, results, pbar):
+        """같은 prefix 캐시를 공유하는 단위들의 나머지 토큰을 배치로 forward하여 채점"""
+        if not inputs:
+            return
+        stats = self.scoring_stats
+        # 길이 내림차순 정렬: 배치 내 padding 최소화
+        inputs = sorted(inputs, key=len, reverse=True)
+
+        for start, end in self._batches([len(inp) - depth for inp in inputs], prefix_length=depth):
+            batch = inputs[start:end]
+            remainders = [inp[depth:] for inp in batch]
+            padded_len = len(remainders[0])
+            input_ids = torch.zeros((len(batch), padded_len), dtype=torch.long, device=self.device)
+            for row, rem in enumerate(remainders):
+                # 오른쪽 padding: causal attention이므로 실제 토큰의 logits에는 영향 없음
+                input_ids[row, :len(rem)] = torch.tensor(rem, dtype=torch.long, device=self.device)
+
+            batch_cache = None
+            if cache is not None:
+                batch_cache = copy.deepcopy(cache)
+                batch_cache.batch_repeat_interleave(len(batch))
+            logits = self._forward(input_ids, past_key_values=batch_cache).logits
+
+            for row, (inp, rem) in enumerate(zip(batch, remainders)):
+                stats["prefill_tokens_computed"] += len(rem)
+                stats["forward_units"] += 1
+                for request_idx, cont in units[inp]:
+                    end = len(rem)
+                    cont_logits = F.log_softmax(
+                        logits[row, end - len(cont):end], dim=-1, dtype=self.softmax_dtype
+                    )
+                    cont_toks = torch.tensor(cont, dtype=torch.long, device=self.device)
+                    is_greedy = bool((cont_logits.argmax(dim=-1) == cont_toks).all())
+                    logprob = float(cont_logits.gather(1, cont_toks.unsqueeze(-1)).sum())
+                    results[request_idx] = (logprob, is_greedy)
+                    pbar.update(1)
+
+
+def padding_summary(batching):
+    """배치 통계에서 padding 효율(실제 토큰 / padding 포함 토큰)과 실효 배치 크기 계산"""
+    if not batching["batches"]:
+        return {"padding_efficiency": None, "effective_batch_size": None}
+    return {
+        "padding_efficiency": batching["real_tokens"] / batching["padded_tokens"],
+        "effective_batch_size": {
+            "min": batching["min_batch_size"],
+            "mean": batching["rows"] / batching["batches"],
+            "max": batching["max_batch_size"]
+        }
+    }
+
+
+def compare_scoring_modes(pretrained, requests, modes=('per_option', 'single_pass'), batch_size=16, device="cpu",
+                          tolerance=1e-4, **lm_kwargs):
+    """
+    같은 요청을 여러 채점 모드로 실행하여 결과 일치 여부와 속도 비교
+
+    Returns:
+        dict: {모드: {"seconds": ..., "speedup": ..., "max_abs_diff": ..., "stats": ...}}
+    """
+    report = {}
+    reference = None
+    for mode in modes:
+        lm = ScoringHFLM(pretrained=pretrained, batch_size=batch_size, device=device, scoring_mode=mode, **lm_kwargs)
+        start = time.time()
+        results = lm.loglikelihood(requests, disable_tqdm=True)
+        seconds = time.time() - start
+
+        if reference is None:
+            reference = (results, seconds)
+        max_diff = max(abs(a[0] - b[0]) for a, b in zip(results, reference[0]))
+        report[mode] = {
+            "seconds": seconds,
+            "questions_per_sec": lm.scoring_stats["questions"] / seconds if seconds else 0.0,
+            "speedup": reference[1] / seconds if seconds else 0.0,
+            "max_abs_diff": max_diff,
+            "matches": max_diff <= tolerance and [a[1] for a in results] == [b[1] for b in reference[0]],
+            "stats": dict(lm.scoring_stats),
+            **padding_summary(lm.scoring_stats["batching"])
+        }
+        del lm
+    return report
+
+
+if __name__ == "__main__":
+    # CPU에서 작은 무작위 모델로 채점 모드 비교
+    import tempfile
+    from synthetic import make_synthetic_docs, make_synthetic_requests, make_tiny_model
+
+    model_dir = make_tiny_model(os.path.join(tempfile.gettempdir(), 'kmmlu_tiny_llama'))
+    docs = make_synthetic_docs(subjects=["math", "law", "health"], n_questions=50)
+    requests = make_synthetic_requests(docs)
+
+    report = compare_scoring_modes(model_dir, requests, modes=SCORING_MODES, dtype="float32")
+    budget_report = compare_scoring_modes(model_dir, requests, modes=SCORING_MODES, dtype="float32",
+                                          max_batch_tokens=token_budget_for('float32'))
+    report.update({f"{mode}+budget": info for mode, info in budget_report.items()})
+    for mode, info in report.items():
+        print(f"{mode:21s} {info['seconds']:.2f}s  {info['questions_per_sec']:.1f} q/s  speedup {info['speedup']:.2f}x  "
+              f"match={info['matches']}  prefill computed={info['stats']['prefill_tokens_computed']:,}  "
+              f"saved={info['stats']['prefill_tokens_saved']:,}  "
+              f"padding eff={'N/A' if info['padding_efficiency'] is None else format(info['padding_efficiency'], '.1%')}")
@@ -0,0 +1,267 @@
+# shards.py
+# 한 모델의 KMMLU 평가를 과목 단위로 나눠 여러 노드에서 실행하고, 결과를 하나로 합치는 도구
+# 각 노드는 shard 하나(과목 일부)를 평가하여 JSON으로 저장하고,
+# merge 단계에서 모든 shard를 검증한 뒤 evaluate_model()과 같은 형태의 result_data를 만듦
+#
+# 사용 예 (노드 4개):
+#   노드 i:  python shards.py run --model upstage/SOLAR-10.7B-v1.0 \
+#                --model-args pretrained=upstage/SOLAR-10.7B-v1.0,load_in_8bit=True \
+#                --label SOLAR-10.7B-v1.0 --num-shards 4 --shard-index i
+#   병합:    python shards.py merge kmmlu_shards/SOLAR-10.7B-v1.0/*.json --save
+
+import json
+import os
+import socket
+import time
+from datetime import datetime
+
+from evaluate_model import (
+    aggregate_subject_scores, create_lm, format_time, list_kmmlu_subject_tasks, model_output_dir,
+    parse_model_config, rank_subjects, store_result
+)
+from reporting import get_pipeline, save_unsaved_result
+
+# === 전역 상수 정의 ===
+SHARD_DIR = 'kmmlu_shards'  # shard 결과 저장 폴더
+
+
+def shard_subjects(subject_tasks, num_shards, shard_index):
+    """
+    과목 태스크 중 shard_index번째 shard에 속하는 과목 목록
+    대분류별로 정렬된 과목을 차례로 돌려가며 배정하므로 shard마다 과목 수와 대분류 구성이 고르게 나뉨
+
+    Args:
+        subject_tasks: {태스크명: 대분류} (list_kmmlu_subject_tasks()의 반환값)
+        num_shards: 전체 shard 수
+        shard_index: 0부터 시작하는 shard 번호
+
+    Returns:
+        list: 이 shard에서 평가할 태스크명 목록
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+    ordered = sorted(subject_tasks, key=lambda task: (subject_tasks[task], task))
+    return ordered[shard_index::num_shards]
+
+
+def shard_path(output_dir, label, num_shards, shard_index):
+    """shard 결과 파일 경로 (예: kmmlu_shards/SOLAR-10.7B-v1.0/shard-1-of-4.json)"""
+    return os.path.join(model_output_dir(output_dir, label), f"shard-{shard_index}-of-{num_shards}.json")
+
+
+def evaluate_shard(model_name, model_args, label, num_shards, shard_index, batch_size=16, device="cuda:0",
+                   num_fewshot=5, output_dir=SHARD_DIR, lm=None):
+    """
+    shard 하나에 속한 과목들을 평가하고 결과를 JSON 파일로 저장
+
+    lm: 이미 로드된 모델 (지정하지 않으면 create_lm으로 생성)
+
+    Returns:
+        str: 저장된 shard 파일 경로
+    """
+    subject_tasks = list_kmmlu_subject_tasks()
+    tasks = shard_subjects(subject_tasks, num_shards, shard_index)
+
+    print(f"\n{'='*60}")
+    print(f"Evaluating shard {shard_index + 1}/{num_shards}: {label}")
+    print(f"Subjects: {len(tasks)}/{len(subject_tasks)}")
+    print(f"{'='*60}")
+
+    # evaluate_model의 simple_evaluate (lm_eval은 평가를 시작할 때 import하므로 merge는 lm_eval 없이 실행)
+    from evaluate_model import simple_evaluate
+
+    start_time = time.time()
+    lm = lm or create_lm(model_args, batch_size=batch_size, device=device)
+    results = simple_evaluate(model=lm, tasks=tasks, num_fewshot=num_fewshot, log_samples=False)
+    elapsed_seconds = time.time() - start_time
+
+    shard = make_shard(model_name, model_args, label, num_shards, shard_index, subject_tasks, tasks, results,
+                       elapsed_seconds, batch_size, num_fewshot)
+
+    path = shard_path(output_dir, label, num_shards, shard_index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(shard, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    print(f"💾 Shard saved to {path} ({format_time(elapsed_seconds)})")
+    return path
+
+
+def make_shard(model_name, model_args, label, num_shards, shard_index, subject_tasks, tasks, results,
+               elapsed_seconds, batch_size, num_fewshot=5):
+    """
+    simple_evaluate 결과로 shard 딕셔너리 생성 (merge_shards의 입력 형식)
+
+    Args:
+        subject_tasks: {태스크명: 대분류} (전체 과목)
+        tasks: 이 shard에서 평가한 태스크명 목록
+        results: simple_evaluate의 반환값 (results / n-samples)
+
+    Returns:
+        dict: shard 결과
+    """
+    return {
+        "model": label,
+        "model_path": model_name,
+        "model_args": model_args,
+        "precision": parse_model_config(model_args),
+        "num_fewshot": num_fewshot,
+        "num_shards": num_shards,
+        "shard_index": shard_index,
+        "all_tasks": sorted(subject_tasks),
+        "subjects": {
+            task: {
+                "acc": results['results'][task]['acc,none'],
+                "n": results['n-samples'][task]['effective'],
+                "category": subject_tasks[task]
+            }
+            for task in tasks
+        },
+        "elapsed_seconds": elapsed_seconds,
+        "batch_size": batch_size,
+        "host": socket.gethostname(),
+        "finished_at": datetime.now().isoformat(timespec='seconds')
+    }
+
+
+def load_shards(paths):
+    """shard JSON 파일들 불러오기"""
+    shards = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            shards.append(json.load(f))
+    return shards
+
+
+def validate_shards(shards):
+    """
+    shard들이 같은 평가 설정이고 과목을 빠짐없이 한 번씩만 덮는지 확인
+
+    Raises:
+        ValueError: 설정 불일치, shard 번호 중복/누락, 과목 중복/누락
+    """
+    if not shards:
+        raise ValueError("No shards to merge")
+
+    first = shards[0]
+    for key in ("model", "model_args", "num_fewshot", "num_shards", "all_tasks"):
+        values = {json.dumps(shard.get(key), sort_keys=True) for shard in shards}
+        if len(values) > 1:
+            raise ValueError(f"Shards disagree on '{key}': {sorted(values)}")
+
+    indices = [shard['shard_index'] for shard in shards]
+    duplicated = sorted({i for i in indices if indices.count(i) > 1})
+    if duplicated:
+        raise ValueError(f"Duplicate shard index: {duplicated}")
+    missing = sorted(set(range(first['num_shards'])) - set(indices))
+    if missing:
+        raise ValueError(f"Missing shard index: {missing} (of {first['num_shards']})")
+
+    seen = {}
+    for shard in shards:
+        for task in shard['subjects']:
+            if task in seen:
+                raise ValueError(f"Subject '{task}' appears in shard {seen[task]} and shard {shard['shard_index']}")
+            seen[task] = shard['shard_index']
+
+    missing_tasks = sorted(set(first['all_tasks']) - set(seen))
+    if missing_tasks:
+        raise ValueError(f"Missing subjects ({len(missing_tasks)}): {missing_tasks}")
+    unknown_tasks = sorted(set(seen) - set(first['all_tasks']))
+    if unknown_tasks:
+        raise ValueError(f"Unknown subjects: {unknown_tasks}")
+
+
+def merge_shards(shards):
+    """
+    shard 결과를 검증하고 evaluate_model()의 result_data와 같은 형태로 합침
+    전체/대분류 점수는 과목별 표본 수 가중 평균 (aggregate_subject_scores)
+
+    Args:
+        shards: load_shards()의 반환값
+
+    Returns:
+        dict: result_data (shards 항목에 shard별 실행 정보 추가)
+    """
+    validate_shards(shards)
+    shards = sorted(shards, key=lambda shard: shard['shard_index'])
+
+    subject_results = {}
+    for shard in shards:
+        subject_results.update(shard['subjects'])
+
+    scores = aggregate_subject_scores(subject_results)
+    all_subjects_ranked = rank_subjects({task: info['acc'] for task, info in subject_results.items()})
+    best_subject = all_subjects_ranked[-1]
+    worst_subject = all_subjects_ranked[0]
+
+    # shard들은 동시에 실행되므로 걸린 시간은 가장 오래 걸린 shard 기준
+    wall_seconds = max(shard['elapsed_seconds'] for shard in shards)
+    batch_sizes = {shard['batch_size'] for shard in shards}
+
+    first = shards[0]
+    return {
+        "model": first['model'],
+        "model_path": first['model_path'],
+        "overall": scores['overall'],
+        "stem": scores['stem'],
+        "humss": scores['humss'],
+        "applied": scores['applied'],
+        "other": scores['other'],
+        "best": {
+            "name": best_subject['name'],
+            "score": best_subject['score']
+        },
+        "worst": {
+            "name": worst_subject['name'],
+            "score": worst_subject['score']
+        },
+        "all_subjects_ranked": all_subjects_ranked,
+        "elapsed_time": format_time(wall_seconds),
+        "batch_size": batch_sizes.pop() if len(batch_sizes) == 1 else "mixed",
+        "precision": first['precision'],
+        "shards": {
+            "num_shards": first['num_shards'],
+            "elapsed_seconds": [shard['elapsed_seconds'] for shard in shards],
+            "hosts": [shard.get('host') for shard in shards],
+            "total_gpu_seconds": sum(shard['elapsed_seconds'] for shard in shards)
+        }
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sharded KMMLU evaluation")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="evaluate one shard of the subjects")
+    run_parser.add_argument("--model", required=True, help="model path (e.g. upstage/SOLAR-10.7B-v1.0)")
+    run_parser.add_argument("--model-args", required=True, help="lm_eval model_args string")
+    run_parser.add_argument("--label", required=True)
+    run_parser.add_argument("--num-shards", type=int, required=True)
+    run_parser.add_argument("--shard-index", type=int, required=True)
+    run_parser.add_argument("--batch-size", type=int, default=16)
+    run_parser.add_argument("--device", default="cuda:0")
+    run_parser.add_argument("--output-dir", default=SHARD_DIR)
+
+    merge_parser = subparsers.add_parser("merge", help="merge shard files into one result")
+    merge_parser.add_argument("paths", nargs="+", help="shard JSON files")
+    merge_parser.add_argument("--save", action="store_true", help="save to the CSV/JSON leaderboard")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        evaluate_shard(args.model, args.model_args, args.label, args.num_shards, args.shard_index,
+                       batch_size=args.batch_size, device=args.device, output_dir=args.output_dir)
+    else:
+        result_data = merge_shards(load_shards(args.paths))
+        print(f"✅ Merged {result_data['shards']['num_shards']} shards: {result_data['model']}")
+        print(f"Overall: {result_data['overall']:.2%} (wall time {result_data['elapsed_time']})")
+        print(f"  STEM: {result_data['stem']:.2%}  HUMSS: {result_data['humss']:.2%}  "
+              f"Applied: {result_data['applied']:.2%}  Other: {result_data['other']:.2%}")
+        if args.save:
+            # evaluate_model과 같이 보고 스레드에서 저장 (실패하면 재시도 후 미저장 결과로 보관, 종료 전 flush)
+            get_pipeline().submit(f"store_result({result_data['model']})", store_result, result_data,
+                                  fallback=save_unsaved_result)
@@ -0,0 +1,367 @@
+# significance.py
+# 문항별 정답 여부(sample_log의 Parquet 로그)로 모델 간 점수 차이의 유의성을 계산하는 paired bootstrap 엔진
+# - 모든 모델이 같은 재표집 인덱스 행렬을 공유하므로 두 모델의 점수 차이는 같은 문항 표본에서 비교됨 (paired)
+# - 재표집은 과목별 층화: 과목 안에서만 문항을 복원 추출하여 과목별 문항 수(= lm_eval의 표본 수 가중)를 유지
+# - 재표집 인덱스를 문항별 추출 횟수로 바꾼 뒤 (모델 x 문항) 정답 행렬과 행렬곱 한 번으로 모든 모델의 과목별 정답 수를 계산
+#   (재표집을 chunk_size개씩 나눠 처리하므로 메모리는 모델 수 x 과목 수 x 재표집 수에 비례)
+# - 모델 쌍별 점수 차이의 신뢰구간과 p-value (전체 / 대분류 / 과목), Holm 보정 후 유의성 순위
+#   순위 = 1 + 이 모델보다 유의하게 점수가 높은 모델 수 (유의한 차이가 없는 모델들은 같은 순위)
+#
+# 사용 예:
+#   python significance.py ranks                               (전체 점수 유의성 순위)
+#   python significance.py ranks --level STEM                  (대분류 / 과목: --level kmmlu_math)
+#   python significance.py pair SOLAR-10.7B-v1.0 EXAONE-Deep-7.8B   (두 모델의 전체/대분류/과목별 차이)
+#   python significance.py demo                                (합성 정답 행렬로 규모별 속도 확인)
+
+import time
+
+import numpy as np
+
+from sample_log import SAMPLE_LOG_DIR
+
+# === 전역 상수 정의 ===
+DEFAULT_RESAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_ALPHA = 0.05
+DEFAULT_CHUNK_SIZE = 256    # 한 번에 만드는 재표집 수 (인덱스 행렬 크기 = chunk_size x 문항 수)
+MIN_COVERAGE = 0.99         # 전체 문항 중 이 비율 이상을 평가한 모델만 비교 (quick-eval 로그 제외)
+
+
+def bootstrap_p_value(observed_delta, deltas):
+    """
+    재표집 차이의 표준오차로 구한 양측 p-value (정규 근사)
+    재표집 비율로 세는 방식은 1/재표집 수보다 작은 값을 낼 수 없어 모델 쌍이 많을 때 다중 비교 보정을 통과하지 못함
+
+    Args:
+        observed_delta: 관측 차이 (배열 가능)
+        deltas: 재표집 차이 (마지막 축이 재표집)
+    """
+    from scipy.special import erfc
+
+    standard_error = np.std(deltas, axis=-1, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.abs(observed_delta) / standard_error
+    # 재표집 차이가 모두 같으면(두 모델의 정답이 같은 경우 등) 차이가 0일 때만 p=1
+    z = np.where(standard_error > 0, z, np.where(np.asarray(observed_delta) == 0, 0.0, np.inf))
+    return erfc(z / np.sqrt(2))
+
+
+def holm_adjust(p_values):
+    """Holm-Bonferroni 보정 p-value (입력과 같은 순서)"""
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    if not m:
+        return p_values
+    order = np.argsort(p_values)
+    adjusted = np.minimum(1.0, np.maximum.accumulate(p_values[order] * (m - np.arange(m))))
+    result = np.empty(m)
+    result[order] = adjusted
+    return result
+
+
+def load_correctness(models=None, sample_dir=SAMPLE_LOG_DIR, min_coverage=MIN_COVERAGE):
+    """
+    문항별 로그에서 (모델 x 문항) 정답 행렬 구성 (모든 모델이 평가한 문항만 사용)
+
+    Args:
+        models: 모델 표시 이름 목록 (None이면 로그가 있는 전체)
+        min_coverage: 전체 문항 중 평가한 비율이 이보다 낮은 모델은 제외 (quick-eval 등 일부 문항만 평가한 로그)
+
+    Returns:
+        dict: {"models": [...], "correct": (모델 x 문항) bool 배열, "tasks": 문항별 태스크명, "categories": 문항별 대분류}
+    """
+    import pandas as pd
+
+    from sample_log import read_samples
+
+    df = read_samples(models=models, columns=["model", "task", "category", "question_id", "correct"],
+                      sample_dir=sample_dir).to_pandas()
+    if df.empty:
+        return {"models": [], "correct": np.zeros((0, 0), dtype=bool), "tasks": np.array([]),
+                "categories": np.array([])}
+
+    model_codes, model_names = pd.factorize(df["model"], sort=True)
+    task_codes, task_names = pd.factorize(df["task"], sort=True)
+    question_ids = df["question_id"].to_numpy(dtype=np.int64)
+    question_codes, question_keys = pd.factorize(task_codes * (int(question_ids.max()) + 1) + question_ids, sort=True)
+
+    correct = np.zeros((len(model_names), len(question_keys)), dtype=bool)
+    present = np.zeros_like(correct)
+    correct[model_codes, question_codes] = df["correct"].to_numpy(dtype=bool)
+    present[model_codes, question_codes] = True
+
+    coverage = present.mean(axis=1)
+    keep = coverage >= min_coverage
+    for name, fraction in zip(model_names[~keep], coverage[~keep]):
+        print(f"⚠️ Skipping {name}: sample log covers only {fraction:.1%} of questions")
+    common = present[keep].all(axis=0)
+
+    # 문항 번호 -> 태스크 / 대분류
+    question_tasks = np.empty(len(question_keys), dtype=np.int64)
+    question_tasks[question_codes] = task_codes
+    question_categories = np.empty(len(question_keys), dtype=object)
+    question_categories[question_codes] = df["category"].to_numpy(dtype=object)
+    return {
+        "models": list(model_names[keep]),
+        "correct": correct[keep][:, common],
+        "tasks": np.asarray(task_names, dtype=object)[question_tasks[common]],
+        "categories": question_categories[common]
+    }
+
+
+class PairedBootstrap:
+    """
+    과목별 층화 paired bootstrap
+
+    models: 모델 이름 목록, correct: (모델 x 문항) 정답 여부, tasks / categories: 문항별 태스크명 / 대분류
+    생성 시 모든 재표집의 모델별·과목별 정답 수(subject_correct: 모델 x 과목 x 재표집)를 계산해 두고,
+    점수 수준(level)은 "overall", 대분류 이름(예: "STEM"), 태스크명(예: "kmmlu_math")으로 지정
+    """
+
+    def __init__(self, models, correct, tasks, categories, n_resamples=DEFAULT_RESAMPLES, seed=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        tasks, categories = np.asarray(tasks, dtype=object), np.asarray(categories, dtype=object)
+        # 과목별로 문항을 모아 과목마다 연속된 열 구간이 되도록 정렬
+        order = np.argsort(tasks, kind='stable')
+        self.models = list(models)
+        self.correct = np.asarray(correct, dtype=bool)[:, order]
+        self.subjects, starts, sizes = np.unique(tasks[order], return_index=True, return_counts=True)
+        self.subject_categories = categories[order][starts]
+        self.subject_sizes = sizes
+        self.n_resamples = n_resamples
+        self.index = {name: i for i, name in enumerate(self.models)}
+
+        self.subject_observed = np.stack([self.correct[:, start:start + size].sum(axis=1)
+                                          for start, size in zip(starts, sizes)], axis=1).astype(np.float64)
+        self.subject_correct = self._resample(starts, sizes, seed, chunk_size)
+
+    @classmethod
+    def from_sample_logs(cls, models=None, sample_dir=SAMPLE_LOG_DIR, min_coverage=MIN_COVERAGE, **kwargs):
+        """문항별 로그로 생성 (모든 모델이 평가한 문항만 사용)"""
+        data = load_correctness(models, sample_dir, min_coverage)
+        return cls(data["models"], data["correct"], data["tasks"], data["categories"], **kwargs)
+
+    def _resample(self, starts, sizes, seed, chunk_size):
+        """
+        재표집별 모델·과목 정답 수 계산
+        chunk마다 (재표집 x 문항) 인덱스 행렬 하나를 만들어 모든 모델이 공유하고,
+        문항별 추출 횟수 행렬로 바꿔 과목 구간마다 (모델 x 문항) @ (문항 x 재표집) 행렬곱
+        """
+        rng = np.random.default_rng(seed)
+        n_models, n_questions = self.correct.shape
+        column_starts = np.repeat(starts, sizes)
+        column_ends = column_starts + np.repeat(sizes, sizes)
+        correct = self.correct.astype(np.float32)
+        subject_correct = np.empty((n_models, len(sizes), self.n_resamples), dtype=np.float32)
+
+        for first in range(0, self.n_resamples, chunk_size):
+            count = min(chunk_size, self.n_resamples - first)
+            # 열 q 자리에는 q가 속한 과목 안의 문항만 뽑힘
+            indices = rng.integers(column_starts, column_ends, size=(count, n_questions))
+            indices += np.arange(count)[:, None] * n_questions
+            weights = np.bincount(indices.ravel(), minlength=count * n_questions).reshape(count, n_questions)
+            weights = weights.astype(np.float32)
+            for s, (start, size) in enumerate(zip(starts, sizes)):
+                subject_correct[:, s, first:first + count] = correct[:, start:start + size] @ weights[:, start:start + size].T
+        return subject_correct
+
+    def levels(self):
+        """점수 수준 목록 ("overall", 대분류, 태스크명)"""
+        return ["overall", *sorted(set(self.subject_categories)), *self.subjects]
+
+    def scores(self, level="overall"):
+        """
+        수준별 관측 점수와 재표집 점수
+
+        Returns:
+            tuple: (모델별 점수 (M,), 재표집 점수 (M, 재표집 수))
+        """
+        if level == "overall":
+            mask = np.ones(len(self.subjects), dtype=bool)
+        elif level in set(self.subject_categories):
+            mask = self.subject_categories == level
+        elif level in set(self.subjects):
+            mask = self.subjects == level
+        else:
+            raise ValueError(f"Unknown level '{level}' (use 'overall', a category or a task name)")
+        total = self.subject_sizes[mask].sum()
+        return (self.subject_observed[:, mask].sum(axis=1) / total,
+                self.subject_correct[:, mask].sum(axis=1, dtype=np.float64) / total)
+
+    def pairwise(self, level="overall", confidence=DEFAULT_CONFIDENCE):
+        """
+        모든 모델 쌍의 점수 차이(행 모델 - 열 모델), 신뢰구간, 양측 p-value
+
+        신뢰구간은 재표집 차이의 백분위수, p-value는 재표집 차이의 표준오차로 구함 (bootstrap_p_value)
+
+        Returns:
+            dict: {"level", "models", "diff", "ci_low", "ci_high", "p_value"} (각각 모델 x 모델 배열)
+        """
+        observed, resampled = self.scores(level)
+        n = len(self.models)
+        tail = (1 - confidence) / 2 * 100
+        diff = observed[:, None] - observed[None, :]
+        ci_low, ci_high, p_value = np.zeros((n, n)), np.zeros((n, n)), np.ones((n, n))
+        for i in range(n - 1):
+            deltas = resampled[i] - resampled[i + 1:]
+            low, high = np.percentile(deltas, [tail, 100 - tail], axis=1)
+            p = bootstrap_p_value(diff[i, i + 1:], deltas)
+            ci_low[i, i + 1:], ci_high[i, i + 1:] = low, high
+            ci_low[i + 1:, i], ci_high[i + 1:, i] = -high, -low
+            p_value[i, i + 1:] = p_value[i + 1:, i] = p
+        return {"level": level, "models": self.models, "diff": diff, "ci_low": ci_low, "ci_high": ci_high,
+                "p_value": p_value}
+
+    def compare(self, model_a, model_b, level="overall", confidence=DEFAULT_CONFIDENCE):
+        """
+        두 모델의 점수 차이 (model_a - model_b)
+
+        Returns:
+            dict: {"level", "diff", "ci_low", "ci_high", "p_value"}
+        """
+        observed, resampled = self.scores(level)
+        a, b = self.index[model_a], self.index[model_b]
+        tail = (1 - confidence) / 2 * 100
+        deltas = resampled[a] - resampled[b]
+        diff = observed[a] - observed[b]
+        low, high = np.percentile(deltas, [tail, 100 - tail])
+        return {"level": level, "diff": float(diff), "ci_low": float(low), "ci_high": float(high),
+                "p_value": float(bootstrap_p_value(diff, deltas))}
+
+    def rank_groups(self, level="overall", alpha=DEFAULT_ALPHA, confidence=DEFAULT_CONFIDENCE, correction="holm"):
+        """
+        유의성 순위 (순위 = 1 + 이 모델보다 유의하게 높은 모델 수)
+
+        Args:
+            correction: "holm"이면 모든 쌍의 p-value를 Holm 보정, None이면 보정하지 않음
+
+        Returns:
+            list: [{"model", "score", "ci_low", "ci_high", "rank", "better_than"}, ...] (점수 내림차순)
+                  ci는 모델 점수의 재표집 신뢰구간, better_than은 이 모델이 유의하게 앞서는 모델 수
+        """
+        pairs = self.pairwise(level, confidence)
+        observed, resampled = self.scores(level)
+        n = len(self.models)
+        upper = np.triu_indices(n, 1)
+        p_value = pairs["p_value"].copy()
+        if correction == "holm":
+            p_value[upper] = holm_adjust(p_value[upper])
+            p_value.T[upper] = p_value[upper]
+        elif correction is not None:
+            raise ValueError(f"correction must be 'holm' or None, got {correction!r}")
+        better = (p_value < alpha) & (pairs["diff"] > 0)  # better[i, j]: i가 j보다 유의하게 높음
+
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.percentile(resampled, [tail, 100 - tail], axis=1)
+        groups = [
+            {"model": model, "score": float(observed[i]), "ci_low": float(low[i]), "ci_high": float(high[i]),
+             "rank": int(better[:, i].sum()) + 1, "better_than": int(better[i].sum())}
+            for i, model in enumerate(self.models)
+        ]
+        return sorted(groups, key=lambda group: (-group["score"], group["model"]))
+
+
+def leaderboard_rank_groups(models, sample_dir=SAMPLE_LOG_DIR, n_resamples=DEFAULT_RESAMPLES, alpha=DEFAULT_ALPHA):
+    """
+    리더보드 표용 유의성 순위 (문항별 로그가 있는 모델이 2개 미만이면 빈 결과)
+
+    Returns:
+        tuple: ({모델: rank_groups 항목}, PairedBootstrap 또는 None)
+    """
+    import os
+
+    if not os.path.isdir(sample_dir):
+        return {}, None
+    bootstrap = PairedBootstrap.from_sample_logs(models, sample_dir, n_resamples=n_resamples)
+    if len(bootstrap.models) < 2:
+        return {}, None
+    return {group["model"]: group for group in bootstrap.rank_groups(alpha=alpha)}, bootstrap
+
+
+def print_rank_groups(bootstrap, level="overall", alpha=DEFAULT_ALPHA):
+    """유의성 순위 표 출력"""
+    from tabulate import tabulate
+
+    groups = bootstrap.rank_groups(level, alpha=alpha)
+    rows = [[f"#{group['rank']}", group["model"][:40], f"{group['score']:.2%}",
+             f"{group['ci_low']:.2%}-{group['ci_high']:.2%}", group["better_than"]] for group in groups]
+    print(f"\n📊 Significance ranks ({level}, {len(bootstrap.models)} models, {bootstrap.correct.shape[1]:,} questions, "
+          f"{bootstrap.n_resamples} resamples, Holm-adjusted alpha {alpha})")
+    print(tabulate(rows, headers=["Rank", "Model", "Score", "95% CI", "Beats"], tablefmt="grid"))
+
+
+def print_pair(bootstrap, model_a, model_b, alpha=DEFAULT_ALPHA):
+    """두 모델의 전체 / 대분류 / 과목별 차이 표 출력 (과목은 유의한 것만)"""
+    from tabulate import tabulate
+
+    rows = []
+    for level in bootstrap.levels():
+        result = bootstrap.compare(model_a, model_b, level)
+        if level.startswith("kmmlu_") and result["p_value"] >= alpha:
+            continue
+        rows.append([level, f"{result['diff'] * 100:+.1f}pp",
+                     f"{result['ci_low'] * 100:+.1f} ~ {result['ci_high'] * 100:+.1f}pp", f"{result['p_value']:.4f}",
+                     "✅" if result["p_value"] < alpha else ""])
+    print(f"\n🔍 {model_a} - {model_b} (paired bootstrap, {bootstrap.n_resamples} resamples, unadjusted p)")
+    print(tabulate(rows, headers=["Level", "Diff", "95% CI", "p", f"p<{alpha}"], tablefmt="grid"))
+
+
+def _demo(n_models=200, n_questions=35000, n_resamples=1000):
+    """합성 정답 행렬(모델별 실력 차이 + 문항 난이도)로 엔진 속도와 순위 확인"""
+    from evaluate_model import KMMLU_SUBJECT_MAPPING
+
+    rng = np.random.default_rng(0)
+    subjects = [(f"kmmlu_{subject}", category) for category, names in KMMLU_SUBJECT_MAPPING.items()
+                for subject in names]
+    subject_index = rng.integers(0, len(subjects), n_questions)
+    tasks = np.array([subjects[i][0] for i in subject_index], dtype=object)
+    categories = np.array([subjects[i][1] for i in subject_index], dtype=object)
+    ability = np.sort(rng.normal(0, 0.6, n_models))[::-1]
+    difficulty = rng.normal(0, 1, n_questions)
+    correct = rng.random((n_models, n_questions)) < 1 / (1 + np.exp(difficulty[None, :] - ability[:, None]))
+    models = [f"model-{i:03d}" for i in range(n_models)]
+
+    start = time.time()
+    bootstrap = PairedBootstrap(models, correct, tasks, categories, n_resamples=n_resamples)
+    resample_seconds = time.time() - start
+    start = time.time()
+    groups = bootstrap.rank_groups()
+    rank_seconds = time.time() - start
+
+    print(f"✅ {n_models} models x {n_questions:,} questions x {n_resamples} resamples: "
+          f"resampling {resample_seconds:.1f}s, {n_models * (n_models - 1) // 2:,} pairs ranked in {rank_seconds:.1f}s")
+    print(f"   {len(set(group['rank'] for group in groups))} distinct ranks; top 5: "
+          + ", ".join(f"{group['model']} #{group['rank']} ({group['score']:.2%})" for group in groups[:5]))
+    small = PairedBootstrap(models[:8], correct[:8], tasks, categories, n_resamples=n_resamples)
+    print_rank_groups(small)
+    print_pair(small, models[0], models[1])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Paired bootstrap significance for KMMLU model comparisons")
+    parser.add_argument("--sample-dir", default=SAMPLE_LOG_DIR)
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ranks_parser = subparsers.add_parser("ranks", help="significance-aware ranks from the sample logs")
+    ranks_parser.add_argument("--models", nargs="+", help="model labels (default: all logged models)")
+    ranks_parser.add_argument("--level", default="overall", help="overall, a category (e.g. STEM) or a task name")
+    pair_parser = subparsers.add_parser("pair", help="compare two models overall, per category and per subject")
+    pair_parser.add_argument("model_a")
+    pair_parser.add_argument("model_b")
+    demo_parser = subparsers.add_parser("demo", help="timing on a synthetic correctness matrix")
+    demo_parser.add_argument("--models", type=int, default=200)
+    demo_parser.add_argument("--questions", type=int, default=35000)
+    args = parser.parse_args()
+
+    if args.command == "demo":
+        _demo(args.models, args.questions, args.resamples)
+    elif args.command == "ranks":
+        print_rank_groups(PairedBootstrap.from_sample_logs(args.models, args.sample_dir, n_resamples=args.resamples),
+                          args.level, args.alpha)
+    else:
+        print_pair(PairedBootstrap.from_sample_logs([args.model_a, args.model_b], args.sample_dir,
+                                                    n_resamples=args.resamples),
+                   args.model_a, args.model_b, args.alpha)
@@ -0,0 +1,210 @@
+# synthetic.py
+# GPU/네트워크 없이 평가 파이프라인을 확인하기 위한 작은 HF causal LM과 KMMLU 형태의 합성 데이터
+# 모든 함수는 CPU에서 오프라인으로 동작
+
+import os
+import random
+from collections import defaultdict
+
+from evaluate_model import KMMLU_SUBJECT_MAPPING, aggregate_subject_scores
+
+CHOICES = ["A", "B", "C", "D"]
+
+
+def render_question(doc):
+    """lm_eval KMMLU doc_to_text와 같은 형식으로 문항 렌더링"""
+    return f"{doc['question'].strip()}\nA. {doc['A']}\nB. {doc['B']}\nC. {doc['C']}\nD. {doc['D']}\n정답："
+
+
+def make_synthetic_docs(subjects=None, n_questions=20, n_dev=5, seed=0):
+    """
+    KMMLU와 같은 필드(question, A-D, answer 1~4)를 갖는 합성 문항 생성
+
+    Returns:
+        dict: {과목명: {"dev": [...], "test": [...]}}
+    """
+    rnd = random.Random(seed)
+    subjects = subjects or [s for subjects in KMMLU_SUBJECT_MAPPING.values() for s in subjects]
+    words = ["다음", "중", "옳은", "것은", "무엇인가", "설명", "으로", "가장", "적절한", "계산", "값", "법",
+             "system", "energy", "rate", "value", "process", "model"]
+
+    def make_doc(subject, i):
+        question = f"[{subject}] " + " ".join(rnd.choice(words) for _ in range(rnd.randint(8, 40))) + f" {i}?"
+        doc = {"question": question, "answer": rnd.randint(1, 4)}
+        for letter in CHOICES:
+            doc[letter] = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 6)))
+        return doc
+
+    return {
+        subject: {
+            "dev": [make_doc(subject, i) for i in range(n_dev)],
+            "test": [make_doc(subject, i) for i in range(n_questions)]
+        }
+        for subject in subjects
+    }
+
+
+def build_fewshot_context(docs, doc, rnd, num_fewshot=5):
+    """lm_eval 기본 sampler처럼 dev 문항을 무작위 순서로 뽑아 few-shot context 구성"""
+    shots = rnd.sample(docs["dev"], min(num_fewshot, len(docs["dev"])))
+    prefix = "".join(f"{render_question(shot)} {CHOICES[shot['answer'] - 1]}\n\n" for shot in shots)
+    return prefix + render_question(doc)
+
+
+def make_synthetic_requests(docs_by_subject, num_fewshot=5, seed=1234):
+    """
+    합성 문항으로 lm_eval과 같은 형태의 loglikelihood 요청(Instance) 생성
+    문항마다 선택지 A/B/C/D 네 개의 요청을 만듦
+    """
+    from lm_eval.api.instance import Instance
+
+    requests = []
+    for subject, docs in docs_by_subject.items():
+        rnd = random.Random(seed)
+        task_name = f"kmmlu_{subject}"
+        for doc_id, doc in enumerate(docs["test"]):
+            context = build_fewshot_context(docs, doc, rnd, num_fewshot)
+            for idx, letter in enumerate(CHOICES):
+                requests.append(Instance(
+                    request_type="loglikelihood",
+                    doc=doc,
+                    arguments=(context, f" {letter}"),
+                    idx=idx,
+                    metadata=(task_name, doc_id, 1)
+                ))
+    return requests
+
+
+def make_offline_evaluate(n_questions=8, n_dev=5, seed=0):
+    """
+    lm_eval simple_evaluate 대신 쓸 수 있는 오프라인 KMMLU 평가 함수 생성
+    lm_eval의 실제 KMMLU 과목 태스크 이름(태스크 인덱스만 사용)에 합성 문항을 붙여
+    같은 형태의 결과(results / n-samples, 대분류·전체 그룹 점수는 표본 수 가중 평균)를 반환
+    samples={태스크명: [문항 번호, ...]}를 주면 lm_eval처럼 해당 문항만 평가
+
+    Returns:
+        function: offline_evaluate(model, tasks, num_fewshot=5, samples=None, **kwargs)
+                  (과목별 문항 수는 offline_evaluate.subject_sizes)
+    """
+    from evaluate_model import list_kmmlu_subject_tasks
+
+    subject_tasks = list_kmmlu_subject_tasks()
+    docs_by_subject = make_synthetic_docs(
+        subjects=[task[len('kmmlu_'):] for task in subject_tasks], n_questions=n_questions, n_dev=n_dev, seed=seed
+    )
+    group_names = {"stem": "kmmlu_stem", "humss": "kmmlu_humss", "applied": "kmmlu_applied_science",
+                   "other": "kmmlu_other"}
+
+    def offline_evaluate(model, tasks, num_fewshot=5, samples=None, **kwargs):
+        task_names = list(subject_tasks) if tasks == ["kmmlu"] else tasks
+        selected = {}
+        for task in task_names:
+            docs = docs_by_subject[task[len('kmmlu_'):]]
+            if samples and task in samples:
+                # lm_eval처럼 원래 순서대로 골라 0부터 다시 번호를 매김
+                docs = {"dev": docs["dev"], "test": [docs["test"][i] for i in sorted(samples[task])]}
+            selected[task[len('kmmlu_'):]] = docs
+        requests = make_synthetic_requests(selected, num_fewshot)
+        for request in requests:
+            request.task_name, request.doc_id = request.metadata[0], request.metadata[1]
+
+        # 문항별로 loglikelihood가 가장 큰 선택지를 예측으로 사용
+        options = defaultdict(dict)
+        for request, (logprob, _) in zip(requests, model.loglikelihood(requests)):
+            options[(request.task_name, request.doc_id)][request.idx] = (logprob, request.doc['answer'] - 1)
+        correct = defaultdict(list)
+        for (task_name, _), scores in options.items():
+            prediction = max(scores, key=lambda idx: scores[idx][0])
+            correct[task_name].append(float(prediction == scores[0][1]))
+
+        results = {task: {"acc,none": sum(values) / len(values)} for task, values in correct.items()}
+        n_samples = {task: {"original": len(values), "effective": len(values)} for task, values in correct.items()}
+        if tasks == ["kmmlu"]:
+            scores = aggregate_subject_scores({
+                task: {"acc": results[task]["acc,none"], "n": n_samples[task]["effective"], "category": category}
+                for task, category in subject_tasks.items()
+            })
+            results["kmmlu"] = {"acc,none": scores["overall"]}
+            for key, group in group_names.items():
+                results[group] = {"acc,none": scores[key]}
+        return {"results": results, "n-samples": n_samples}
+
+    offline_evaluate.subject_sizes = {task: n_questions for task in subject_tasks}
+    return offline_evaluate
+
+
+def make_tiny_model(output_dir, hidden_size=64, num_layers=2, seed=0):
+    """
+    무작위 초기화된 작은 Llama 모델과 BPE 토크나이저를 output_dir에 저장 (이미 있으면 재사용)
+
+    Returns:
+        str: 저장 경로 (HFLM pretrained=... 에 바로 사용 가능)
+    """
+    if os.path.exists(os.path.join(output_dir, 'config.json')):
+        return output_dir
+
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    # 합성 문항 텍스트로 바이트 단위 BPE 토크나이저 학습 (한글 포함 모든 문자 처리 가능)
+    corpus = [
+        build_fewshot_context(docs, doc, random.Random(seed))
+        for docs in make_synthetic_docs(n_questions=2, seed=seed).values()
+        for doc in docs["test"]
+    ]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=1000,
+        special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    hf_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", unk_token="<unk>"
+    )
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=len(hf_tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=4096,
+        bos_token_id=hf_tokenizer.bos_token_id,
+        eos_token_id=hf_tokenizer.eos_token_id
+    )
+    model = LlamaForCausalLM(config)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.save_pretrained(output_dir)
+    hf_tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+def make_random_adapters(base_dir, output_dir, n_adapters=3, rank=4, seed=0):
+    """
+    base_dir 모델용 무작위 초기화 LoRA 어댑터 n_adapters개를 output_dir 아래에 저장 (이미 있으면 재사용)
+    A/B 행렬을 모두 무작위로 초기화하므로 어댑터마다 베이스 모델과 다른 점수가 나옴
+
+    Returns:
+        list: 어댑터 경로 목록 (HFLM peft=... 또는 PeftModel.from_pretrained에 바로 사용 가능)
+    """
+    paths = [os.path.join(output_dir, f"lora-{i}") for i in range(n_adapters)]
+    if all(os.path.exists(os.path.join(path, 'adapter_config.json')) for path in paths):
+        return paths
+
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from transformers import AutoModelForCausalLM
+
+    for i, path in enumerate(paths):
+        torch.manual_seed(seed + i)
+        model = AutoModelForCausalLM.from_pretrained(base_dir)
+        config = LoraConfig(r=rank, lora_alpha=rank * 2, target_modules=["q_proj", "v_proj"],
+                            init_lora_weights=False, task_type="CAUSAL_LM")
+        get_peft_model(model, config).save_pretrained(path)
+    return paths